@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Benchmark for clipping a year of daily data with `TEMDataset.get_by_extent`
+
+Builds a synthetic CRU-JRA like year (9 variables, 365 days, 0.5 degree,
+arctic, with an "ocean" of NaNs) and clips it to a 4km EPSG:6931 region with
+each warp method. Each method runs in its own process so the reported peak
+RSS (above the RSS after building the synthetic data) is not shared:
+
+    per-variable: gdal.Warp twice (primer + real pass) per variable
+    single-pass: all variables stacked and warped in one gdal.Warp call
+    warp-plan: precomputed `warp_plan.WarpPlan` weights
+
+usage:
+    python dev_scripts/benchmark_warp.py --size 250 --repeats 3
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+import xarray as xr
+import rioxarray
+from pyproj import CRS
+
+from temds.datasources.dataset import TEMDataset
+from temds import warp_plan
+
+VARIABLES = ['tmax', 'tmin', 'tair', 'prec', 'nirr', 'vapo', 'winds', 'winddir', 'spfh']
+
+METHODS = {
+    'per-variable': dict(use_warp_plan=False, single_pass_warp=False),
+    'single-pass': dict(use_warp_plan=False, single_pass_warp=True),
+    'warp-plan': dict(use_warp_plan=True),
+}
+
+def synthetic_year(n_days=365, seed=0):
+    """0.5 degree daily data north of 45N"""
+    rng = np.random.default_rng(seed)
+    lat = np.arange(89.75, 45, -0.5)
+    lon = np.arange(-179.75, 180, 0.5)
+    time = xr.date_range('2000-01-01', periods=n_days, freq='D', calendar='noleap', use_cftime=True)
+    ocean = np.zeros((lat.size, lon.size), dtype=bool)
+    ocean[:30] = True # arctic ocean
+    ocean[50:70, 100:160] = True # "bering sea"
+
+    data_vars = {}
+    for var in VARIABLES:
+        data = rng.normal(size=(n_days, lat.size, lon.size)).astype(np.float32)
+        data += np.cos(np.deg2rad(lat))[None, :, None].astype(np.float32) * 10
+        data[:, ocean] = np.nan
+        data_vars[var] = xr.DataArray(
+            data, dims=['time', 'lat', 'lon'],
+            coords={'time': time, 'lat': lat, 'lon': lon},
+            attrs={'units': '1'}
+        )
+    ds = xr.Dataset(data_vars)
+    ds.rio.set_spatial_dims('lon', 'lat', inplace=True)
+    ds.rio.write_crs(4326, inplace=True)
+    return ds
+
+def peak_rss_mb():
+    """peak resident set size of this process (linux reports KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_method(method, size, days, repeats):
+    """Clip a synthetic year with `method`, returns times, added peak RSS, 
+    and the first few days of results for comparison
+    """
+    year = TEMDataset(synthetic_year(days))
+    extent_crs = CRS.from_epsg(6931)
+    resolution = (4000.0, -4000.0)
+    minx, maxy = -2000000.0, -1000000.0
+    maxx, miny = minx + size * 4000, maxy - size * 4000
+
+    base_rss = peak_rss_mb()
+    times = []
+    for _ in range(repeats):
+        warp_plan.get_warp_plan.cache_clear()
+        start = time.perf_counter()
+        tile = year.get_by_extent(
+            minx, miny, maxx, maxy, extent_crs,
+            resolution=resolution, **METHODS[method]
+        )
+        times.append(time.perf_counter() - start)
+    sample = {v: tile.dataset[v].values[:5].copy() for v in VARIABLES}
+    return times, peak_rss_mb() - base_rss, sample
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=250, help='region size in 4km pixels (size x size)')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=list(METHODS))
+    args = parser.parse_args()
+
+    print(f'source: 90 x 720 x {args.days} days x {len(VARIABLES)} vars')
+    print(f'destination: {args.size} x {args.size} at 4km')
+
+    results = {}
+    ctx = multiprocessing.get_context('spawn')
+    for method in args.methods:
+        with ctx.Pool(1) as pool:
+            times, rss, results[method] = pool.apply(
+                run_method, (method, args.size, args.days, args.repeats)
+            )
+        print(
+            f'{method:>14}: first {times[0]:.2f}s, '
+            f'best {min(times):.2f}s per year, '
+            f'peak RSS +{rss:.0f} MB'
+        )
+
+    reference = args.methods[0]
+    for method in args.methods[1:]:
+        diff = np.concatenate([
+            np.abs(results[method][v] - results[reference][v]).ravel()
+            for v in VARIABLES
+        ])
+        nan_mismatch = sum(
+            (np.isnan(results[method][v]) != np.isnan(results[reference][v])).sum()
+            for v in VARIABLES
+        )
+        print(
+            f'{method} vs {reference} (first 5 days): '
+            f'max abs diff {np.nanmax(diff):.3g}, '
+            f'mean abs diff {np.nanmean(diff):.3g}, NaN mismatches {nan_mismatch}'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+accumulators
+------------
+
+Streaming reductions over years of daily data. Years are added one at a
+time so memory does not grow with the number of years.
+"""
+import warnings
+
+import numpy as np
+
+from temds import constants
+
+MONTHLY_METHODS = ('mean', 'sum')
+
+
+class RunningMean(object):
+    """Running float64 sum of equally shaped arrays (i.e. a year of daily
+    data for a variable), for the element wise mean across the arrays.
+
+    Attributes
+    ----------
+    total: np.array or None
+        float64 sum of added arrays, None until the first array is added
+    count: int
+        number of arrays added
+    """
+    def __init__(self):
+        self.total = None
+        self.count = 0
+
+    def add(self, values):
+        """Add an array
+
+        Parameters
+        ----------
+        values: np.array
+            same shape as previously added arrays
+        """
+        if self.total is None:
+            self.total = np.zeros(np.shape(values), dtype=np.float64)
+        elif self.total.shape != np.shape(values):
+            raise ValueError(
+                f'shape {np.shape(values)} does not match {self.total.shape}'
+            )
+        self.total += values
+        self.count += 1
+
+    def mean(self):
+        """Element wise mean of added arrays
+
+        Returns
+        -------
+        np.array
+            float64
+        """
+        if self.count == 0:
+            raise ValueError('no arrays added')
+        return self.total / self.count
+
+
+def monthly_reduce(daily, method):
+    """Reduce 365 day daily data to 12 months with the boundaries in
+    `constants.MONTH_BOUNDS`
+
+    Parameters
+    ----------
+    daily: np.array
+        (365, ...) daily data
+    method: str
+        'mean' or 'sum'
+
+    Returns
+    -------
+    np.array
+        (12, ...), float64 for 'mean'
+    """
+    if method not in MONTHLY_METHODS:
+        raise ValueError(f"Unknown method '{method}'")
+    monthly = np.add.reduceat(daily, constants.MONTH_BOUNDS[:-1], axis=0)
+    if method == 'mean':
+        lengths = constants.MONTH_LENGTHS.reshape((12,) + (1,) * (daily.ndim - 1))
+        monthly = monthly / lengths
+    return monthly
+
+
+def monthly_baseline(yearly, method):
+    """Monthly baseline from years of daily data: the daily mean across 
+    years (added one year at a time) reduced to months with 
+    `monthly_reduce`
+
+    Parameters
+    ----------
+    yearly: iterable
+        (365, ...) np.arrays, one per year
+    method: str
+        'mean' or 'sum'
+
+    Returns
+    -------
+    np.array
+        (12, ...) monthly baseline, float data keeps its dtype
+    """
+    running = RunningMean()
+    dtype = None
+    for values in yearly:
+        dtype = values.dtype
+        running.add(values)
+    monthly = monthly_reduce(running.mean(), method)
+    if np.issubdtype(dtype, np.floating):
+        monthly = monthly.astype(dtype)
+    return monthly
+
+
+class DailyStats(object):
+    """Single pass, numerically stable (Welford) element wise statistics 
+    of equally shaped arrays, i.e. per day of year and pixel statistics 
+    across years of daily data. Partial results, for different year 
+    ranges, can be combined with `merge` (Chan et al.), and results for 
+    spatial blocks with `concatenate`.
+
+    NaNs propagate, a pixel with a NaN in any year has NaN statistics.
+
+    Attributes
+    ----------
+    count: int
+        number of arrays added
+    mean: np.array or None
+        float64 running mean
+    m2: np.array or None
+        float64 running sum of squared differences from the mean
+    min: np.array or None
+        element wise minimum
+    max: np.array or None
+        element wise maximum
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+
+    def add(self, values):
+        """Add an array
+
+        Parameters
+        ----------
+        values: np.array
+            same shape as previously added arrays
+        """
+        values = np.asarray(values)
+        if self.count == 0:
+            self.mean = values.astype(np.float64)
+            self.m2 = np.zeros(values.shape, dtype=np.float64)
+            self.min = values.copy()
+            self.max = values.copy()
+            self.count = 1
+            return
+        if values.shape != self.mean.shape:
+            raise ValueError(
+                f'shape {values.shape} does not match {self.mean.shape}'
+            )
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        delta *= values - self.mean
+        self.m2 += delta
+        np.minimum(self.min, values, out=self.min)
+        np.maximum(self.max, values, out=self.max)
+
+    def merge(self, other):
+        """Combine with statistics of other arrays (of the same shape)
+
+        Parameters
+        ----------
+        other: DailyStats
+
+        Returns
+        -------
+        DailyStats
+            self, updated
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean.copy()
+            self.m2 = other.m2.copy()
+            self.min = other.min.copy()
+            self.max = other.max.copy()
+            return self
+        if other.mean.shape != self.mean.shape:
+            raise ValueError(
+                f'shape {other.mean.shape} does not match {self.mean.shape}'
+            )
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * (self.count * other.count / count)
+        self.mean += delta * (other.count / count)
+        self.count = count
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        return self
+
+    @staticmethod
+    def concatenate(blocks, axis=-1):
+        """Join statistics of spatial blocks covering the same arrays
+
+        Parameters
+        ----------
+        blocks: list of DailyStats
+            with the same `count`
+        axis: int, defaults -1
+            axis the blocks are split on
+
+        Returns
+        -------
+        DailyStats
+        """
+        counts = set(block.count for block in blocks)
+        if len(counts) != 1:
+            raise ValueError(f'blocks have different counts: {counts}')
+        joined = DailyStats()
+        joined.count = counts.pop()
+        for attr in ('mean', 'm2', 'min', 'max'):
+            setattr(joined, attr, np.concatenate(
+                [getattr(block, attr) for block in blocks], axis=axis
+            ))
+        return joined
+
+    @property
+    def dtype(self):
+        """Floating point type matching the added arrays, for casting 
+        results back (i.e. float32 data gives float32)"""
+        return np.result_type(self.min.dtype, np.float32)
+
+    @property
+    def variance(self):
+        """Population variance (ddof=0)"""
+        if self.count == 0:
+            raise ValueError('no arrays added')
+        return self.m2 / self.count
+
+    @property
+    def std(self):
+        """Population standard deviation (ddof=0)"""
+        return np.sqrt(self.variance)
+
+
+def resample_monthly(daily, method, out=None):
+    """Reduce 365 day daily data to 12 months, the same as xarray's
+    `resample(time='MS')` with `.mean()` (NaNs skipped) or 
+    `.sum(skipna=False)` (NaNs propagated). Each month in 
+    `constants.MONTH_BOUNDS` is reduced with the same numpy functions
+    xarray uses, so results are identical. (`np.add.reduceat` sums in a 
+    different order, so it can differ in the last bit.)
+
+    Parameters
+    ----------
+    daily: np.array
+        (365, ...) floating point daily data
+    method: str
+        'mean' or 'sum'
+    out: np.array, optional
+        (12, ...) array to write results to, defaults to a new array with 
+        the type of `daily`
+
+    Returns
+    -------
+    np.array
+        (12, ...) monthly data
+    """
+    if method not in MONTHLY_METHODS:
+        raise ValueError(f"Unknown method '{method}'")
+    if out is None:
+        out = np.empty((12,) + daily.shape[1:], dtype=daily.dtype)
+
+    bounds = constants.MONTH_BOUNDS
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # all NaN months
+        for mn in range(12):
+            month = daily[bounds[mn]:bounds[mn+1]]
+            if method == 'sum':
+                np.sum(month, axis=0, out=out[mn])
+            else:
+                np.nanmean(month, axis=0, out=out[mn])
+    return out
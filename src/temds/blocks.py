@@ -0,0 +1,173 @@
+"""
+blocks
+------
+
+Spatial blocking for data too large to process in memory. The grid is
+split into row/column windows (`block_windows`), each window is processed
+on its own, and results are written into netCDF files that are created
+once with all of their variables (`preallocate`) and filled one window at
+a time (`write_window`). Memory use depends on the block size, not the
+size of the grid.
+"""
+from pathlib import Path
+
+import numpy as np
+import netCDF4
+import xarray as xr
+
+## default (rows, columns) of a block
+DEFAULT_BLOCK_SIZE = (512, 512)
+
+## default fill value, matches `TEMDataset.save`
+FILL_VALUE = 1.0e+20
+
+
+def normalize_block_size(block_size):
+    """Block size as (rows, columns)
+
+    Parameters
+    ----------
+    block_size: int or tuple
+        int for square blocks, or (rows, columns)
+
+    Returns
+    -------
+    tuple
+        (rows, columns)
+    """
+    if np.ndim(block_size) == 0:
+        block_size = (block_size, block_size)
+    rows, cols = (int(v) for v in block_size)
+    if rows < 1 or cols < 1:
+        raise ValueError(f'block size must be positive, got {block_size}')
+    return rows, cols
+
+def block_windows(shape, block_size=DEFAULT_BLOCK_SIZE, dims=('y', 'x')):
+    """Split a grid into windows of at most `block_size`. Windows are
+    ordered row by row and cover each cell once.
+
+    Parameters
+    ----------
+    shape: tuple
+        (rows, columns) of the grid
+    block_size: int or tuple, defaults DEFAULT_BLOCK_SIZE
+        int for square blocks, or (rows, columns)
+    dims: tuple, defaults ('y', 'x')
+        names of the (row, column) dimensions
+
+    Returns
+    -------
+    list
+        dicts of {dimension: slice}, for `isel`
+    """
+    rows, cols = shape
+    b_rows, b_cols = normalize_block_size(block_size)
+    return [
+        {dims[0]: slice(r, min(r + b_rows, rows)),
+         dims[1]: slice(c, min(c + b_cols, cols))}
+        for r in range(0, rows, b_rows)
+        for c in range(0, cols, b_cols)
+    ]
+
+def preallocate(
+        path, template, variables, block_size=DEFAULT_BLOCK_SIZE,
+        overwrite=False, **kwargs
+    ):
+    """Create a netCDF file with the coordinates and attributes of
+    `template` and empty (fill value) data `variables`, for windows to be
+    written to with `write_window`. Data is chunked by time step and
+    block, so writing a window only touches the chunks it covers.
+
+    Parameters
+    ----------
+    path: Path
+        file to create
+    template: xr.Dataset
+        provides coordinates (including 'spatial_ref') and global
+        attributes, data variables are ignored
+    variables: dict
+        variable name: (dims, dtype, attrs), 'y' and 'x' must be the last
+        dims
+    block_size: int or tuple, defaults DEFAULT_BLOCK_SIZE
+        (rows, columns) of chunks
+    overwrite: bool, defaults False
+        when True overwrite existing files
+    **kwargs:
+        'fill_value': float, default FILL_VALUE
+        'missing_value': float, default FILL_VALUE
+        'use_zlib': bool, default True
+        'complevel': int, default 9
+        Same as `TEMDataset.save`
+
+    Raises
+    ------
+    FileExistsError
+        if `path` exists and `overwrite` is False
+
+    Returns
+    -------
+    Path
+    """
+    lookup = lambda kw, ke, de: kw[ke] if ke in kw else de
+    fill_value = lookup(kwargs, 'fill_value', FILL_VALUE)
+    missing_value = lookup(kwargs, 'missing_value', FILL_VALUE)
+    compress = lookup(kwargs, 'use_zlib', True)
+    complevel = lookup(kwargs, 'complevel', 9)
+
+    path = Path(path)
+    if path.exists() and not overwrite:
+        raise FileExistsError(
+            f'The file {path} exists and `overwrite` is False'
+        )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+
+    b_rows, b_cols = normalize_block_size(block_size)
+    xr.Dataset(coords=template.coords, attrs=template.attrs).to_netcdf(
+        path, engine='netcdf4'
+    )
+    with netCDF4.Dataset(path, 'a') as nc:
+        for var, (dims, dtype, attrs) in variables.items():
+            chunks = [1] * (len(dims) - 2) + [
+                min(b_rows, len(nc.dimensions[dims[-2]])),
+                min(b_cols, len(nc.dimensions[dims[-1]])),
+            ]
+            nc_var = nc.createVariable(
+                var, dtype, dims,
+                zlib=compress, complevel=complevel,
+                chunksizes=chunks, fill_value=fill_value
+            )
+            attrs = {
+                k: v for k, v in attrs.items()
+                if k not in ('_FillValue', 'missing_value')
+            }
+            attrs['missing_value'] = np.array(missing_value, dtype=dtype)
+            if 'spatial_ref' in template.coords:
+                attrs['grid_mapping'] = 'spatial_ref'
+            nc_var.setncatts(attrs)
+    return path
+
+def write_window(path, window, values, dims=('y', 'x')):
+    """Write a window of data to a file created with `preallocate`.
+    NaNs are written as the variable's fill value.
+
+    Parameters
+    ----------
+    path: Path
+        file created with `preallocate`
+    window: dict
+        {dimension: slice} from `block_windows`
+    values: dict
+        variable name: np.array, the window of data for each variable
+    dims: tuple, defaults ('y', 'x')
+        names of the (row, column) dimensions
+    """
+    rows, cols = window[dims[0]], window[dims[1]]
+    with netCDF4.Dataset(path, 'a') as nc:
+        nc.set_auto_mask(False)
+        for var, data in values.items():
+            nc_var = nc.variables[var]
+            data = np.asarray(data)
+            if np.issubdtype(data.dtype, np.floating):
+                data = np.where(np.isnan(data), nc_var._FillValue, data)
+            nc_var[..., rows, cols] = data
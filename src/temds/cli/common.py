@@ -9,12 +9,14 @@ from datetime import datetime
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Annotated
+import os
 import sys
 
 from typer import Argument, Option
 
 from ..logger import Logger, INFO, ERROR, WARN, DEBUG
 from ..region.region import Region
+from .. import gdal_tools
 
 
 OVERWRITE_DISABLED_MSG = 'Overwriting data disabled, and resulting data already exists. Use --overwrite flag to enable. Exiting...'
@@ -49,6 +51,13 @@ class GlobalConfiguration:
         This flag enables saving of output/intermediate data. When set to
         False writing of data should be disabled, which is useful when commands
         are called as part of a chain and not from the user interface level.
+    parallel: bool, defaults False
+        Flag to enable parallel processing
+    n_process: int, defaults 4
+        number of parallel processes to use when `parallel` is True
+    warp_threads: int, Optional
+        Total number of threads available for gdal.Warp, split between 
+        processes when `parallel` is True. Defaults to the number of CPUs.
 
     log: Logger
         Logger for cli application
@@ -70,6 +79,7 @@ class GlobalConfiguration:
     in_memory: bool = True
     parallel: bool=False
     n_process: int=4
+    warp_threads: int=None
     log: Logger = field(init=False)
     region: Region = field(init=False)
     runtime_data: dict = field(init=False)
@@ -89,6 +99,11 @@ class GlobalConfiguration:
         if self.silent:
             self.log.suspend()
 
+        gdal_tools.set_warp_threads(self.get_warp_threads())
+        self.log.debug(
+            f'Using {gdal_tools.get_warp_threads()} threads per process for gdal.Warp'
+        )
+
         if not self.overwrite:
             self.log.warn('WARNING overwriting data is disabled') 
             if self.fail_on_warn:
@@ -153,6 +168,18 @@ class GlobalConfiguration:
         """
         return self.n_process if self.parallel else 1
 
+    def get_warp_threads(self) -> int:
+        """Splits the `warp_threads` budget between the processes from
+        `get_n_process` so cores are not oversubscribed.
+
+        Returns
+        -------
+        int
+            threads per process, at least 1
+        """
+        budget = self.warp_threads if self.warp_threads else os.cpu_count()
+        return max(1, (budget or 1) // self.get_n_process())
+
 
 def years_as_range_check(years: list[int], as_range: bool, default_range: list[int]) -> list | range:
     """Core function set up years uniformly among commands. When years has
@@ -17,9 +17,11 @@ import sys
 
 from .. import datasources
 from ..region.region import Region
+from ..region import artifacts
 from . import common
 from .region import import_data
 from .. import climate_variables, corrections, downscalers
+from ..datasources import cmip6
 
 
 
@@ -105,6 +107,11 @@ def delta_method(
         correction_factors: Annotated[str, Option(help="Path to optional precalculated correction factor data to use, See note if --use-region flag is provided.")] = None,
         save_correction_factors: Annotated[str, Option(help="Flag to save correction factor data when it has to be calculated")] = False,
         downscale_years: Annotated[tuple[int, int], Option(help="Start and end of years to download data for. Will default to full range available if not provided")] = None,
+        stream: Annotated[bool, Option(help="Flag to downscale, save, and release one year at a time, instead of holding all downscaled years in memory until saving. With --parallel, years are downscaled and saved by worker processes that read their own input year")] = False,
+        stream_queue_size: Annotated[int, Option(help="With --stream, the maximum number of downscaled years waiting to be saved")] = 2,
+        block_size: Annotated[int, Option(help="Calculate the baseline, correction factors, and downscaled years in blocks of --block-size by --block-size pixels, writing each block to the output files, for regions too large to process in memory. Needs --baseline-years, precalculated baselines and correction factors are not used")] = None,
+
+        use_cache: Annotated[bool, Option(help="Flag to reuse baselines and correction factors calculated before from the same inputs. They are cached in the region directory (or destination) and recalculated when any input changes")] = True,
     ):
     """This command downscale data via the delta-method
 
@@ -161,7 +168,13 @@ def delta_method(
             sys.exit()
             
         log.suspend()
-        to_downscale_ds = datasources.timeseries.YearlyTimeSeries(to_downscale_pth, logger=log)
+        if stream or block_size:
+            ## years are loaded when they are used, and not kept
+            to_downscale_ds = datasources.timeseries.YearlyTimeSeries(
+                to_downscale_pth, logger=log, in_memory=False, cache_bytes=0
+            )
+        else:
+            to_downscale_ds = datasources.timeseries.YearlyTimeSeries(to_downscale_pth, logger=log)
         reference_ds = datasources.dataset.TEMDataset(reference_pth, logger=log)
 
         log.resume()
@@ -178,11 +191,79 @@ def delta_method(
 
         log.info('Setup complete!')
 
+    if block_size:
+        if not baseline_years:
+            log.error('--block-size needs --baseline-years')
+            sys.exit(0)
+        if context.obj.region and not context.obj.save_enabled:
+            log.error('--block-size saves each block to the region, but saving is disabled.')
+            sys.exit(0)
+        if baseline or save_baseline:
+            log.warn('--block-size calculates the baseline for each block, --baseline and --save-baseline are ignored')
+        if not variables:
+            variables = [v for v in area.data[to_downscale].data[0].dataset.data_vars if v in climate_variables.DOWNSCALE_SAFE]
+        if not correction_factors:
+            correction_factors = to_downscale + '-correction-factors'
+        if type(destination) is str:
+            destination_name = destination
+        else:
+            destination_name =  to_downscale + '-downscaled'
+        where = region_directory if context.obj.region else Path(destination)
+        correction_file = None
+        if save_correction_factors:
+            correction_file = where / f'{correction_factors}.nc'
+
+        log.info(f'Downscaling {variables} in blocks of {block_size} pixels...')
+        try:
+            area.blocked_delta_downscale(
+                where, destination_name, to_downscale, reference, variables, 
+                baseline_years, years=downscale_years, block_size=block_size, 
+                correction_file=correction_file, overwrite=overwrite
+            )
+        except FileExistsError:
+            log.error('Output files exist. Cannot save unless --overwrite is passed.')
+            sys.exit(0)
+        if context.obj.region:
+            exported = {destination_name: destination_name}
+            if correction_file is not None:
+                exported[correction_factors] = correction_file.name
+            context.obj.callback_export_region([], exported=exported)
+        return area
+
+    ## inputs of the baseline and correction factors, for the cache
+    cache = None
+    if use_cache:
+        if context.obj.region:
+            cache = artifacts.ArtifactCache(region_directory / artifacts.CACHE_DIRNAME)
+            to_downscale_input = artifacts.region_input(region_directory, to_downscale)
+            reference_input = artifacts.region_input(region_directory, reference)
+            baseline_input = artifacts.region_input(region_directory, baseline)
+        else:
+            cache = artifacts.cache_beside(to_downscale_pth)
+            to_downscale_input = to_downscale_pth
+            reference_input = reference_pth
+            baseline_input = Path(baseline) if baseline else None
+    baseline_key = None
+
     if not baseline:
         log.info("Baseline data was not provided, Calculating......")
         if not baseline_name:
             baseline_name = to_downscale+"-baseline"
-        area.calculate_climate_baseline(baseline_years[0], baseline_years[1], baseline_name, to_downscale)
+
+        def calculate_baseline():
+            area.calculate_climate_baseline(baseline_years[0], baseline_years[1], baseline_name, to_downscale)
+            return area.data[baseline_name]
+
+        if cache is not None and to_downscale_input is not None:
+            baseline_key = artifacts.artifact_key(
+                'baseline', [to_downscale_input], 
+                years=tuple(baseline_years), variables='all'
+            )
+            area.data[baseline_name] = cache.get_or_compute(
+                'baseline', baseline_key, calculate_baseline, log
+            )
+        else:
+            calculate_baseline()
 
         if save_baseline:
             log.info('... with --save-baseline. Saving Calculated baseline data.')
@@ -198,6 +279,9 @@ def delta_method(
             baseline_name = to_downscale+"-baseline"
         area.import_datasource(baseline_name, baseline)
 
+    if baseline and cache is not None and baseline_input is not None:
+        baseline_key = artifacts.artifact_key('baseline-input', [baseline_input])
+
     if baseline_name:
         baseline = baseline_name
 
@@ -213,7 +297,20 @@ def delta_method(
 
     variables = {var:{'function': var} for var in variables}
 
-    area.calculate_correction_factors(baseline, reference, variables, factor_id=correction_factors)
+    def calculate_correction_factors():
+        area.calculate_correction_factors(baseline, reference, variables, factor_id=correction_factors)
+        return area.data[correction_factors]
+
+    if baseline_key is not None and reference_input is not None:
+        factors_key = artifacts.artifact_key(
+            'correction-factors', [reference_input], 
+            baseline=baseline_key, variables=sorted(variables)
+        )
+        area.data[correction_factors] = cache.get_or_compute(
+            'correction-factors', factors_key, calculate_correction_factors, log
+        )
+    else:
+        calculate_correction_factors()
 
     if save_correction_factors:
         log.info('... with --save-correction-factors. Saving Calculated correction factors.')
@@ -233,6 +330,43 @@ def delta_method(
     else:
         destination_name =  to_downscale + '-downscaled'
 
+    if stream and context.obj.region and not context.obj.save_enabled:
+        log.warn('--stream saves each year to the region, but saving is disabled. Not streaming.')
+        stream = False
+
+    if stream:
+        log.info('Downscaling and saving one year at a time...')
+        if context.obj.region:
+            where = region_directory
+        else:
+            where = Path(destination)
+        in_memory = any(item.in_memory for item in area.data[to_downscale].data)
+        try:
+            if parallel and not in_memory:
+                log.info(f'... in parallel with {n_process} processes')
+                with parallel_config(backend="loky", n_jobs=n_process, verbose=1):
+                    area.parallel_delta_downscale(
+                        where, destination_name, to_downscale, 
+                        correction_factors, variables, years=downscale_years, 
+                        overwrite=overwrite
+                    )
+            else:
+                if parallel:
+                    log.info('... data to downscale is in memory, so years are not downscaled in parallel')
+                area.stream_delta_downscale(
+                    where, destination_name, to_downscale, correction_factors, 
+                    variables, years=downscale_years, 
+                    queue_size=stream_queue_size, overwrite=overwrite
+                )
+        except FileExistsError:
+            log.error('Output files exist. Cannot save unless --overwrite is passed.')
+            sys.exit(0)
+        if context.obj.region:
+            context.obj.callback_export_region(
+                [], exported={destination_name: destination_name}
+            )
+        return area
+
     # variables = '...'
     log.info('Downscaling...')
     with parallel_config(backend="loky", n_jobs=n_process, verbose=1):
@@ -251,3 +385,107 @@ def delta_method(
         area.data[destination_name].save(out_path, overwrite=overwrite)
 
     return area
+
+
+@app.command()
+def batch(
+        context: Context,
+        destination: common.DESTINATION_DIR,
+        source_pattern: Annotated[str, Argument(help="Directory of preprocessed yearly data for each source, with {model} and {experiment} placeholders (i.e. working/cmip6-{model}-{experiment})")],
+        reference: Annotated[Path, Argument(help="Path to data to use as downscaling reference. This should be a single netcdf file with long term climate normals. If --use-region is provided, this is treated as an item in the region.")],
+        baseline_years: Annotated[tuple[int, int], Option(help="Start and end of years to calculate the climate baseline for, from each models baseline experiment")],
+        variables: Annotated[List[str], Option(help="Variables to downscale, defaults to the downscale safe variables of the first source")] = None,
+        models: Annotated[List[str], Option(help="Models to downscale")] = cmip6.DEFAULT_MODELS,
+        experiments: Annotated[List[str], Option(help="Experiments to downscale for each model")] = cmip6.EXPERIMENTS,
+        baseline_experiment: Annotated[str, Option(help="Experiment used for the baseline of each model's experiments")] = 'historical',
+        downscale_years: Annotated[tuple[int, int], Option(help="Start and end of years to downscale. Will default to full range of each source if not provided")] = None,
+        memory_budget: Annotated[float, Option(help="GB of memory shared by all worker processes when --parallel is used. The number of processes is reduced to fit")] = None,
+    ):
+    """This command downscales many (model, experiment) sources via the 
+    delta-method in one run. The region grid, reference, per model 
+    baselines and correction factors, and per source grid resampling weights
+    are calculated once and shared, then sources are downscaled in worker 
+    processes. Results are saved as {model}-{experiment}-downscaled.
+    """
+    log = context.obj.log
+    overwrite = context.obj.overwrite
+    parallel = context.obj.parallel
+    n_process = context.obj.get_n_process()
+
+    if variables:
+        unsafe = [var for var in variables if not var in climate_variables.DOWNSCALE_SAFE]
+        for var in unsafe:
+            log.error(f'variable "{var}" is not downscale safe.')
+        if unsafe:
+            log.info(f'Downscale safe variables are {climate_variables.DOWNSCALE_SAFE}')
+            sys.exit()
+
+    sources = {}
+    for model in models:
+        baseline_source = Path(source_pattern.format(model=model, experiment=baseline_experiment))
+        if not baseline_source.exists():
+            log.warn(f'Skipping {model}, baseline data not found at {baseline_source}')
+            continue
+        for experiment in experiments:
+            source = Path(source_pattern.format(model=model, experiment=experiment))
+            if not source.exists():
+                log.warn(f'Skipping {model} {experiment}, data not found at {source}')
+                continue
+            sources[f'{model}-{experiment}-downscaled'] = (source, baseline_source)
+    if not sources:
+        log.error('No sources found to downscale')
+        sys.exit(0)
+    log.info(f'Downscaling {list(sources)}')
+
+    if context.obj.region:
+        log.info('Using region from context')
+        area = context.obj.region
+        where = context.obj.region_directory
+        if not context.obj.save_enabled:
+            log.error('batch saves each source to the region, but saving is disabled.')
+            sys.exit(0)
+        reference = str(reference)
+        if not reference in area.data:
+            log.error(f"You are using a region and reference value of {reference} not loaded, load with --load-data={reference}")
+            sys.exit(0)
+    else:
+        if not reference.exists():
+            log.error('Target reference data does not exist...')
+            sys.exit()
+        log.info(f'Using reference data at: {reference}, and its grid')
+        reference_ds = datasources.dataset.TEMDataset(reference, logger=log)
+        area = Region.from_TEMDataset(reference_ds, logger=log)
+        reference = reference.stem
+        area.import_datasource(reference, reference_ds)
+        where = Path(destination)
+
+    if not variables:
+        first = next(iter(sources.values()))[0]
+        variables = [
+            v for v in datasources.timeseries.YearlyTimeSeries(
+                first, in_memory=False, cache_bytes=0
+            ).data[0].dataset.data_vars 
+            if v in climate_variables.DOWNSCALE_SAFE
+        ]
+    log.info(f'Variables {variables}')
+
+    n_jobs = n_process if parallel else 1
+    if memory_budget is not None:
+        memory_budget = memory_budget * 2**30
+    try:
+        with parallel_config(backend="loky", verbose=1):
+            saved = area.batch_delta_downscale(
+                where, sources, reference, variables, baseline_years,
+                years=downscale_years, n_jobs=n_jobs, 
+                memory_budget=memory_budget, overwrite=overwrite
+            )
+    except FileExistsError:
+        log.error('Output files exist. Cannot save unless --overwrite is passed.')
+        sys.exit(0)
+
+    if context.obj.region:
+        context.obj.callback_export_region(
+            [], exported={name: name for name in saved}
+        )
+    log.info('Batch downscaling complete!')
+    return area
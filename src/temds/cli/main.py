@@ -11,6 +11,7 @@ from . import common
 from . import statistics
 from . import downscale
 from . import export
+from .. import gdal_tools
 
 from ..__init__ import __version__
 
@@ -43,6 +44,7 @@ def main(
     load_item:  Annotated[List[str], Option(help="Keys for items to load for region if --no-load-all is provided")]=[],
     parallel:  Annotated[bool, Option(help="Flag to enable parallel processing")]=False,
     n_process:  Annotated[int, Option(help="Number of parallel processes to use when --parallel is used")]=4,
+    warp_threads:  Annotated[int, Option(envvar=gdal_tools.WARP_THREADS_BUDGET_ENV, help="Total threads for gdal warping, split between processes when --parallel is used. Defaults to the number of CPUs")]=None,
     overwrite: common.OVERWRITE_FLAG = False,
     cleanup: common.CLEANUP_FLAG = False,
     fail_on_warn:  Annotated[bool, Option(help="Flag to halt program execution when a warning is generated")]=False,
@@ -61,7 +63,7 @@ def main(
 
     context.obj = common.GlobalConfiguration(
         log_file, log_level, silent, overwrite, cleanup, 
-        parallel=parallel, n_process=n_process,
+        parallel=parallel, n_process=n_process, warp_threads=warp_threads,
         region_directory=use_region, import_data=load_data, fail_on_warn=fail_on_warn
     )
     # print(context.obj)
@@ -216,6 +216,7 @@ def worldclim(
             download=False, 
             logger=log,
             # resample_alg='bilinear'
+            n_workers=n_process,
     )
 
     try: 
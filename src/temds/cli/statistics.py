@@ -16,6 +16,7 @@ import sys
 
 from .. import datasources
 from ..region.region import Region
+from ..region import artifacts
 from . import common
 from .region import import_data
 
@@ -32,7 +33,7 @@ def calculate_normals(
         source: Annotated[str, Argument(help="name of data in region to calculate baseline for")],
         years: Annotated[tuple[int, int], Argument(help="Start and end of years to download data for. Will default to full range of experiment provided")] = None,
         name: Annotated[str, Argument(help=f"name to save baseline data in region to; When not provided -baseline is appended to source")] = None,
-
+        use_cache: Annotated[bool, Option(help="Flag to reuse normals calculated before from the same inputs. They are cached in the region directory (or next to destination) and recalculated when any input changes")] = True,
     ):
     """This command calculates the long term climate normals for a daily dataset.
     """
@@ -64,7 +65,28 @@ def calculate_normals(
     if name is None:
         name = source + f'-normals-{years[0]}-{years[1]}'
 
-    area.calculate_climate_baseline(years[0], years[1], name, source)
+    def calculate_baseline():
+        area.calculate_climate_baseline(years[0], years[1], name, source)
+        return area.data[name]
+
+    source_input = None
+    if use_cache:
+        if context.obj.region:
+            cache = artifacts.ArtifactCache(region_directory / artifacts.CACHE_DIRNAME)
+            source_input = artifacts.region_input(region_directory, source)
+        else:
+            cache = artifacts.cache_beside(source_pth)
+            source_input = source_pth
+
+    if source_input is not None:
+        key = artifacts.artifact_key(
+            'baseline', [source_input], years=tuple(years), variables='all'
+        )
+        area.data[name] = cache.get_or_compute(
+            'baseline', key, calculate_baseline, log
+        )
+    else:
+        calculate_baseline()
 
     if context.obj.save_enabled:
         try:
@@ -14,6 +14,10 @@ SECONDS_PER_DAY = 24 * 60 * 60
 ## we assume 365 day years
 DAYS_PER_MONTH = np.cumsum([31,28,31,30,31,30,31,31,30,31,30,31]) 
 MONTH_START_DAYS =  np.append([1], (DAYS_PER_MONTH + 1) )[:-1] 
+## 0 based day of year boundaries of each month, month `mn` is 
+## MONTH_BOUNDS[mn]:MONTH_BOUNDS[mn+1]
+MONTH_BOUNDS = np.append([0], DAYS_PER_MONTH)
+MONTH_LENGTHS = np.diff(MONTH_BOUNDS)
 
 
 def get_month_slice(mn): 
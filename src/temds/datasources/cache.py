@@ -0,0 +1,151 @@
+"""
+cache
+-----
+
+Bounded, byte size aware LRU cache for opened `xr.Dataset`s. Used by
+`YearlyTimeSeries` when `in_memory` is False, so each year's file is opened
+(and parsed) once instead of every time `dataset` is accessed.
+"""
+import threading
+from collections import OrderedDict
+
+## default memory ceiling for a DatasetCache
+DEFAULT_MAX_BYTES = 2**30 # 1 GB
+
+
+class DatasetCache(object):
+    """LRU cache of `xr.Dataset`s with a memory ceiling. Size of an item is
+    its `nbytes` (the size of its data when loaded). Least recently used
+    items are evicted when the ceiling is passed. Items larger than the
+    ceiling are not cached.
+
+    Evicted datasets are not closed, they are closed by xarray when no longer
+    referenced.
+
+    Attributes
+    ----------
+    max_bytes: int
+        memory ceiling
+    hits: int
+        number of `get` calls served from the cache
+    misses: int
+        number of `get` calls that called the loader
+    evictions: int
+        number of items evicted to stay under `max_bytes`
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Parameters
+        ----------
+        max_bytes: int, defaults DEFAULT_MAX_BYTES
+            memory ceiling, 0 disables caching
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict() # key: (dataset, nbytes)
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return (
+            f"{type(self).__module__}.{type(self).__name__}"
+            f"({len(self)} items, {self.current_bytes}/{self.max_bytes} bytes)"
+        )
+
+    def __getstate__(self):
+        """Copies (and pickles sent to joblib workers) start empty"""
+        return {'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_bytes'])
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    @property
+    def current_bytes(self):
+        """total size of cached items"""
+        return self._bytes
+
+    def stats(self):
+        """Cache statistics
+
+        Returns
+        -------
+        dict
+            with 'hits', 'misses', 'evictions', 'items', 'bytes',
+            and 'max_bytes'
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'items': len(self),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def get(self, key, loader):
+        """Get item for `key`, calling `loader` to create it on a miss
+
+        Parameters
+        ----------
+        key: hashable
+            i.e. Path of file
+        loader: function
+            called with no arguments to load the dataset on a miss
+
+        Returns
+        -------
+        xr.Dataset
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key][0]
+            self.misses += 1
+
+        dataset = loader()
+        nbytes = dataset.nbytes
+        if nbytes > self.max_bytes:
+            return dataset
+
+        with self._lock:
+            if key in self._items: # loaded by another thread
+                self._items.move_to_end(key)
+                return self._items[key][0]
+            self._items[key] = (dataset, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                self._pop_oldest()
+                self.evictions += 1
+        return dataset
+
+    def _pop_oldest(self):
+        """remove least recently used item"""
+        _, (_, nbytes) = self._items.popitem(last=False)
+        self._bytes -= nbytes
+
+    def evict(self, key):
+        """Remove `key` from cache if present
+
+        Parameters
+        ----------
+        key: hashable
+        """
+        with self._lock:
+            if key in self._items:
+                _, nbytes = self._items.pop(key)
+                self._bytes -= nbytes
+
+    def clear(self):
+        """Remove all items"""
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
@@ -5,6 +5,8 @@ CRU JRA
 Data structures representing CRU JRA data
 """
 import numpy as np
+import pandas as pd
+import xarray as xr
 from cf_units import Unit
 
 from temds import climate_variables 
@@ -69,6 +71,12 @@ RESAMPLE_LOOKUP = {
     
 }
 
+## raw data is 6 hourly
+STEPS_PER_DAY = 4
+
+## days aggregated at a time by `aggregate_daily`
+AGGREGATE_CHUNK_DAYS = 32
+
 
 
 # def calculate_vapo(pres, spfh):
@@ -89,6 +97,98 @@ def calculate_winddir(ugrd, vgrd):
            ((180.0/np.pi)*np.atan2(ugrd,vgrd))
 
 
+def has_regular_steps(time, steps_per_day=STEPS_PER_DAY):
+    """Check that `time` is a sequence of whole, consecutive days
+    with `steps_per_day` timesteps each, i.e. the fixed 365d x 4 layout of
+    raw CRU-JRA files.
+
+    Parameters
+    ----------
+    time: pd.Index or xr.CFTimeIndex
+        time index of raw data
+    steps_per_day: int, defaults STEPS_PER_DAY
+
+    Returns
+    -------
+    bool
+    """
+    if len(time) == 0 or len(time) % steps_per_day != 0:
+        return False
+    days = time.floor('D')
+    if not (days[0] == time[0]):
+        return False ## first step is not at the start of a day
+    by_day = np.asarray(days).reshape(-1, steps_per_day)
+    if not (by_day == by_day[:, :1]).all():
+        return False
+    daily = days[::steps_per_day]
+    return bool(((daily[1:] - daily[:-1]) == pd.Timedelta(days=1)).all())
+
+def aggregate_daily(dataset, var, method, 
+        steps_per_day=STEPS_PER_DAY, chunk_days=AGGREGATE_CHUNK_DAYS
+    ):
+    """Aggregate sub daily `var` to daily values. Same result as 
+    `climate_variables.RESAMPLE_METHODS`, but the data is reshaped to 
+    (days, steps_per_day, ...) and reduced `chunk_days` days at a time, so
+    the full sub daily array is never loaded for lazily opened datasets.
+
+    Timesteps should be regular (see `has_regular_steps`)
+
+    Parameters
+    ----------
+    dataset: xr.Dataset
+        raw data, with 'time' dimension
+    var: str
+        variable to aggregate
+    method: str
+        'mean' (NaNs skipped) or 'sum' (NaNs propagated)
+    steps_per_day: int, defaults STEPS_PER_DAY
+    chunk_days: int, defaults AGGREGATE_CHUNK_DAYS
+
+    Returns
+    -------
+    xr.Dataset
+        with daily `var`, time is labeled by day start like xr.resample
+    """
+    if method not in ('mean', 'sum'):
+        raise ValueError(f'Unknown aggregation method: {method}')
+
+    data = dataset[var].transpose('time', ...)
+    n_days = data.shape[0] // steps_per_day
+    in_dtype = data.dtype
+    if method == 'mean':
+        out_dtype = in_dtype if np.issubdtype(in_dtype, np.floating) \
+                else np.dtype('float64')
+    else:
+        out_dtype = in_dtype
+    daily = np.empty((n_days,) + data.shape[1:], dtype=out_dtype)
+
+    for start in range(0, n_days, chunk_days):
+        stop = min(start + chunk_days, n_days)
+        chunk = data[start * steps_per_day:stop * steps_per_day].values
+        chunk = chunk.reshape((stop - start, steps_per_day) + chunk.shape[1:])
+        if method == 'sum':
+            chunk.sum(axis=1, out=daily[start:stop])
+            continue
+
+        if np.issubdtype(in_dtype, np.floating):
+            valid = ~np.isnan(chunk)
+            total = np.where(valid, chunk, 0).sum(axis=1, dtype=out_dtype)
+            count = valid.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                np.divide(total, count, out=daily[start:stop]) ## 0/0 -> NaN
+        else:
+            chunk.mean(axis=1, out=daily[start:stop])
+
+    time = dataset.indexes['time'].floor('D')[::steps_per_day]
+    daily = xr.DataArray(
+        daily, dims=data.dims,
+        coords={**{
+                d: data.coords[d] for d in data.dims[1:] if d in data.coords
+            }, 'time': time},
+        attrs=data.attrs,
+    ).transpose(*dataset[var].dims)
+    return xr.Dataset({var: daily}, attrs=dataset.attrs)
+
 def name_for(variable, year, version='2.5'):
     """I think the other fields(5d is .5degree cell 365d is
     the n days) are not changing for our purposes
@@ -5,21 +5,22 @@ dataset
 Objects to manage data for TEMDS project
 
 """
-import os
 from pathlib import Path
 from copy import deepcopy
 import operator
 import gc
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
 import shapely.geometry # for .box function
 
 import xarray as xr
 import numpy as np
+import netCDF4
 import rioxarray  # activate 
 import geopandas as gpd
 import pandas as pd
 import rasterio as rio
-from osgeo import gdal
+from osgeo import gdal, gdal_array
 from affine import Affine
 from pyproj import CRS
 from cf_units import Unit
@@ -30,12 +31,16 @@ import temds.datasources.vegetation
 from . import errors
 from . import worldclim, crujra, cmip6, topo
 from . import soil_texture
+from . import header
 from temds import file_tools
 from temds import climate_variables 
 from temds.logger import Logger
 from temds.constants import MONTH_START_DAYS 
 from temds.util import Version
 from temds import gdal_tools
+from temds import warp_plan
+from temds import subset
+from temds import blocks
 
 
 ## We can better clear the memory cache on some OS's with this 
@@ -49,6 +54,10 @@ except:
 
 gdal.UseExceptions()
 
+## gdal types that `get_by_extent` can resample with a `warp_plan.WarpPlan`,
+## others are resampled with gdal.Warp
+WARP_PLAN_GDAL_TYPES = (gdal.GDT_Float32, gdal.GDT_Float64)
+
 class TEMDataset(object):
     """Class for managing .nc based data in TEMDS
 
@@ -65,6 +74,11 @@ class TEMDataset(object):
         Logger to use for printing or saving messages
     _cached_load_kwargs: dict
         cached kwargs for loading `dataset` when `in_memory` is False
+    _header: header.DatasetHeader or None
+        cached metadata for `_dataset` when it is a Path
+    cache: cache.DatasetCache or None
+        optional cache of opened datasets, used by `dataset` when 
+        `in_memory` is False (see `YearlyTimeSeries`)
 
     Properties
     ----------
@@ -73,6 +87,9 @@ class TEMDataset(object):
         will always provided access to an in memory version
         of the data. If `in_memory` is False the in memory 
         dataset is read only.
+    header: header.DatasetHeader or None
+        metadata read from the file when `_dataset` is a Path, used by the
+        properties below so they do not need to load `dataset`
     crs: pyproj.CRS
         readonly access to `dataset` crs
     transform: affine.Affine
@@ -86,6 +103,8 @@ class TEMDataset(object):
     units: dict
         access to a dictionary of variable names and units for 
         each variable in `vars`
+    attrs: dict
+        readonly access to `dataset` attributes
     
     """
     def __init__(self, dataset, in_memory=True, logger=Logger(), **kwargs):
@@ -106,6 +125,8 @@ class TEMDataset(object):
             Key word arguments passed to `load` 
         """
         self._dataset = None
+        self._header = None
+        self.cache = None
         self.logger = logger
         self.in_memory = in_memory
         self._cached_load_kwargs={}
@@ -125,25 +146,45 @@ class TEMDataset(object):
             else:
                 raise IOError('input data is missing or not a .nc file')
         
+    @property
+    def header(self):
+        """Property for metadata of a path backed dataset, read from the file
+        once (without loading the data). None when `dataset` is in memory.
+        """
+        if not isinstance(self._dataset, Path):
+            return None
+        if self._header is None or not self._header.is_current(self._dataset):
+            kwargs_crs = self._cached_load_kwargs.get('crs', None)
+            self._header = header.read_header(self._dataset, kwargs_crs)
+        return self._header
+
     @property
     def crs(self):
         """Property for Quick access to crs"""
+        if self.header is not None:
+            return self.header.crs
         return CRS(self.dataset.rio.crs)
     
     @property
     def shape(self):
+        if self.header is not None:
+            return self.header.shape
         return self.dataset.rio.shape[::-1] # rio returns column major so swap
     
     @property
     def transform(self):
         """Property for Quick access to geo transform"""
         # print('transform')
+        if self.header is not None:
+            return self.header.transform
         return self.dataset.rio.transform()
 
     @property
     def resolution(self):
         """Property for Quick access to resolution"""
         # print('res')
+        if self.header is not None:
+            return self.header.resolution
         return self.dataset.rio.resolution()
     
     @property
@@ -151,6 +192,8 @@ class TEMDataset(object):
         """
         Returns (left,bottom,right,top), outer most coords (bounds) of the data.
         """
+        if self.header is not None:
+            return self.header.extent
         return self.dataset.rio.bounds()
 
     @property
@@ -159,6 +202,8 @@ class TEMDataset(object):
         Property for quick access to variables in dataset
         """
         # print('vars')
+        if self.header is not None:
+            return list(self.header.vars)
         return [v for v in self.dataset.data_vars if v != 'spatial_ref']
     
     @property
@@ -167,7 +212,18 @@ class TEMDataset(object):
         Property for quick access to units for variables in dataset
         """
         # print('units')
+        if self.header is not None:
+            return {var: Unit(self.header.units[var]) for var in self.vars}
         return {var: Unit(self.dataset[var].units) for var in self.vars}
+
+    @property
+    def attrs(self):
+        """
+        Property for quick access to attributes of dataset
+        """
+        if self.header is not None:
+            return self.header.attrs
+        return self.dataset.attrs
    
     @property
     def dataset(self):
@@ -178,6 +234,11 @@ class TEMDataset(object):
         if isinstance(self._dataset, xr.Dataset):
             return self._dataset
         elif isinstance(self._dataset, Path):
+            if self.cache is not None:
+                return self.cache.get(
+                    self._dataset, 
+                    lambda: self.load(self._dataset, **self._cached_load_kwargs)
+                )
             return self.load(self._dataset, **self._cached_load_kwargs)
         else:
             raise TypeError('Bad Dataset Type')
@@ -185,6 +246,9 @@ class TEMDataset(object):
     @dataset.setter
     def dataset(self, value):
         """Setting of dataset property."""
+        if self.cache is not None and isinstance(self._dataset, Path) \
+                and value is not self._dataset:
+            self.cache.evict(self._dataset)
         self._dataset = value
 
     def __repr__(self):
@@ -196,7 +260,10 @@ class TEMDataset(object):
         # print('__del__')
         try:
             # if self.in_memory:
-            self.dataset.close()
+            if isinstance(self._dataset, xr.Dataset):
+                self._dataset.close()
+            elif self.cache is not None:
+                self.cache.evict(self._dataset)
         except:
             pass
 
@@ -371,7 +438,36 @@ class TEMDataset(object):
 
     @classmethod
     def from_soil_texture(cls, data_path, region, download=False,
-                          overwrite=False, logger=Logger()):
+                          overwrite=False, logger=Logger(), 
+                          block_size=blocks.DEFAULT_BLOCK_SIZE, normalize=False):
+        """Creates a TEMDataset of percent clay, sand, and silt from 
+        SoilGrids data, the depth weighted average of the 15-30, 30-60, and
+        60-100 cm layers. For each texture a VRT stacks the depth layers, 
+        and the region is processed one block at a time: each block is 
+        warped (all depths at once), weighted, and written to float32 
+        arrays, so working memory depends on `block_size`, not the region.
+
+        Parameters
+        ----------
+        data_path: path
+            directory with SoilGrids 1000m GeoTIFFs
+        region: Region
+            region to get data for
+        download: bool, defaults False
+            If True, data is downloaded first
+        overwrite: bool, defaults False
+            If True, overwrite existing downloads
+        logger: logger.Logger, defaults to new object
+        block_size: int or tuple, defaults blocks.DEFAULT_BLOCK_SIZE
+            (rows, columns) of blocks
+        normalize: bool, defaults False
+            When True clay, sand, and silt are scaled to add up to 100% 
+            where all three have data
+
+        Returns
+        -------
+        TEMDataset
+        """
         func_name = "TEMdataset.from_soil_texture"
         logger.info(f'{func_name}: Processing soil texture data in {data_path}')
 
@@ -404,37 +500,81 @@ class TEMDataset(object):
                                        in_vars='pct_clay pct_sand pct_silt'.split(), 
                                        ds_time_dim=[], buffer_px=0)
 
-        for X in ['clay','sand','silt']:
-            logger.info(f'{func_name}: Processing {X} data')
-
-            ds_15_30 = gdal.Open(pathlib.Path(data_path, f'{X}_15-30cm_mean_1000.tif'))
-            ds_30_60 = gdal.Open(pathlib.Path(data_path, f'{X}_30-60cm_mean_1000.tif'))
-            ds_60_100 = gdal.Open(pathlib.Path(data_path, f'{X}_60-100cm_mean_1000.tif'))
-
-            assert ds_15_30.GetSpatialRef().IsSame(ds_30_60.GetSpatialRef()), "CRS mismatch"
-            assert ds_15_30.GetSpatialRef().IsSame(ds_60_100.GetSpatialRef()), "CRS mismatch"
-
-            warpOpts = gdal.WarpOptions(
-                        format='MEM',
-                        srcSRS=ds_15_30.GetSpatialRef(), 
-                        dstSRS=extent_raster.GetSpatialRef(), 
-                        xRes=extent_raster.GetGeoTransform()[1], 
-                        yRes=extent_raster.GetGeoTransform()[5], 
-                        resampleAlg='average', 
-                        outputType=gdal.GDT_Float32, 
-                        outputBounds=region.get_extent())
-
-            # crop them all down to the AOI
-            dst_1530 = gdal.Warp("", ds_15_30, options=warpOpts)
-            dst_3060 = gdal.Warp("", ds_30_60, options=warpOpts)
-            dst_60100 = gdal.Warp("", ds_60_100, options=warpOpts)
-
-            # Find the average over the 3 depth ranges
-            avg = (dst_1530.ReadAsArray() * 15 + dst_3060.ReadAsArray() * 30 + dst_60100.ReadAsArray() * 40) / (150 + 300 + 400)
+        textures = ['clay','sand','silt']
+        depths = ['15-30cm', '30-60cm', '60-100cm']
+        weights = [15, 30, 40]
+        stacks = {}
+        for X in textures:
+            files = [
+                str(pathlib.Path(data_path, f'{X}_{d}_mean_1000.tif')) 
+                for d in depths
+            ]
+            layers = [gdal.Open(f) for f in files]
+            for ds in layers[1:]:
+                assert layers[0].GetSpatialRef().IsSame(ds.GetSpatialRef()), "CRS mismatch"
+            nodata = layers[0].GetRasterBand(1).GetNoDataValue()
+            del layers
+            ## one band per depth
+            stacks[X] = (gdal.BuildVRT('', files, separate=True), nodata)
+
+        _x, _y = region.shape
+        for X in textures:
+            newDS.dataset[f'pct_{X}'] = (
+                ['y','x'], np.empty((_y, _x), dtype=np.float32)
+            )
 
+        region_crs = region.crs.to_wkt()
+        gt = region.transform
+        windows = blocks.block_windows((_y, _x), block_size)
+        logger.info(f'{func_name}: Processing {len(windows)} blocks')
+        for window in windows:
+            rows, cols = window['y'], window['x']
+            block_gt = (
+                gt[0] + cols.start * gt[1], gt[1], 0, 
+                gt[3] + rows.start * gt[5], 0, gt[5]
+            )
+            block = {}
+            for X in textures:
+                vrt, nodata = stacks[X]
+                init = 0 if nodata is None else nodata
+                by_depth = np.full(
+                    (len(depths), rows.stop - rows.start, cols.stop - cols.start), 
+                    init, dtype=np.float32
+                )
+                result = gdal_tools.array_dataset(by_depth, region_crs, block_gt)
+                kwargs = gdal_tools.warp_kwargs()
+                kwargs['warpOptions'] = kwargs.get('warpOptions', []) + [
+                    f'INIT_DEST={init}', 
+                    ## nodata in one depth does not mask the others
+                    'UNIFIED_SRC_NODATA=NO',
+                ]
+                if nodata is not None:
+                    kwargs.update(srcNodata=nodata, dstNodata=nodata)
+                ## exact transformer, the approximation depends on the block
+                kwargs['errorThreshold'] = 0
+                gdal.Warp(result, vrt, resampleAlg='average', **kwargs)
+                result.FlushCache()
+                del result
+
+                # Find the average over the 3 depth ranges
+                block[X] = (
+                    by_depth[0] * weights[0] + by_depth[1] * weights[1] 
+                    + by_depth[2] * weights[2]
+                ) / (10 * sum(weights))
+
+            if normalize:
+                total = block['clay'] + block['sand'] + block['silt']
+                valid = (total > 0) & np.logical_and.reduce(
+                    [block[X] >= 0 for X in textures]
+                )
+                scale = np.where(
+                    valid, np.float32(100) / np.where(valid, total, 1), 1
+                ).astype(np.float32)
+                for X in textures:
+                    block[X] = block[X] * scale
 
-            logger.info(f'{func_name}: Assigning data to the new dataset')
-            newDS.dataset[f'pct_{X}'] = (['y','x'], avg)
+            for X in textures:
+                newDS.dataset[f'pct_{X}'].values[rows, cols] = block[X]
 
         newDS.dataset['pct_clay'].attrs.update(units='percent')
         newDS.dataset['pct_sand'].attrs.update(units='percent')
@@ -503,47 +643,25 @@ class TEMDataset(object):
         ecobiome_geo_df = get_gdf(eco_shp,  'ECO_BIOME_', 'ecobiome_idx',)
         realm_geo_df = get_gdf(eco_shp,  'REALM', 'realm_idx',)
 
-        def burn_gdf(raster_fpath, gdf, idx_col, meta):
-            f2 = func_name + ".burn_gdf"
-            with rio.open(raster_fpath, 'w+', **meta) as out:
-                out_arr = out.read(1)
-                shapes = ((geom,value) for geom, value in zip(gdf.geometry, gdf[idx_col]))
-                burned = rio.features.rasterize(shapes=shapes, fill=-9999, out=out_arr, transform=out.transform)
-                logger.info(f'{f2}: Writing {raster_fpath}')
-                out.write_band(1, burned)
-
-        files = [
-            '/tmp/country_raster_temp_from_veg.tif',
-            '/tmp/state_raster_temp_from_veg.tif',
-            '/tmp/eco_raster_temp_from_veg.tif',
-            '/tmp/biome_raster_temp_from_veg.tif',
-            '/tmp/ecobiome_raster_temp_from_veg.tif',
-            '/tmp/realm_raster_temp_from_veg.tif',
-            '/tmp/TEM_Landcover_V4_temp_from_veg.tif',
-            '/tmp/drainage_raster_temp_from_veg.tif',
-        ]
-        [os.unlink(f) for f in files if os.path.exists(f)]
-
-        # meta = ER.meta.copy()
-        meta = {
-            'driver': 'GTiff',
-            'dtype': 'float32',
-            'nodata': None,
-            'width': region.shape[0],
-            'height': region.shape[1],
-            'count': 1,
-            'crs': region.crs,
-            'transform': Affine.from_gdal(*region.transform),
-            'compress': 'lzw'
+        out_shape = (region.shape[1], region.shape[0])
+        transform = Affine.from_gdal(*region.transform)
+        logger.info(f'{func_name}: Rasterizing shapefiles')
+        burn_rows = lambda gdf: temds.datasources.vegetation.burn_rows(
+            gdf, out_shape, transform
+        )
+        political_rows = burn_rows(political_shp)
+        eco_rows = burn_rows(eco_shp)
+        to_index = lambda rows, gdf, idx_col: \
+            temds.datasources.vegetation.rows_to_index(rows, gdf[idx_col].values)
+        indices = {
+            'ctry_idx': to_index(political_rows, country_geo_df, 'ctry_idx'),
+            'state_idx': to_index(political_rows, state_geo_df, 'state_idx'),
+            'eco_idx': to_index(eco_rows, eco_geo_df, 'eco_idx'),
+            'biome_idx': to_index(eco_rows, biome_geo_df, 'biome_idx'),
+            'ecobiome_idx': to_index(eco_rows, ecobiome_geo_df, 'ecobiome_idx'),
+            'realm_idx': to_index(eco_rows, realm_geo_df, 'realm_idx'),
         }
-
-        # meta.update(compress='lzw')
-        burn_gdf('/tmp/country_raster_temp_from_veg.tif', country_geo_df, 'ctry_idx', meta)
-        burn_gdf('/tmp/state_raster_temp_from_veg.tif', state_geo_df, 'state_idx', meta)
-        burn_gdf('/tmp/eco_raster_temp_from_veg.tif', eco_geo_df, 'eco_idx', meta)
-        burn_gdf('/tmp/biome_raster_temp_from_veg.tif', biome_geo_df, 'biome_idx', meta)
-        burn_gdf('/tmp/ecobiome_raster_temp_from_veg.tif', ecobiome_geo_df, 'ecobiome_idx', meta)
-        burn_gdf('/tmp/realm_raster_temp_from_veg.tif', realm_geo_df, 'realm_idx', meta)
+        del political_rows, eco_rows
 
         extent_raster = region.empty_gdal_dataset()
         logger.info(f"{func_name}: Convert the TEM_Landcover_V4 to match the  AOI raster in extents and resolution")
@@ -553,10 +671,8 @@ class TEMDataset(object):
             options=gdal.WarpOptions(
                 resampleAlg='mode',
             ))
-        extent_raster.FlushCache()
-        driver = gdal.GetDriverByName('GTiff')
-        driver.CreateCopy("/tmp/TEM_Landcover_V4_temp_from_veg.tif",extent_raster)
-        del(driver)
+        indices['lc_idx'] = extent_raster.GetRasterBand(1).ReadAsArray()
+        del extent_raster
 
         if 'topo' in region.data:
             topo = region.data['topo']
@@ -568,214 +684,24 @@ class TEMDataset(object):
             except Exception as e:
                 raise RuntimeError(f"{func_name}: Problem loading topo data. Expection: {e}")
 
-        # Make sure we only write out the variable we are interested in.
-        topo.dataset['drainage_class'].astype(np.int32).rio.to_raster("/tmp/drainage_raster_temp_from_veg.tif")
+        # Make sure we only use the variable we are interested in.
+        drainage = topo.dataset['drainage_class'].astype(np.int32).values
+        indices['drain_idx'] = drainage[0] if drainage.ndim == 3 else drainage
 
-        index_names = ['ctry_idx', 'state_idx', 'eco_idx', 'biome_idx', 'ecobiome_idx', 'realm_idx', 'lc_idx', 'drain_idx']
-        
-        def generate_indices(files, index_names):
-            # Reads in each raster, flattens it and creates a data frame 
-            # with an index set on the dataframe...
-            f2 = func_name + "generate_indices"
-            for f, idx_name in zip(files, index_names):
-                with rio.open(f) as src:
-                    logger.debug(f"{f2} reading {f} with shape {src.shape}")
-                    arr = src.read(1)
-                    df = pd.DataFrame(arr.flatten())
-                    df = df.set_axis([idx_name], axis=1)
-                    yield df
-        
-        # This is a table with one row per pixel and columns for each index.
-        logger.info(f"{func_name}: Creating the ecotype table by concatening all the indices...")
-        ecotype = pd.concat(list(generate_indices(files, index_names)), axis=1)
-        
         logger.info(f"{func_name}: Loading the land cover classification...")
         classif = pd.read_csv(land_cover_classes)
         classif = classif.rename(columns={"value": "lc_idx"})
         classif = classif.rename(columns={"classname ": "classname"}) # there is a trailing space in the csv column name
 
-        
-        ecotype['classname'] = 'N/A'
-        for row in classif.T: 
-            lc_idx = classif.loc[row,'lc_idx']
-            cn = classif.loc[row,'classname']
-            idx = (ecotype['lc_idx'] == lc_idx)
-            ecotype.loc[idx, 'classname'] = cn
-
-
-        # Put back in the text based lables for country and state (shapeName and shapeGroup)
-        ecotype = pd.merge(ecotype, state_geo_df.drop(['geometry', 'shapeType', 'shapeID'], axis=1), on=['state_idx'], how='left')
-
-        # put back in the text based labels for biome, realm, etc
-        ecotype = pd.merge(ecotype, eco_geo_df.drop(['OBJECTID','BIOME_NUM','ECO_BIOME_','NNH','ECO_ID','SHAPE_LENG','SHAPE_AREA','NNH_NAME','COLOR', 'COLOR_BIO', 'COLOR_NNH', 'LICENSE', 'geometry',], axis=1), on=['eco_idx'], how='left')
-
-        # Add subregion column
-        ecotype['subregion'] = "N/A"
-
-        idx = ( (ecotype['shapeName'] == 'Alaska') | \
-                    (ecotype['ECO_NAME'] == 'Pacific Coastal Mountain icefields and tundra') | \
-                    (ecotype['ECO_NAME'] == 'Alaska-St. Elias Range tundra') | \
-                    (ecotype['ECO_NAME'] == 'Interior Yukon-Alaska alpine tundra') | \
-                    (ecotype['ECO_NAME'] == 'Brooks-British Range tundra') | \
-                    (ecotype['ECO_NAME'] == 'Arctic foothills tundra') | \
-                    (ecotype['ECO_NAME'] == 'Interior Yukon-Alaska alpine tundra') )
-        ecotype['subregion'] = np.where(idx, 'Western North America', ecotype['subregion'])
-
-        idx = ( (ecotype['shapeGroup'] == 'CAN') & (ecotype['ECO_NAME'] == 'Ogilvie-MacKenzie alpine tundra') )
-        ecotype['subregion'] = np.where(idx, 'Central North America', ecotype['subregion'])
-
-        idx = ( ((ecotype['shapeGroup'] == 'CAN') | (ecotype['shapeGroup'] == 'GRL')) & \
-                    (ecotype['shapeName'] == 'Quebec') |  \
-                    (ecotype['shapeName'] == 'Ontario') | \
-                    (ecotype['shapeName'] == 'Newfoundland and Labrador') | \
-                    (ecotype['ECO_NAME'] == 'Southern Hudson Bay taiga') | \
-                    (ecotype['ECO_NAME'] == 'Central Canadian Shield forests') | \
-                    (ecotype['ECO_NAME'] == 'Eastern Canadian Forest-Boreal transition') )
-        ecotype['subregion'] = np.where(idx, 'Eastern North America', ecotype['subregion'])
-
-
-        idx = ( (ecotype['shapeGroup'] == 'RUS') )
-        ecotype['subregion'] = np.where(idx, 'Eastern Eurasia', ecotype['subregion'])
-
-        idx = ( (ecotype['ECO_NAME'] == 'Yamal-Gydan tundra') | \
-                   (ecotype['ECO_NAME'] == 'Russian Arctic desert') | \
-                   (ecotype['ECO_NAME'] == 'West Siberian taiga') | \
-                   (ecotype['ECO_NAME'] == 'Western Siberian hemiboreal forests') | \
-                   (ecotype['ECO_NAME'] == 'South Siberian forest steppe') | \
-                   (ecotype['ECO_NAME'] == 'Northwest Russian-Novaya Zemlya tundra') | \
-                   (ecotype['ECO_NAME'] == 'Trans-Baikal conifer forests') | \
-                   (ecotype['ECO_NAME'] == 'Kazakh forest steppe') ) 
-        ecotype['subregion'] = np.where(idx, 'Central Eurasia', ecotype['subregion'])
-
-        idx = ( (ecotype['shapeGroup'] == 'NOR') | \
-                   (ecotype['shapeGroup'] == 'SWE') | \
-                   (ecotype['shapeGroup'] == 'FIN') | \
-                   (ecotype['shapeGroup'] == 'ISL') | \
-                   (ecotype['ECO_NAME'] == 'Kola Peninsula tundra') | \
-                   (ecotype['ECO_NAME'] == 'Scandinavian and Russian taiga') | \
-                   (ecotype['ECO_NAME'] == 'Temperate Broadleaf & Mixed Forests') | \
-                   (ecotype['ECO_NAME'] == 'Urals montane forest and taiga') )
-        ecotype['subregion'] = np.where(idx, 'Western Eurasia', ecotype['subregion']) 
-
-        # Add an alpine column
-        ecotype['alpine'] = 'N/A'
-        alpine_idx = ( ecotype['ECO_NAME'].str.contains('alpine', case=False) | \
-                       ecotype['ECO_NAME'].str.contains('montane', case=False) | \
-                       ecotype['ECO_NAME'].str.contains('mountain', case=False) | \
-                       ecotype['ECO_NAME'].str.contains('mountains', case=False) | \
-                       ecotype['ECO_NAME'].str.contains('range', case=False) | \
-                       ecotype['ECO_NAME'].str.contains('rockies', case=False) | \
-                       ecotype['ECO_NAME'].str.contains('cordillera', case=False) | \
-                       ecotype['ECO_NAME'].str.contains('rock', case=False) )
-        ecotype['alpine'] = np.where(alpine_idx, 1, 0)
-
-        # add a community column
-        ecotype['community '] = 'N/A'
-
-        idx = ( (ecotype['classname'] == 'White Spruce forest') )
-        ecotype['community'] = np.where(idx, 'white spruce forest', ecotype['community '])
-
-        idx = ( (ecotype['classname'] == 'Black Spruce forest') | \
-                (ecotype['classname'] == 'Spruce forest') | \
-                (ecotype['classname'] == 'Fir forest') | \
-                (ecotype['classname'] == 'Hemlock forest') )
-        ecotype['community'] = np.where(idx, 'black spruce forest', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Aspen forest') )
-        ecotype['community'] = np.where(idx, 'aspen forest', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Birch forest') | \
-                (ecotype['classname'] == 'Poplar forest') | \
-                (ecotype['classname'] == 'Maple') | \
-                (ecotype['classname'] == 'Oak forest') | \
-                (ecotype['classname'] == 'Linden') )
-        ecotype['community'] = np.where(idx, 'birch forest', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Mixed forest') )
-        ecotype['community'] = np.where(idx, 'mixed forest', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Larch forest') )
-        ecotype['community'] = np.where(idx, 'larch forest', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Scotts Pine forest') | \
-                (ecotype['classname'] == 'Siberian Pine') )
-        ecotype['community'] = np.where(idx, 'scots pine forest', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Jack Pine forest') | \
-                (ecotype['classname'] == 'Pine forest') )
-        ecotype['community'] = np.where(idx, 'jack pine forest', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Pine forest') & (ecotype['REALM'] == 'Palearctic') )
-        ecotype['community'] = np.where(idx, 'scots pine forest', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Herbaceous') | \
-                (ecotype['classname'] == 'Graminoid tundra') )
-        ecotype['community'] = np.where(idx, 'tussock tundra', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Other shrublands') | \
-                (ecotype['classname'] == 'Cedar Elfin Wood') | \
-                (ecotype['classname'] == 'Erect-shrub tundra') | \
-                (ecotype['classname'] == 'Shrub tundra') | \
-                (ecotype['classname'] == 'Alpine shrubland') | \
-                (ecotype['classname'] == 'Prostrate-shrub tundra') | \
-                (ecotype['classname'] == 'Riparian shrubland') )
-        ecotype['community'] = np.where(idx, 'shrub tundra', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Barren tundra') | \
-                (ecotype['classname'] == 'Sparsely Vegetated') )
-        ecotype['community'] = np.where(idx, 'heath tundra', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Fen') )
-        ecotype['community'] = np.where(idx, 'fen', ecotype['community'])
-
-        idx = ( (ecotype['classname'] == 'Bog') )
-        ecotype['community'] = np.where(idx, 'bog', ecotype['community'])
-        
-        idx = ( (ecotype['classname'] == 'Wet-sedge tundra') | \
-                (ecotype['classname'] == 'Marsh') )
-        ecotype['community'] = np.where(idx, 'wetsedge tundra', ecotype['community'])
-
-        ecotype['CMT'] = 'CMT00'
-        ecotype['CMT'] = np.where((ecotype['community'] == 'black spruce forest'),'CMT01',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'white spruce forest'),'CMT02',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'jack pine forest'),'CMT66',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'scots pine forest'),'CMT74',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'larch forest'),'CMT71',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'mixed forest'),'CMT67',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'birch forest'),'CMT03',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'aspen forest'),'CMT65',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'shrub tundra'),'CMT04',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'tussock tundra'),'CMT05',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'heath tundra'),'CMT07',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'wetsedge tundra'),'CMT06',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'bog'),'CMT31',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'fen'),'CMT55',ecotype['CMT'])
-
-        # drain_idx: 1 --> poorly drained, 0 --> well drained
-        ecotype['CMT'] = np.where((ecotype['community'] == 'black spruce forest') & (ecotype['subregion'] == 'Western North America') & (ecotype['drain_idx'] == 1), 'CMT13', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'black spruce forest') & ((ecotype['subregion'] == 'Central North America') | (ecotype['subregion'] == 'Eastern North America')) & (ecotype['drain_idx'] == 1), 'CMT60', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'black spruce forest') & ((ecotype['subregion'] == 'Central North America') | (ecotype['subregion'] == 'Eastern North America')) & (ecotype['drain_idx'] == 0), 'CMT69', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'bog') & ((ecotype['subregion'] == 'Central North America') | (ecotype['subregion'] == 'Eastern North America')), 'CMT61', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'bog') & ((ecotype['subregion'] == 'Eastern Eurasia') | (ecotype['subregion'] == 'Central Eurasia')), 'CMT75', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'bog') & (ecotype['subregion'] == 'Western Eurasia'), 'CMT80', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'bog') & ((ecotype['ECO_NAME'] == 'Russian Arctic desert') | (ecotype['ECO_NAME'] == 'Kola Peninsula tundra') | (ecotype['ECO_NAME'] == 'Scandinavian coastal conifer forests') | (ecotype['ECO_NAME'] == 'Scandinavian Montane Birch forest and grasslands')) , 'CMT92', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'fen') & (ecotype['REALM'] == 'Palearctic') , 'CMT91', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'heath tundra') & (ecotype['subregion'] == 'Central North America'), 'CMT52', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'heath tundra') & (ecotype['subregion'] == 'Eastern North America'), 'CMT90', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'heath tundra') & (ecotype['REALM'] == 'Palearctic'), 'CMT90', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'larch forest') & ((ecotype['subregion'] == 'Central Eurasia') | (ecotype['subregion'] == 'Western Eurasia')),'CMT72',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'mixed forest') & (ecotype['REALM'] == 'Palearctic'),'CMT77',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'scots pine forest') & (ecotype['subregion'] == 'Western Eurasia'),'CMT82',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'shrub tundra') & ((ecotype['subregion'] == 'Central North America') | (ecotype['subregion'] == 'Eastern North America')), 'CMT50', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'shrub tundra') & (ecotype['subregion'] == 'Eastern Eurasia'), 'CMT70', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'shrub tundra') & ((ecotype['subregion'] == 'Western Eurasia') | (ecotype['subregion'] == 'Central Eurasia')), 'CMT76', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'shrub tundra') & (ecotype['alpine'] == 'alpine'),'CMT20',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'tussock tundra') & ((ecotype['subregion'] == 'Central North America') | (ecotype['subregion'] == 'Eastern North America')), 'CMT51', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'tussock tundra') & (ecotype['REALM'] == 'Palearctic'), 'CMT73', ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'tussock tundra') & (ecotype['alpine'] == 'alpine'),'CMT21',ecotype['CMT'])
-        ecotype['CMT'] = np.where((ecotype['community'] == 'wetsedge tundra') & (ecotype['REALM'] == 'Palearctic'), 'CMT77', ecotype['CMT'])
-
-        ecotype['CMT_num'] = pd.to_numeric(ecotype['CMT'].str.extract('(\d+)', expand=False)).fillna(np.int32(-9999)).astype(np.int32)
+        logger.info(f"{func_name}: Classifying CMTs...")
+        cmt_num, unmatched = temds.datasources.vegetation.classify_cmt(
+            indices, classif, state_geo_df, eco_geo_df
+        )
+        if len(unmatched) > 0:
+            logger.warn(
+                f"{func_name}: {unmatched['pixels'].sum()} pixels have no "
+                f"community (CMT00):\n{unmatched.to_string(index=False)}"
+            )
 
         logger.info(f'{func_name}: Creating empty xarray dataset')
         newDS = TEMDataset.from_region(region, 
@@ -788,7 +714,7 @@ class TEMDataset(object):
         newDS.dataset['veg_class'] = (
             ['y','x'], ( 
                 np.reshape(
-                    ecotype['CMT_num'], (region.shape[1],region.shape[0])
+                    cmt_num, (region.shape[1],region.shape[0])
                 ).astype(float) # need to figure out issue with saving int data
             )
         )
@@ -943,12 +869,16 @@ class TEMDataset(object):
             # extent_raster=None,
             overwrite=False, 
             logger=Logger(),
-            resample_alg='bilinear'
+            resample_alg='bilinear',
+            n_workers=1,
         ):
         """Creates a TEMDataset that will pass `verify` from source Worldclim
         data. Can be used to download data or create from local data. Uses
         GDAL.Warp to convert data  to extent, crs, and resolution 
-        from `extent_raster`
+        from `extent_raster`. Monthly GeoTIFFs are read from the downloaded
+        .zip archives (with /vsizip/) unless they have been extracted, and
+        each month and variable is warped into its slice of the dataset's
+        (12, y, x) arrays on a thread pool.
 
         Parameters
         ----------
@@ -978,6 +908,9 @@ class TEMDataset(object):
         resample_alg: str, defaults 'bilinear'
             Resampling algorithm for converting source data to 
             extent, crs, and resolution from `extent_raster`
+        n_workers: int, defaults 1
+            Number of threads warping months at the same time. Each warp
+            also uses the threads from `gdal_tools.get_warp_threads`
 
         Returns
         -------
@@ -1021,7 +954,32 @@ class TEMDataset(object):
             f'{func_name}: Running gdal.Warp to extent {region.get_extent()} on all data'
         )
 
-        result = region.empty_gdal_dataset()
+        region_crs = region.crs.to_wkt()
+        def warp_month(var, idx):
+            ## warp straight into the dataset's (12, y, x) array
+            pixels = new.dataset[var].values[idx] # 0based index
+            data_raster = worldclim.raster_path(
+                completed[var], var, version, resolution, idx + 1
+            )
+            logger.debug((
+                f'{func_name}: loading {var} data from {data_raster} for '
+                f'month {idx + 1} at index {idx}'
+            ))
+            result = gdal_tools.array_dataset(
+                pixels, region_crs, region.transform
+            )
+            gdal.Warp(
+                result, data_raster, 
+                resampleAlg=resample_alg,
+                # dstNodata=-3.4e+38,
+                # outputType=gdal.GDT_Float32,
+                **gdal_tools.warp_kwargs()
+            )
+            result.FlushCache()
+            del(result)
+
+            pixels[pixels <= -3e30] = np.nan # fix
+
         for var in in_vars:
             cv = climate_variables.lookup_alias(worldclim.NAME, var)
             unit = cv.std_unit.name
@@ -1030,31 +988,14 @@ class TEMDataset(object):
             ## this is inplace as opposed to assign_attrs
             new.dataset[var].attrs.update(units=unit, name=v_name)
 
-            in_dir = completed[var]
-            for month in range(1,13):
-                idx = month-1
-                name = worldclim.name_for(
-                    var, version, resolution, month
-                )
-                data_raster = Path(in_dir, f'{name}.tif')
-                
-                logger.debug((
-                    f'{func_name}: loading {var} data from {data_raster} for '
-                    f'month {month} at index {idx}'
-                ))
-  
-                gdal.Warp(
-                    result, data_raster, 
-                    resampleAlg=resample_alg,
-                    # dstNodata=-3.4e+38,
-                    # outputType=gdal.GDT_Float32,
-                )
-                pixels = result.ReadAsArray()
-
-                pixels[pixels <= -3e30] = np.nan # fix
-                
-                new.dataset[var][idx] = pixels # 0based index
-                [gc.collect(i) for i in range(2)]
+        months = [(var, idx) for var in in_vars for idx in range(12)]
+        n_workers = max(1, min(int(n_workers), len(months)))
+        logger.info(
+            f'{func_name}: Warping {len(months)} months with {n_workers} workers'
+        )
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            ## list() raises the first exception from a worker
+            list(pool.map(lambda args: warp_month(*args), months))
 
         ## any Unit conversions
         source = 'worldclim'
@@ -1108,6 +1049,22 @@ class TEMDataset(object):
                 gdal datatype
             'prime_warp': bool, defaults True
                 When True primes gdal warp
+            'use_warp_plan': bool, defaults True
+                When True, and the resampling algorithm is supported, 
+                resample with a cached `warp_plan.WarpPlan` instead of 
+                gdal.Warp
+            'warp_plan': warp_plan.WarpPlan, optional
+                prebuilt plan (see `get_warp_plan`), ignored if it does not
+                match the source and destination grids
+            'single_pass_warp': bool, defaults True
+                When gdal.Warp is used, if True all variables are stacked
+                and warped in one call, otherwise each variable is warped
+                separately
+            'debug_artifact_dir': Path, optional
+                When gdal.Warp is used, save the warped destination here as
+                a GeoTIFF for debugging. Defaults to the 
+                TEMDS_DEBUG_ARTIFACT_DIR environment variable, nothing is 
+                saved when neither is set
         
 
         Returns
@@ -1174,6 +1131,82 @@ class TEMDataset(object):
 
         return TEMDataset(tile)
         
+    def _warp_grids(self, working_dataset, minx, miny, maxx, maxy, 
+                          resolution, dest_gt=None):
+        """Find the source and destination grids for clipping with gdal
+        or a `WarpPlan`
+
+        Parameters
+        ----------
+        working_dataset: xr.Dataset
+            in memory dataset being clipped
+        minx, miny, maxx, maxy: float
+            extent coords
+        resolution: tuple
+            (x, y) resolution of destination
+        dest_gt: tuple, optional
+            gdal geotransform of destination. Found from extent and 
+            `resolution` when None
+
+        Returns
+        -------
+        tuple
+            (source_x, source_y, source_gt, dest_x, dest_y, dest_gt)
+        """
+        dest_x, dest_y = abs(int((maxx-minx)/resolution[0])), abs(int((maxy-miny)/resolution[1]))
+        if dest_gt is None:
+            # NOTE: assumes north up
+            dest_gt = minx, resolution[0], 0.0, maxy, 0.0, resolution[1]    
+
+        if hasattr(working_dataset, 'lat') and hasattr(working_dataset, 'lon'):
+            source_x = working_dataset.lon.shape[0]
+            source_y = working_dataset.lat.shape[0]
+        else: # x and y 
+            source_x = working_dataset.x.shape[0]
+            source_y = working_dataset.y.shape[0]
+
+        source_gt = working_dataset.rio.transform()
+        source_gt = source_gt.c, source_gt.a, source_gt.b, source_gt.f, source_gt.d, source_gt.e
+        return source_x, source_y, source_gt, dest_x, dest_y, dest_gt
+
+    def get_warp_plan(self, minx, miny, maxx, maxy, extent_crs, **kwargs):
+        """Get the `WarpPlan` that `get_by_extent` would use for this
+        dataset and extent. Datasets on the same grid share a plan, so it can 
+        be built once and passed to `get_by_extent` as the 'warp_plan' kwarg.
+
+        Parameters
+        ----------
+        see `get_by_extent`
+
+        Returns
+        -------
+        warp_plan.WarpPlan or None
+            None when the resampling algorithm or gdal type is not supported
+            by `WarpPlan`, and gdal.Warp is used.
+        """
+        lookup = lambda key, default: kwargs[key] if key in kwargs else default
+        resample_alg = lookup('resample_alg', 'bilinear')
+        if not lookup('use_warp_plan', True) or \
+                lookup('gdal_type', gdal.GDT_Float32) not in WARP_PLAN_GDAL_TYPES or \
+                resample_alg not in warp_plan.SUPPORTED_ALGORITHMS:
+            return None
+
+        resolution = lookup('resolution', None)
+        working_dataset = self.dataset
+        if resolution is None:
+            resolution = working_dataset.rio.resolution()
+        source_x, source_y, source_gt, dest_x, dest_y, dest_gt = \
+            self._warp_grids(
+                working_dataset, minx, miny, maxx, maxy, resolution, 
+                lookup('dest_gt', None)
+            )
+        return warp_plan.get_warp_plan(
+            (source_y, source_x), tuple(source_gt), 
+            working_dataset.rio.crs.to_wkt(),
+            (dest_y, dest_x), tuple(dest_gt), extent_crs.to_wkt(), 
+            resample_alg
+        )
+
     def get_by_extent_gdal(self, minx, miny, maxx, maxy, extent_crs, **kwargs):
         """Returns xr.dataset for use in downscaling
 
@@ -1193,6 +1226,7 @@ class TEMDataset(object):
         self.logger.debug(f'{funcname}: Starting with extent {minx},{miny},{maxx},{maxy}')
 
         working_dataset = self.dataset
+        lookup = lambda key, default: kwargs[key] if key in kwargs else default
         
         resolution = kwargs['resolution']
         nd_as_array = kwargs['warp_no_data_as_array']
@@ -1218,24 +1252,10 @@ class TEMDataset(object):
         # driver = gdal.GetDriverByName("MEM")
 
         ## clipped shape, and geotransform
-        dest_x, dest_y = abs(int((maxx-minx)/resolution[0])), abs(int((maxy-miny)/resolution[1]))
-        if dest_gt is None:
-            # NOTE: assumes north up
-            dest_gt = minx, resolution[0], 0.0, maxy, 0.0, resolution[1]    
-        # print(dest_gt)
-
-        if hasattr(working_dataset, 'lat') and hasattr(working_dataset, 'lon'):
-            source_x = working_dataset.lon.shape[0]
-            source_y = working_dataset.lat.shape[0]
-        else: # x and y 
-            source_x = working_dataset.x.shape[0]
-            source_y = working_dataset.y.shape[0]
-
-       
-        source_gt = working_dataset.rio.transform()
-        # source_gt = source_gt.c, abs(source_gt.a), source_gt.b, source_gt.f, source_gt.d, abs(source_gt.e)
-        source_gt = source_gt.c, source_gt.a, source_gt.b, source_gt.f, source_gt.d, source_gt.e
-        # print(source_gt)
+        source_x, source_y, source_gt, dest_x, dest_y, dest_gt = \
+            self._warp_grids(
+                working_dataset, minx, miny, maxx, maxy, resolution, dest_gt
+            )
 
         # N time steps
         if hasattr(working_dataset, 'time') and working_dataset['time'].size > 0:
@@ -1253,25 +1273,76 @@ class TEMDataset(object):
 
 
         dest_crs = extent_crs.to_wkt()
-
-        dest = gdal_tools.empty_dataset(
-            dest_x, dest_y, dest_crs, dest_gt, n_ts, gdal_type
-        )
-        driver = gdal.GetDriverByName('GTiff')
-        driver.CreateCopy('sample-dest.tif', dest)
-
         source_crs = working_dataset.rio.crs.to_wkt()
-        source = gdal_tools.empty_dataset(
-            source_x, source_y, source_crs, source_gt, n_ts, gdal_type
-        )
 
+        plan = None
+        if lookup('use_warp_plan', True) and gdal_type in WARP_PLAN_GDAL_TYPES:
+            plan_args = (
+                (source_y, source_x), tuple(source_gt), source_crs,
+                (dest_y, dest_x), tuple(dest_gt), dest_crs, resample_alg
+            )
+            plan = lookup('warp_plan', None)
+            if plan is None or not plan.matches(*plan_args):
+                plan = warp_plan.get_warp_plan(*plan_args)
+
+        if plan is not None:
+            self.logger.debug(f'{funcname}: resampling with {plan}')
+            dtype = gdal_array.GDALTypeCodeToNumericTypeCode(gdal_type)
+            data_arrays = {
+                var: plan.apply(working_dataset[var].values, dtype) 
+                for var in self.vars
+            }
+        else:
+            self.logger.debug(f'{funcname}: resampling with gdal.Warp')
+            debug_dir = lookup('debug_artifact_dir', None)
+            if lookup('single_pass_warp', True):
+                ## all variables are stacked as bands and warped at once.
+                ## The gdal bands point at the variable arrays and at
+                ## `dest_buffer` so nothing is copied in or out of gdal
+                dtype = gdal_array.GDALTypeCodeToNumericTypeCode(gdal_type)
+                source_arrays = [
+                    np.ascontiguousarray(working_dataset[var].values, dtype=dtype)
+                    for var in self.vars
+                ]
+                dest_buffer = np.zeros(
+                    (len(self.vars),) + source_arrays[0].shape[:-2] + (dest_y, dest_x),
+                    dtype=dtype
+                )
+                source = gdal_tools.array_dataset(source_arrays, source_crs, source_gt)
+                dest = gdal_tools.array_dataset(dest_buffer, dest_crs, dest_gt)
+
+                run_primer = run_primer and any(
+                    np.isnan(cur).any() for cur in source_arrays
+                )
+                gdal_tools.clip_stacked(dest, source, resample_alg, run_primer, nd_as_array)
+                gdal_tools.save_debug_artifact(dest, 'clip-dest', debug_dir)
+                data_arrays = {
+                    var: dest_buffer[idx] for idx, var in enumerate(self.vars)
+                }
+                ## datasets must go before the arrays they point at
+                self.logger.debug(f"{funcname}: cleaning up gdal source and dest datasets")
+                del(source)
+                del(dest)
+                del(source_arrays)
+            else:
+                ## each variable is warped separately
+                dest = gdal_tools.empty_dataset(
+                    dest_x, dest_y, dest_crs, dest_gt, n_ts, gdal_type
+                )
 
-        ## option 2
-        vars_dict = {var: working_dataset[var].values for var in self.vars }
-        data_arrays = gdal_tools.clip_opt_2(dest, source, vars_dict, resample_alg, run_primer, nd_as_array)
-        self.logger.debug(f"{funcname}: deleting vars_dict")
+                source = gdal_tools.empty_dataset(
+                    source_x, source_y, source_crs, source_gt, n_ts, gdal_type
+                )
 
-        del(vars_dict)
+                ## option 2
+                vars_dict = {var: working_dataset[var].values for var in self.vars }
+                data_arrays = gdal_tools.clip_opt_2(dest, source, vars_dict, resample_alg, run_primer, nd_as_array)
+                gdal_tools.save_debug_artifact(dest, 'clip-dest', debug_dir)
+                self.logger.debug(f"{funcname}: deleting vars_dict")
+                del(vars_dict)
+                self.logger.debug(f"{funcname}: cleaning up gdal source and dest datasets")
+                del(source)
+                del(dest)
             
         ## we want these to be the center of the pixels so for x and y the range
         self.logger.debug(f"{funcname}: ...building xarray Dataset from clipped data")
@@ -1322,9 +1393,6 @@ class TEMDataset(object):
         self.logger.debug(f"{funcname}: writing coordinate system to Dataset in place")
         tile.rio.write_transform(Affine.from_gdal(*dest_gt), inplace=True)
 
-        self.logger.debug(f"{funcname}: cleaning up gdal source and dest datasets")
-        del(source)
-        del(dest)
         self.logger.debug(f"{funcname}: ...forcing garbage collection" )
         gc.collect()
         self.logger.debug(f"{funcname}: ...trimming malloc'd memory (pass thru lambda on some systems...)" )
@@ -1363,25 +1431,19 @@ class TEMDataset(object):
                 
             
         if hasattr(local_dataset, 'lat') and hasattr(local_dataset, 'lon'):
-            mask_x = ( local_dataset.lon >= minx ) & ( local_dataset.lon <= maxx )
-            mask_y = ( local_dataset.lat >= miny ) & ( local_dataset.lat <= maxy )
-            
             full_minx = int(local_dataset.lon.values[0])
             full_miny = int(local_dataset.lat.values[0])
             
             full_maxx = int(local_dataset.lon.values[-1])
             full_maxy = int(local_dataset.lat.values[-1])
         else: # x and y 
-            mask_x = ( local_dataset.x >= minx ) & ( local_dataset.x <= maxx )
-            mask_y = ( local_dataset.y >= miny ) & ( local_dataset.y <= maxy )
-            
             full_minx = int(local_dataset.x.values[0])
             full_miny = int(local_dataset.y.values[0])
             
             full_maxx = int(local_dataset.x.values[-1])
             full_maxy = int(local_dataset.y.values[-1])
 
-        tile = local_dataset.where(mask_x&mask_y, drop=True)
+        tile = subset.isel_bbox(local_dataset, minx, miny, maxx, maxy)
 
         
         # if tile.rio.crs.to_epsg() != 4326:
@@ -1589,6 +1651,9 @@ class TEMDataset(object):
         else:
             self.logger.info("Dataset is missing lon/lat dimensions. Using default x, y spatial dimensions.")
 
+        ## rioxarray does not recognize 'lon'/'lat' on its own
+        in_dataset = in_dataset.rio.set_spatial_dims(x_dim, y_dim)
+
         ### some of our old data may not follow conventions
         s_minx, s_miny, s_maxx, s_maxy = in_dataset.rio.bounds()
         # print(s_minx, s_miny, s_maxx, s_maxy)
@@ -1673,7 +1738,9 @@ class TEMDataset(object):
         )
         # keeps values were idx is true, replaces others with mean
         updated = self.dataset[var].where(in_range_ix, mean) 
-        self.dataset[var] = updated
+        ## through the setter, so path backed data is kept in memory
+        ## instead of changing a cached dataset that can be evicted
+        self.dataset = self.dataset.assign({var: updated})
 
     def fill_out_of_bounds(self, var, value, which, fill):
         if which == 'lower':
@@ -1688,7 +1755,7 @@ class TEMDataset(object):
                 ix | np.isnan(self.dataset[var]), # don't fill nans
                 fill 
             ) 
-            self.dataset[var] = updated
+            self.dataset = self.dataset.assign({var: updated})
 
 class YearlyDataset(TEMDataset):
     """This sub class of TEMDataset represents daily data
@@ -1722,7 +1789,7 @@ class YearlyDataset(TEMDataset):
             self.year = int(kwargs['year_override_callback'](dataset.name))
         else:
             try: 
-                self.year = self.dataset.attrs['data_year']
+                self.year = self.attrs['data_year']
             except KeyError:
                 pass 
         
@@ -1976,6 +2043,8 @@ class YearlyDataset(TEMDataset):
                     logger=Logger(),
                     crujra_version = '2.5',
                     sorted_by_var = True, 
+                    decompress_in_memory = False,
+                    decompress_workers = 1,
                     ):
         """Loads source CRUJRA files to YearlyDataset. Data sould be local
         in `data_path` but can be unziped or in .gz form. 
@@ -2002,6 +2071,15 @@ class YearlyDataset(TEMDataset):
             When True files in `data_path` are sorted in to subdirectories 
             by variable
             Otherwise, files are in same directory
+        decompress_in_memory: bool, defaults False
+            When True .gz files are decompressed in memory and opened with
+            netCDF4's in-memory support, instead of being extracted to 
+            `data_path` and deleted after loading
+        decompress_workers: int, defaults 1
+            When `decompress_in_memory` is True, the number of variables
+            decompressed ahead in threads while the current variable is 
+            aggregated. Each decompressed file is kept in memory (~1GB for 
+            the full grid) until its variable is aggregated
 
         Returns
         -------
@@ -2020,47 +2098,83 @@ class YearlyDataset(TEMDataset):
             ### TODO: assumes Data is local, we may wan't to add some download 
             # logic
             
-            cleanup = False
-            datasets = {}
+            var_paths = {}
             for var in crujra.SOURCE_VARS:
                 var_file = f'{crujra.name_for(var, year, crujra_version)}.nc'
                 var_path = Path(data_path, var_file)
                 if sorted_by_var:
                     var_path = Path(data_path, var, var_file)
+                var_paths[var] = var_path
+            gz_path_for = lambda var: Path(
+                var_paths[var].parent, f'{var_paths[var].name}.gz'
+            )
+            compressed = [
+                var for var in crujra.SOURCE_VARS if not var_paths[var].exists()
+            ]
+
+            ## decompress up to `decompress_workers` compressed variables 
+            ## ahead of the one being aggregated
+            to_read = list(compressed) if decompress_in_memory else []
+            prefetch = max(1, decompress_workers) if to_read else 0
+            pool = ThreadPoolExecutor(max_workers=prefetch) if prefetch else None
+            pending = {}
+            def submit():
+                while len(pending) < prefetch and len(to_read) > len(pending):
+                    var = to_read[len(pending)]
+                    pending[var] = pool.submit(file_tools.read_gzip, gz_path_for(var))
+
+            extracted = []
+            datasets = {}
+            try:
+                for var in crujra.SOURCE_VARS:
+                    var_path = var_paths[var]
+                    if pool is not None:
+                        submit()
+                    if var in pending:
+                        buffer = pending.pop(var).result()
+                        to_read.remove(var)
+                    elif decompress_in_memory and var in compressed:
+                        buffer = file_tools.read_gzip(gz_path_for(var))
+                    else:
+                        buffer = None
+
+                    if buffer is not None:
+                        logger.info(f"{func_name}: loading raw data for '{var}' from '{gz_path_for(var)}' in memory")
+                        temp = xr.open_dataset(xr.backends.NetCDF4DataStore(
+                            netCDF4.Dataset(var_path.name, memory=buffer)
+                        ))
+                        del buffer # netCDF4 keeps a reference while open
+                    else:
+                        if var in compressed:
+                            file_tools.extract(gz_path_for(var))
+                            extracted.append(var_path)
+                        logger.info(f"{func_name}: loading raw data for '{var}' from '{var_path}'")
+                        temp = xr.open_dataset(var_path, engine="netcdf4")
+
+                    if extent is not None:
+                        logger.info(f'{func_name}: clipping {var} to aoi')
+                        temp = subset.isel_bbox(
+                            temp, extent.minx, extent.miny, extent.maxx, extent.maxy
+                        )
+
+                    method = crujra.RESAMPLE_LOOKUP[var]
+                    logger.info(f'{func_name}: resampling 6hr {var} to daily by {method}')
+                    if crujra.has_regular_steps(temp.indexes['time']):
+                        datasets[var] = crujra.aggregate_daily(temp, var, method)
+                    else:
+                        logger.warn(f'{func_name}: irregular timesteps for {var}, using xr.resample')
+                        datasets[var] = climate_variables.RESAMPLE_METHODS[method](temp)
+                    temp.close()
+                    datasets[var].attrs.update(cell_methods=f'time:{method}')
+            finally:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
 
-                if not var_path.exists():
-                    gz_path = Path(var_path.parent, f'{var_path.name}.gz')
-                    file_tools.extract(gz_path)
-                    cleanup = True
-
-                            
-                logger.info(f"{func_name}: loading raw data for '{var}' from '{var_path}'")
-                temp = xr.open_dataset(var_path, engine="netcdf4")
-                
-
-                if extent is not None:
-                    logger.info(f'{func_name}: clipping {var} to aoi')
-                    mask_x =  ( temp.lon >= extent.minx ) \
-                            & ( temp.lon <= extent.maxx  )
-                    mask_y =  ( temp.lat >= extent.miny ) \
-                            & ( temp.lat <= extent.maxy )
-                    temp = temp.where(mask_x & mask_y, drop=True)
-
-                method = crujra.RESAMPLE_LOOKUP[var]
-                logger.info(f'{func_name}: resampling 6hr {var} to daily by {method}')
-                datasets[var] = climate_variables.RESAMPLE_METHODS[method](temp)
-                datasets[var].attrs.update(cell_methods=f'time:{method}')
-        
             new = YearlyDataset(year, datasets[crujra.SOURCE_VARS[0]], logger=logger)
             new.dataset = new.dataset.assign({var: datasets[var][var] for var in datasets})
             
-            if cleanup:
-                for var in crujra.SOURCE_VARS:
-                    var_file = f'{crujra.name_for(var, year, crujra_version)}.nc'
-                    var_path = Path(data_path, var_file)
-                    if sorted_by_var:
-                        var_path = Path(data_path, var, var_file)
-                    var_path.unlink()
+            for var_path in extracted:
+                var_path.unlink()
         
 
         
@@ -0,0 +1,166 @@
+"""
+header
+------
+
+Lightweight metadata for TEMDS .nc files. Reading a header only reads the
+netCDF metadata and the (1D) coordinate variables, the data arrays are never
+opened.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import netCDF4
+from affine import Affine
+from pyproj import CRS
+
+
+@dataclass
+class DatasetHeader:
+    """Metadata for a TEMDS .nc file, matching what `TEMDataset.load`
+    would produce for the file.
+
+    Attributes
+    ----------
+    path: Path
+        file the header was read from
+    mtime_ns: int
+        modification time of `path` when the header was read
+    x_dim: str
+        name of x dimension ('x' or 'lon')
+    y_dim: str
+        name of y dimension ('y' or 'lat')
+    shape: tuple
+        (x, y) size of grid
+    transform: Affine
+        geotransform of grid (north up)
+    crs_wkt: str or None
+        WKT of crs
+    vars: list
+        data variable names
+    units: dict
+        variable name: units string, for variables with units
+    n_time: int
+        length of time dimension, 0 if there is none
+    attrs: dict
+        global attributes
+    """
+    path: Path
+    mtime_ns: int
+    x_dim: str
+    y_dim: str
+    shape: tuple
+    transform: Affine
+    crs_wkt: str
+    vars: list
+    units: dict
+    n_time: int
+    attrs: dict
+
+    @property
+    def crs(self):
+        """pyproj.CRS for `crs_wkt`"""
+        return CRS(self.crs_wkt)
+
+    @property
+    def resolution(self):
+        """(x, y) resolution"""
+        return self.transform.a, self.transform.e
+
+    @property
+    def extent(self):
+        """(left, bottom, right, top), bounds of grid"""
+        t = self.transform
+        xs = t.c, t.c + t.a * self.shape[0]
+        ys = t.f, t.f + t.e * self.shape[1]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    @property
+    def data_year(self):
+        """'data_year' attribute or None"""
+        return self.attrs.get('data_year', None)
+
+    def is_current(self, path):
+        """Check the header is for `path` and the file has not changed
+
+        Parameters
+        ----------
+        path: Path
+
+        Returns
+        -------
+        bool
+        """
+        return Path(path) == self.path and \
+            Path(path).stat().st_mtime_ns == self.mtime_ns
+
+
+def read_header(path, crs=None):
+    """Read the header of a TEMDS .nc file
+
+    Parameters
+    ----------
+    path: Path
+        .nc file
+    crs: optional
+        crs to use if the file does not have 'spatial_ref' with 'crs_wkt',
+        same as the 'crs' kwarg of `TEMDataset.load`
+
+    Returns
+    -------
+    DatasetHeader
+    """
+    path = Path(path)
+    mtime_ns = path.stat().st_mtime_ns
+    with netCDF4.Dataset(path, 'r') as nc:
+        nc.set_auto_mask(False)
+        variables = nc.variables
+
+        grid_mapping = {}
+        if 'spatial_ref' in variables:
+            grid_mapping = variables['spatial_ref'].__dict__
+        crs_wkt = grid_mapping.get('crs_wkt', None)
+        if crs_wkt is None and crs is not None:
+            crs_wkt = CRS(crs).to_wkt()
+
+        x_dim, y_dim = 'x', 'y'
+        if 'lon' in variables and 'lat' in variables and crs_wkt is not None \
+                and CRS(crs_wkt) == CRS('EPSG:4326'):
+            x_dim, y_dim = 'lon', 'lat'
+
+        x = np.asarray(variables[x_dim][:], dtype=float)
+        y = np.asarray(variables[y_dim][:], dtype=float)
+
+        ## same as rioxarray: resolution from cached GeoTransform if
+        ## present, otherwise the coordinates, origin from coordinates
+        if 'GeoTransform' in grid_mapping:
+            gt = [float(v) for v in grid_mapping['GeoTransform'].split()]
+            res_x, res_y = gt[1], gt[5]
+        else:
+            res_x = x[1] - x[0] if x.size > 1 else 1.0
+            res_y = y[1] - y[0] if y.size > 1 else 1.0
+        left = x[0] - res_x / 2
+        top = y[0] - res_y / 2
+        if res_y > 0: # ascending y, `load` flips these to north up
+            top = top + res_y * y.size
+            res_y = -res_y
+        transform = Affine(res_x, 0.0, left, 0.0, res_y, top)
+
+        coordinates = set(nc.dimensions)
+        for name in ['spatial_ref'] + [
+                    getattr(var, 'coordinates', '') for var in variables.values()
+                ] + [getattr(nc, 'coordinates', '')]:
+            coordinates.update(name.split())
+        data_vars = [v for v in variables if v not in coordinates]
+
+        units = {
+            v: variables[v].units for v in data_vars
+            if 'units' in variables[v].ncattrs()
+        }
+        n_time = len(nc.dimensions['time']) if 'time' in nc.dimensions else 0
+        attrs = {a: nc.getncattr(a) for a in nc.ncattrs()}
+
+    return DatasetHeader(
+        path, mtime_ns, x_dim, y_dim, (x.size, y.size), transform, crs_wkt,
+        data_vars, units, n_time, attrs
+    )
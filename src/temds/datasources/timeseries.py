@@ -5,6 +5,7 @@ timeseries
 list operations for timeseries based data
 """
 import gc
+import os
 import numbers
 from collections import UserList
 from pathlib import Path
@@ -18,9 +19,10 @@ from joblib import Parallel, delayed
 
 import temds
 from .dataset import YearlyDataset, TEMDataset
+from . import cache
 from . import errors
 from ..logger import Logger
-from .. import climate_variables, constants
+from .. import climate_variables, constants, accumulators
 
 try:
     import ctypes
@@ -44,6 +46,8 @@ class YearlyTimeSeries(UserList):
         start year for data
     logger: Logger
         Logging object
+    cache: cache.DatasetCache or None
+        cache of opened datasets shared by items that are not in memory
     """
 
     def __init__(self, data: list[Path]| list[xr.Dataset] | Path, logger: Logger=Logger(), **kwargs):
@@ -56,9 +60,16 @@ class YearlyTimeSeries(UserList):
         verbose: bool
             verbosity flag
         kwargs:
-            forwarded to YearlyDataset's kwargs 
+            'cache': cache.DatasetCache, optional
+                cache of opened datasets to use for items that are not in 
+                memory, a new cache is created if not provided
+            'cache_bytes': int, defaults cache.DEFAULT_MAX_BYTES
+                memory ceiling for a new cache
+            other kwargs are forwarded to YearlyDataset's kwargs 
         """
         self.logger = logger
+        self.cache = kwargs.pop('cache', None)
+        cache_bytes = kwargs.pop('cache_bytes', cache.DEFAULT_MAX_BYTES)
 
         is_list_ds = isinstance(data, list) and isinstance(data[0], xr.Dataset)
         is_list_of_paths = isinstance(data, list) and isinstance(data[0], Path) 
@@ -92,6 +103,12 @@ class YearlyTimeSeries(UserList):
         
         self.data = sorted(data)
         self.start_year = 0 ## start year not set
+
+        path_backed = [item for item in self.data if isinstance(item._dataset, Path)]
+        if path_backed and self.cache is None:
+            self.cache = cache.DatasetCache(cache_bytes)
+        for item in path_backed:
+            item.cache = self.cache
         
         if hasattr(self.data[0], 'year'):
             self.start_year = self.data[0].year
@@ -182,16 +199,20 @@ class YearlyTimeSeries(UserList):
         raise errors.YearlyTimeSeriesError('+ is not supported in AnnualTimeseries')
 
     def __getitem__(self, index):
-        """Overload __getitem__ to allow year based indexing
+        """Overload __getitem__ to allow year based indexing. Slices share
+        this series' cache
         """
         if isinstance(index, numbers.Integral):
             yr = int(index-self.start_year)
+            return super().__getitem__(yr)
         else: #slice
             start = index.start - self.start_year
             stop = index.stop - self.start_year if index.stop else None
             step = index.step if index.step else None
             yr = slice(start, stop, step)
-        return super().__getitem__(yr)
+            return self.__class__(
+                self.data[yr], logger=self.logger, cache=self.cache
+            )
         
     @property
     def crs(self):
@@ -258,6 +279,17 @@ class YearlyTimeSeries(UserList):
         tiles = []
         parallel =  kwargs['parallel'] if 'parallel' in kwargs else False
 
+        ## every year shares a grid, so build the resampling weights once
+        ## here rather than in every call (or worker process)
+        clip_with = kwargs['clip_with'] if 'clip_with' in kwargs else 'gdal'
+        if clip_with == 'gdal' and 'warp_plan' not in kwargs and len(self.data) > 0:
+            kwargs['warp_plan'] = self.data[0].get_warp_plan(
+                minx, miny, maxx, maxy, extent_crs, **kwargs
+            )
+            self.logger.debug(
+                f"YearlyTimeSeries.get_by_extent: warp plan {kwargs['warp_plan']}"
+            )
+
         helper = lambda item: item.get_by_extent(
                         minx, miny, maxx, maxy, extent_crs,
                         **kwargs
@@ -319,7 +351,7 @@ class YearlyTimeSeries(UserList):
         """
         return range(self.data[0].year, self.data[-1].year+1)
 
-    def synthesize_to_monthly(self, target_vars, new_names=None):
+    def synthesize_to_monthly(self, target_vars, new_names=None, fast=True):
         """Converts target_vars to monthly data (12*N_years timesteps)
 
         Parameters
@@ -331,6 +363,12 @@ class YearlyTimeSeries(UserList):
         new_names: dict
             Maps var names in new dataset
             i.e: {'nirr':'nirr', 'prec':'precip'}
+        fast: bool, defaults True
+            If True, and every year is 365 days of floating point data, 
+            months are reduced with numpy into preallocated arrays one year
+            at a time (see `_synthesize_to_monthly_fast`). Otherwise each
+            year is resampled with xarray and concatenated. Results are the
+            same.
 
         Returns
         -------
@@ -338,12 +376,98 @@ class YearlyTimeSeries(UserList):
             With 12*n_years time steps. Where n_years is the length if
             `self.data`
         """
+        if fast:
+            monthly = self._synthesize_to_monthly_fast(target_vars, new_names)
+            if monthly is not None:
+                return monthly
+            self.logger.info(
+                'YearlyTimeSeries.synthesize_to_monthly: '
+                'data not supported by fast path, using xarray resample'
+            )
+
         monthly = []
         for year in self.range():
             monthly.append(self[year].synthesize_to_monthly(target_vars, new_names))
 
         return xr.concat(monthly, dim='time')
     
+    def _synthesize_to_monthly_fast(self, target_vars, new_names=None):
+        """`synthesize_to_monthly` for 365 day years of floating point data.
+        Each year is loaded in turn and reduced with 
+        `accumulators.resample_monthly` in to a preallocated 
+        (12*n_years, ...) array per variable, so only one year of daily 
+        data is in memory.
+
+        Parameters
+        ----------
+        see `synthesize_to_monthly`
+
+        Returns
+        -------
+        xr.Dataset or None
+            None if the data is not supported, i.e. the time steps are not
+            365 days, or a variable is not floating point
+        """
+        years = list(self.range())
+        first = self[years[0]].dataset
+        templates = {}
+        for var, method in target_vars.items():
+            if var not in first.data_vars or method not in accumulators.MONTHLY_METHODS:
+                return None
+            template = first[var]
+            if template.dims[0] != 'time' or \
+                    not np.issubdtype(template.dtype, np.floating):
+                return None
+            templates[var] = template
+        del first
+
+        buffers = {
+            var: np.empty(
+                (12 * len(years),) + templates[var].shape[1:], 
+                dtype=templates[var].dtype
+            ) for var in templates
+        }
+        month_starts = constants.MONTH_BOUNDS[:-1]
+        month_ends = constants.MONTH_BOUNDS[1:] - 1
+        times = []
+        for idx, year in enumerate(years):
+            ds = self[year].dataset
+            time = ds.indexes['time']
+            if len(time) != 365:
+                return None
+            starts, ends = time[month_starts], time[month_ends]
+            if not ((starts.day == 1) & (starts.month == ends.month)).all():
+                return None
+            times.append(np.asarray(starts.floor('D')))
+
+            for var, method in target_vars.items():
+                data = ds[var]
+                if data.dims != templates[var].dims or \
+                        data.shape != templates[var].shape:
+                    return None
+                accumulators.resample_monthly(
+                    data.values, method, out=buffers[var][12*idx:12*(idx+1)]
+                )
+            del ds
+
+        time = np.concatenate(times)
+        monthly = xr.Dataset({
+            var: xr.DataArray(
+                buffers[var], dims=templates[var].dims, 
+                coords={
+                    'time': time, 
+                    **{
+                        name: coord for name, coord in templates[var].coords.items()
+                        if 'time' not in coord.dims
+                    }
+                },
+                attrs=templates[var].attrs,
+            ) for var in target_vars
+        })
+        if new_names is not None:
+            monthly = monthly.rename(new_names)
+        return monthly
+
     def verify(self):
         """Runs verify on each timestep"""
         verified, reasons = True, []
@@ -354,31 +478,80 @@ class YearlyTimeSeries(UserList):
             reasons += r
         return verified, reasons
 
+    def calculate_daily_stats(
+            self, var, start, end, parallel=False, n_chunks=None, n_jobs=None
+        ):
+        """Per day of year and pixel statistics of `var` across years, from
+        a single read of the data (see `accumulators.DailyStats`).
+
+        Parameters
+        ----------
+        var: str
+            variable name
+        start: int
+            Inclusive start year
+        end: int
+            Inclusive end year
+        parallel: bool, defaults False
+            If True, the year range is split in to `n_chunks` ranges that
+            are processed in parallel threads and merged
+        n_chunks: int, optional
+            number of year ranges when `parallel` is True, defaults to the
+            number of cpus
+        n_jobs: int, optional
+            number of threads when `parallel` is True, defaults to one per
+            year range
+
+        Returns
+        -------
+        accumulators.DailyStats
+            with mean, variance, std, min, max, and count
+        """
+        def helper(years):
+            stats = accumulators.DailyStats()
+            for year in years:
+                stats.add(self[year].dataset[var].values)
+            return stats
+
+        years = list(range(start, end+1))
+        if parallel:
+            n_chunks = n_chunks if n_chunks else os.cpu_count()
+            chunks = [c for c in np.array_split(years, n_chunks) if len(c) > 0]
+            n_jobs = n_jobs if n_jobs else len(chunks)
+            ## shared memory (threads) even under a process backend, so 
+            ## the timeseries is not copied to each worker
+            partial = Parallel(n_jobs=n_jobs, require='sharedmem')(
+                delayed(helper)(chunk) for chunk in chunks
+            )
+            stats = accumulators.DailyStats()
+            for part in partial:
+                stats.merge(part)
+            return stats
+        return helper(years)
+
     def calculate_daily_average(self, var, start, end):
-        temp_sum = None
-        c = 0
-        for year in range(start, end+1):
-            # print(year,self[year].dataset[var].values[0][0][-1])
-            if temp_sum is None:
-                temp_sum = deepcopy(self[year].dataset[var].values)
-            else:
-                temp_sum += self[year].dataset[var].values
-            c+=1
-        return temp_sum / c
+        """Per day of year and pixel mean of `var` for years in 
+        [`start`, `end`]. See `calculate_daily_stats` for getting more 
+        statistics from one read of the data
+
+        Returns
+        -------
+        np.array
+        """
+        stats = self.calculate_daily_stats(var, start, end)
+        return stats.mean.astype(stats.dtype, copy=False)
     
     def calculate_daily_std_dev(self, var, start, end):
-        mean = self.calculate_daily_average(var, start, end)
-        
-        temp_sum = None
-        c = 0
-        for year in range(start, end+1):
-            if temp_sum is None:
-                temp_sum = (deepcopy(self[year].dataset[var].values) - mean) ** 2
-            else:
-                temp_sum += ((self[year].dataset[var].values - mean) ** 2)
-            c+=1
-            
-        return (temp_sum / c)**.5
+        """Per day of year and pixel (population) standard deviation of 
+        `var` for years in [`start`, `end`]. See `calculate_daily_stats` 
+        for getting more statistics from one read of the data
+
+        Returns
+        -------
+        np.array
+        """
+        stats = self.calculate_daily_stats(var, start, end)
+        return stats.std.astype(stats.dtype, copy=False)
     
     def check_dataset_with_nan_mask(self, mask):
         checked=[]
@@ -394,7 +567,26 @@ class YearlyTimeSeries(UserList):
 
         return bool(np.array([c[0] for c in checked]).all()), checked
     
-    def fill_outliers(self, var, mean, std, n_std=5):
+    def fill_outliers(self, var, mean=None, std=None, n_std=5):
+        """Replace values more than `n_std` standard deviations from the
+        daily mean with the mean
+
+        Parameters
+        ----------
+        var: str
+            variable name
+        mean: np.array, optional
+            daily mean, if `mean` or `std` is not provided both are 
+            calculated over all years with `calculate_daily_stats`
+        std: np.array, optional
+            daily standard deviation
+        n_std: float, defaults 5
+        """
+        if mean is None or std is None:
+            years = self.range()
+            stats = self.calculate_daily_stats(var, years.start, years.stop - 1)
+            mean = stats.mean.astype(stats.dtype, copy=False)
+            std = stats.std.astype(stats.dtype, copy=False)
 
         for year in self.range():
             self[year].fill_outliers(var, mean, std, n_std)
@@ -417,7 +609,9 @@ class YearlyTimeSeries(UserList):
         merged = xr.concat(temp, dim='time').convert_calendar("noleap")
         return merged
              
-    def create_climate_baseline(self, start_year, end_year, parallel=False, variables=None):
+    def create_climate_baseline(
+            self, start_year, end_year, parallel=False, variables=None, n_jobs=None
+        ):
         """Create baseline climate variables for dataset; uses
         the methods defined in CRUJRA_BASELINE_LOOKUP Based on original 
         downscaling.sh line 77-80. Here calculations are split up by var
@@ -425,7 +619,8 @@ class YearlyTimeSeries(UserList):
 
         Algorithm: (pixel wise)
             (A) For each variable, daily data for each year in [start_year, 
-        end_year] is averaged. 
+        end_year) is averaged. Years are added to a running sum one at a 
+        time, so only one year of data is in memory per variable.
             (B) For each month, the mean (or sum) of the daily average(from A)
         is calculated, giving the monthly baseline.
             (C) Monthly results are combined as time steps in yearly 
@@ -439,7 +634,15 @@ class YearlyTimeSeries(UserList):
         start_year: int
             Inclusive start year for baseline
         end_year: int
-            Inclusive end year for baseline
+            Exclusive end year for baseline
+        parallel: bool, defaults False
+            If True variables are processed in parallel threads
+        variables: list, optional
+            variables in climate_variables.BASELINE_LOOKUP to create a 
+            baseline for, defaults to all of them
+        n_jobs: int, optional
+            number of threads when `parallel` is True, defaults to one per 
+            variable, up to the number of cpus
 
         Returns
         -------
@@ -450,43 +653,35 @@ class YearlyTimeSeries(UserList):
         """
 
         
-        var_list = []
         doy = [constants.MONTH_START_DAYS[mn] for mn in range(12)]
 
-        var_dict = {}
         if variables is None:
             variables = climate_variables.BASELINE_LOOKUP
         else:
             variables = {var: climate_variables.BASELINE_LOOKUP[var] for var in variables}
+        variables = {
+            var: method for var, method in variables.items() 
+            if var in self[start_year].dataset.data_vars
+        }
+        for var, method in variables.items():
+            if method not in accumulators.MONTHLY_METHODS:
+                raise ValueError(f" Unknown method '{method}' for variable '{var}'")
 
-        for var, method  in variables.items():
-            if not var in self[start_year].dataset.data_vars:
-                continue
-            self.logger.info(f'creating baseline for {var} with  {method}')
-            ts = [self[yr].dataset[var].values for yr in range(start_year, end_year)]
-            ts = np.array(ts)
-            self.logger.debug(f'ts.shape: {ts.shape}')
-            daily_avg = ts.mean(axis=0)
-            self.logger.debug(f'daily_avg.shape: {daily_avg.shape}')
-            temp = []
-            for mn in range(12):
-                mn_slice = slice(
-                        constants.MONTH_START_DAYS[mn]-1, ## - 1 for 0 based
-                        constants.DAYS_PER_MONTH[mn]
-                    )
-                
-                mn_data = daily_avg[mn_slice]
-                self.logger.debug(f'Monthly Shape: {mn_data.shape}') 
-                mn_ag = None
-                if 'mean' == method:
-                    mn_ag = mn_data.mean(axis=0)
-                elif 'sum' == method:
-                    mn_ag = np.sum(mn_data, axis=0)
-                else:
-                    raise ValueError(f" Unknown method '{method}' for variable '{var}'")
-                temp.append(mn_ag)
-            var_cf = np.array(temp)
-            var_dict[var] = var_cf
+        if parallel:
+            self.logger.info('YearlyTimeSeries.create_climate_baseline: parallel enabled')
+            n_jobs = n_jobs if n_jobs else min(len(variables), os.cpu_count())
+            ## shared memory (threads) even under a process backend, so 
+            ## the timeseries is not copied to each worker
+            results = Parallel(n_jobs=n_jobs, require='sharedmem')(
+                delayed(self._baseline_for)(var, method, start_year, end_year)
+                for var, method in variables.items()
+            )
+        else:
+            results = [
+                self._baseline_for(var, method, start_year, end_year)
+                for var, method in variables.items()
+            ]
+        var_dict = dict(zip(variables, results))
         
         coords = {
             'time': doy, 
@@ -518,6 +713,32 @@ class YearlyTimeSeries(UserList):
         return clim_ref
 
 
+    def _baseline_for(self, var, method, start_year, end_year):
+        """Monthly baseline for one variable, years are added to a running
+        sum one at a time.
+
+        Parameters
+        ----------
+        var: str
+            variable name
+        method: str
+            'mean', or 'sum', for monthly aggregation
+        start_year: int
+            Inclusive start year for baseline
+        end_year: int
+            Exclusive end year for baseline
+
+        Returns
+        -------
+        np.array
+            (12, y, x) monthly baseline, float data keeps its dtype
+        """
+        self.logger.info(f'creating baseline for {var} with  {method}')
+        return accumulators.monthly_baseline(
+            (self[yr].dataset[var].values for yr in range(start_year, end_year)),
+            method
+        )
+
     def to_TEMDataset(self):
         """Converts data to a single dataset, for qdm methods
 
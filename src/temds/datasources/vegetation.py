@@ -3,9 +3,13 @@
 Vegetation Datasource Module
 ------------------------------
 
-Metadata for vegetation dataset
+Metadata for vegetation dataset, and classification of community types 
+(CMTs)
 
 """
+import numpy as np
+import pandas as pd
+import rasterio.features
 
 NAME = 'vegetation'
 
@@ -25,3 +29,383 @@ land_cover_classification = "working/00-download/vegetation/Jan2025_TEM_Landcove
 # Instead we have a Google Drive link to a folder from HG
 #https://drive.google.com/drive/folders/15QNWuPZ-m-j_JrLogM3QzqodLaDxBtBU?usp=share_link
 # That when downloaded we put in `working/00-download/vegetation/`
+
+
+## CMT classification
+##
+## Pixels are classified from their state (political shapefile), eco region,
+## land cover class, and drainage. Attributes are factorized into small
+## integer codes, each step of the rules is evaluated once for every 
+## combination of codes to build a dense lookup table, and pixels are 
+## classified by indexing the tables with their codes.
+##
+## Rules are (label, condition) pairs applied in order, later matches 
+## replace earlier ones. Conditions take a dict of attribute arrays.
+
+def _is(attr, *values):
+    """Condition: attribute is one of `values`"""
+    return lambda a: np.isin(a[attr], values)
+
+SUBREGIONS = (
+    'N/A',
+    'Western North America',
+    'Central North America',
+    'Eastern North America',
+    'Eastern Eurasia',
+    'Central Eurasia',
+    'Western Eurasia',
+)
+
+SUBREGION_RULES = (
+    ('Western North America', lambda a: 
+        _is('shapeName', 'Alaska')(a) | _is('ECO_NAME',
+            'Pacific Coastal Mountain icefields and tundra',
+            'Alaska-St. Elias Range tundra',
+            'Interior Yukon-Alaska alpine tundra',
+            'Brooks-British Range tundra',
+            'Arctic foothills tundra',
+        )(a)
+    ),
+    ('Central North America', lambda a: 
+        _is('shapeGroup', 'CAN')(a) 
+        & _is('ECO_NAME', 'Ogilvie-MacKenzie alpine tundra')(a)
+    ),
+    ('Eastern North America', lambda a: 
+        (_is('shapeGroup', 'CAN', 'GRL')(a) & _is('shapeName', 'Quebec')(a))
+        | _is('shapeName', 'Ontario', 'Newfoundland and Labrador')(a)
+        | _is('ECO_NAME',
+            'Southern Hudson Bay taiga',
+            'Central Canadian Shield forests',
+            'Eastern Canadian Forest-Boreal transition',
+        )(a)
+    ),
+    ('Eastern Eurasia', _is('shapeGroup', 'RUS')),
+    ('Central Eurasia', _is('ECO_NAME',
+        'Yamal-Gydan tundra',
+        'Russian Arctic desert',
+        'West Siberian taiga',
+        'Western Siberian hemiboreal forests',
+        'South Siberian forest steppe',
+        'Northwest Russian-Novaya Zemlya tundra',
+        'Trans-Baikal conifer forests',
+        'Kazakh forest steppe',
+    )),
+    ('Western Eurasia', lambda a: 
+        _is('shapeGroup', 'NOR', 'SWE', 'FIN', 'ISL')(a) | _is('ECO_NAME',
+            'Kola Peninsula tundra',
+            'Scandinavian and Russian taiga',
+            'Temperate Broadleaf & Mixed Forests',
+            'Urals montane forest and taiga',
+        )(a)
+    ),
+)
+
+COMMUNITIES = (
+    'N/A',
+    'white spruce forest',
+    'black spruce forest',
+    'aspen forest',
+    'birch forest',
+    'mixed forest',
+    'larch forest',
+    'scots pine forest',
+    'jack pine forest',
+    'tussock tundra',
+    'shrub tundra',
+    'heath tundra',
+    'fen',
+    'bog',
+    'wetsedge tundra',
+)
+
+COMMUNITY_RULES = (
+    ('white spruce forest', _is('classname', 'White Spruce forest')),
+    ('black spruce forest', _is('classname', 
+        'Black Spruce forest', 'Spruce forest', 'Fir forest', 'Hemlock forest'
+    )),
+    ('aspen forest', _is('classname', 'Aspen forest')),
+    ('birch forest', _is('classname', 
+        'Birch forest', 'Poplar forest', 'Maple', 'Oak forest', 'Linden'
+    )),
+    ('mixed forest', _is('classname', 'Mixed forest')),
+    ('larch forest', _is('classname', 'Larch forest')),
+    ('scots pine forest', _is('classname', 'Scotts Pine forest', 'Siberian Pine')),
+    ('jack pine forest', _is('classname', 'Jack Pine forest', 'Pine forest')),
+    ('scots pine forest', lambda a: 
+        _is('classname', 'Pine forest')(a) & _is('REALM', 'Palearctic')(a)
+    ),
+    ('tussock tundra', _is('classname', 'Herbaceous', 'Graminoid tundra')),
+    ('shrub tundra', _is('classname', 
+        'Other shrublands', 'Cedar Elfin Wood', 'Erect-shrub tundra', 
+        'Shrub tundra', 'Alpine shrubland', 'Prostrate-shrub tundra', 
+        'Riparian shrubland'
+    )),
+    ('heath tundra', _is('classname', 'Barren tundra', 'Sparsely Vegetated')),
+    ('fen', _is('classname', 'Fen')),
+    ('bog', _is('classname', 'Bog')),
+    ('wetsedge tundra', _is('classname', 'Wet-sedge tundra', 'Marsh')),
+)
+
+## CMT number for each community, 0 (CMT00) when there is no community
+COMMUNITY_CMT = {
+    'black spruce forest': 1,
+    'white spruce forest': 2,
+    'jack pine forest': 66,
+    'scots pine forest': 74,
+    'larch forest': 71,
+    'mixed forest': 67,
+    'birch forest': 3,
+    'aspen forest': 65,
+    'shrub tundra': 4,
+    'tussock tundra': 5,
+    'heath tundra': 7,
+    'wetsedge tundra': 6,
+    'bog': 31,
+    'fen': 55,
+}
+
+def _both(*conditions):
+    """Condition: all `conditions` match"""
+    def condition(a):
+        match = conditions[0](a)
+        for other in conditions[1:]:
+            match = match & other(a)
+        return match
+    return condition
+
+_NORTH_AMERICA = ('Central North America', 'Eastern North America')
+
+## drain_idx: 1 --> poorly drained, 0 --> well drained
+## Alpine shrub (CMT20) and tussock (CMT21) tundra are not assigned, the 
+## alpine check never matched in the original classification.
+CMT_RULES = tuple(
+    (cmt, _is('community', community)) 
+    for community, cmt in COMMUNITY_CMT.items()
+) + (
+    (13, _both(_is('community', 'black spruce forest'), 
+        _is('subregion', 'Western North America'), _is('drain_idx', 1))),
+    (60, _both(_is('community', 'black spruce forest'), 
+        _is('subregion', *_NORTH_AMERICA), _is('drain_idx', 1))),
+    (69, _both(_is('community', 'black spruce forest'), 
+        _is('subregion', *_NORTH_AMERICA), _is('drain_idx', 0))),
+    (61, _both(_is('community', 'bog'), _is('subregion', *_NORTH_AMERICA))),
+    (75, _both(_is('community', 'bog'), 
+        _is('subregion', 'Eastern Eurasia', 'Central Eurasia'))),
+    (80, _both(_is('community', 'bog'), _is('subregion', 'Western Eurasia'))),
+    (92, _both(_is('community', 'bog'), _is('ECO_NAME', 
+        'Russian Arctic desert', 'Kola Peninsula tundra', 
+        'Scandinavian coastal conifer forests', 
+        'Scandinavian Montane Birch forest and grasslands'
+    ))),
+    (91, _both(_is('community', 'fen'), _is('REALM', 'Palearctic'))),
+    (52, _both(_is('community', 'heath tundra'), 
+        _is('subregion', 'Central North America'))),
+    (90, _both(_is('community', 'heath tundra'), 
+        _is('subregion', 'Eastern North America'))),
+    (90, _both(_is('community', 'heath tundra'), _is('REALM', 'Palearctic'))),
+    (72, _both(_is('community', 'larch forest'), 
+        _is('subregion', 'Central Eurasia', 'Western Eurasia'))),
+    (77, _both(_is('community', 'mixed forest'), _is('REALM', 'Palearctic'))),
+    (82, _both(_is('community', 'scots pine forest'), 
+        _is('subregion', 'Western Eurasia'))),
+    (50, _both(_is('community', 'shrub tundra'), 
+        _is('subregion', *_NORTH_AMERICA))),
+    (70, _both(_is('community', 'shrub tundra'), 
+        _is('subregion', 'Eastern Eurasia'))),
+    (76, _both(_is('community', 'shrub tundra'), 
+        _is('subregion', 'Western Eurasia', 'Central Eurasia'))),
+    (51, _both(_is('community', 'tussock tundra'), 
+        _is('subregion', *_NORTH_AMERICA))),
+    (73, _both(_is('community', 'tussock tundra'), _is('REALM', 'Palearctic'))),
+    (77, _both(_is('community', 'wetsedge tundra'), _is('REALM', 'Palearctic'))),
+)
+
+## drainage codes, any other value is the last code
+DRAINAGE_VALUES = (0, 1)
+
+
+def rule_table(rules, default, axes, labels=None):
+    """Dense lookup table of the result of `rules` for every combination 
+    of attribute codes
+
+    Parameters
+    ----------
+    rules: iterable
+        (label, condition) pairs, applied in order
+    default:
+        label where no rule matches
+    axes: list
+        one dict per table dimension of {attribute: np.array}, the
+        attribute's value for each code along that dimension
+    labels: tuple, optional
+        when given, the table holds each label's position in `labels`
+        instead of the label
+
+    Returns
+    -------
+    np.array
+        int32 table, one dimension per axis
+    """
+    code = (lambda l: labels.index(l)) if labels else (lambda l: l)
+    shape = tuple(len(next(iter(axis.values()))) for axis in axes)
+    attrs = {}
+    for dim, axis in enumerate(axes):
+        view = [1] * len(axes)
+        view[dim] = shape[dim]
+        for name, values in axis.items():
+            attrs[name] = np.asarray(values).reshape(view)
+
+    table = np.full(shape, code(default), dtype=np.int32)
+    for label, condition in rules:
+        table[np.broadcast_to(condition(attrs), shape)] = code(label)
+    return table
+
+def _names(frame, idx_col, columns):
+    """Attribute values by (1 based) index, '' for index 0 (no geometry)"""
+    frame = frame.drop_duplicates(idx_col).set_index(idx_col)
+    n_codes = int(frame.index.max()) + 1 if len(frame) else 1
+    out = {}
+    for col in columns:
+        values = np.full(n_codes, '', dtype=object)
+        values[frame.index.values.astype(int)] = frame[col].fillna('').values
+        out[col] = values.astype(str)
+    return out
+
+def _value_codes(values, keys):
+    """Position of each of `values` in the integer `keys`, len(keys) for 
+    values that are not in `keys`"""
+    keys = np.asarray(keys).astype(np.int64)
+    if len(keys) == 0:
+        return np.zeros(values.shape, dtype=np.intp)
+    low, high = keys.min() - 1, keys.max() + 1
+    lookup = np.full(high - low + 1, len(keys), dtype=np.intp)
+    lookup[keys - low] = np.arange(len(keys))
+    offset = np.nan_to_num(np.clip(values, low, high), nan=low)
+    codes = lookup[offset.astype(np.intp) - low]
+    found = np.append(keys, low)[codes] == values
+    return np.where(found, codes, len(keys))
+
+def classify_cmt(indices, land_cover_classes, states, ecoregions):
+    """Classify pixels into CMT numbers
+
+    Parameters
+    ----------
+    indices: dict
+        'state_idx', 'eco_idx', 'lc_idx', and 'drain_idx' arrays, all the
+        same shape. Index 0 is no state or eco region
+    land_cover_classes: pd.DataFrame
+        'lc_idx' (integer) and 'classname' columns, the last row of repeated 
+        'lc_idx' values is used
+    states: pd.DataFrame
+        'state_idx', 'shapeName', and 'shapeGroup' columns
+    ecoregions: pd.DataFrame
+        'eco_idx', 'ECO_NAME', and 'REALM' columns
+
+    Returns
+    -------
+    cmt: np.array
+        int32 CMT numbers, 0 (CMT00) when no community matches
+    unmatched: pd.DataFrame
+        'classname', 'REALM', and 'pixels' for land cover classes (per 
+        realm) without a community. 'N/A' is land cover values missing 
+        from `land_cover_classes`
+    """
+    state_code = np.asarray(indices['state_idx']).astype(np.int32)
+    eco_code = np.asarray(indices['eco_idx']).astype(np.int32)
+    drain = np.asarray(indices['drain_idx'])
+    drain_code = np.full(drain.shape, len(DRAINAGE_VALUES), dtype=np.int32)
+    for code, value in enumerate(DRAINAGE_VALUES):
+        drain_code[drain == value] = code
+
+    classes = land_cover_classes.drop_duplicates('lc_idx', keep='last')
+    classnames = np.append(classes['classname'].values.astype(str), 'N/A')
+    class_code = _value_codes(np.asarray(indices['lc_idx']), classes['lc_idx'].values)
+
+    state = _names(states, 'state_idx', ['shapeName', 'shapeGroup'])
+    eco = _names(ecoregions, 'eco_idx', ['ECO_NAME', 'REALM'])
+    n_eco = len(eco['ECO_NAME'])
+
+    subregion = rule_table(
+        SUBREGION_RULES, 'N/A', [state, eco], SUBREGIONS
+    )
+    community = rule_table(
+        COMMUNITY_RULES, 'N/A', [{'classname': classnames}, eco], COMMUNITIES
+    )
+    drainage = DRAINAGE_VALUES + (None,)
+    cmt = rule_table(CMT_RULES, 0, [
+        {'community': np.array(COMMUNITIES)},
+        {'subregion': np.array(SUBREGIONS)},
+        {'drain_idx': np.array(drainage)},
+        eco,
+    ])
+
+    ## gather from the flattened tables
+    class_eco = class_code * n_eco + eco_code
+    community_code = community.ravel()[class_eco]
+    subregion_code = subregion.ravel()[state_code * n_eco + eco_code]
+    pixel_cmt = cmt.ravel()[
+        ((community_code * len(SUBREGIONS) + subregion_code) 
+            * len(drainage) + drain_code) * n_eco + eco_code
+    ]
+
+    ## pixels per (class, realm) without a community
+    counts = np.bincount(
+        class_eco[community_code == 0], minlength=len(classnames) * n_eco
+    ).reshape(len(classnames), n_eco)
+    unmatched = []
+    for realm in np.unique(eco['REALM']):
+        pixels = counts[:, eco['REALM'] == realm].sum(axis=1)
+        for name, count in zip(classnames, pixels):
+            if count > 0:
+                unmatched.append((str(name), str(realm), int(count)))
+    unmatched = pd.DataFrame(unmatched, columns=['classname', 'REALM', 'pixels'])
+    return pixel_cmt, unmatched
+
+
+## Rasterizing index columns
+##
+## Each vector layer is rasterized once, burning the (1 based) row of each
+## geometry, and the rows are mapped to each index column. Later geometries
+## overwrite earlier ones, the same as burning each index column separately.
+
+def burn_rows(gdf, shape, transform):
+    """Rasterize the (1 based) row of each geometry in `gdf`
+
+    Parameters
+    ----------
+    gdf: gpd.GeoDataFrame
+        shapes to rasterize
+    shape: tuple
+        (rows, columns) of the raster
+    transform: affine.Affine
+        raster transform
+
+    Returns
+    -------
+    np.array
+        int32 raster with 0 where there are no geometries
+    """
+    rows = np.zeros(shape, dtype=np.int32)
+    if len(gdf) > 0:
+        shapes = ((geom, row + 1) for row, geom in enumerate(gdf.geometry))
+        rasterio.features.rasterize(shapes=shapes, out=rows, transform=transform)
+    return rows
+
+def rows_to_index(rows, values):
+    """Map a raster from `burn_rows` to the value of an index column
+
+    Parameters
+    ----------
+    rows: np.array
+        raster from `burn_rows`
+    values: array like
+        index column, one value per row of the rasterized shapes
+
+    Returns
+    -------
+    np.array
+        float32 raster with 0 where there are no geometries
+    """
+    lookup = np.zeros(len(values) + 1, dtype=np.float32)
+    lookup[1:] = values
+    return lookup[rows]
@@ -77,16 +77,66 @@ def download(where, in_vars, version, resolution, overwrite = False, logger=Logg
         logger.debug(f'worldclim.download: downloading {url}')
         file_tools.download(url, where, overwrite)
 
-def prepare(where, in_vars, version, resolution, overwrite = False, logger=Logger() ):
+def raster_path(source, variable, version='2.1', resolution='30s', month=1):
+    """GDAL path of a monthly GeoTIFF in a directory or, with /vsizip/, in
+    a .zip archive, from `prepare`
+
+    Parameters
+    ----------
+    source: Path
+        directory or .zip archive
+    variable: str
+    version: str, defaults '2.1'
+    resolution: str, defaults '30s'
+    month: int, defaults 1
+
+    Returns
+    -------
+    str
+    """
+    name = f'{name_for(variable, version, resolution, month)}.tif'
+    source = Path(source)
+    if source.suffix == '.zip':
+        return f'/vsizip/{source}/{name}'
+    return str(Path(source, name))
+
+def prepare(where, in_vars, version, resolution, overwrite = False, logger=Logger(), extract=False):
+    """Find the source of each variable's monthly GeoTIFFs, an extracted
+    directory if there is one, otherwise the downloaded .zip archive,
+    which is read in place (see `raster_path`)
+
+    Parameters
+    ----------
+    where: Path
+        directory with downloaded data
+    in_vars: list
+        worldclim variable names
+    version: str
+    resolution: str
+    overwrite: bool, defaults False
+        not used
+    logger: Logger, defaults to new object
+    extract: bool, defaults False
+        When True archives are extracted to directories (the old behavior)
+
+    Returns
+    -------
+    dict
+        variable: Path to a directory or .zip archive
+    """
     completed = {}
     for var in in_vars:
         var_dir = name_for(var, version, resolution)
         in_dir = Path(f'{where}/{var_dir}')
-        if not in_dir.exists():
-            archive = Path(f'{where}/{var_dir}.zip')
+        archive = Path(f'{where}/{var_dir}.zip')
+        if not in_dir.exists() and extract:
             logger.debug(f'worldclim.unzip: unzipping {archive}')
             file_tools.extract(archive, in_dir)
-        completed[var] = in_dir
+        if in_dir.exists() or not archive.exists():
+            completed[var] = in_dir
+        else:
+            logger.debug(f'worldclim.prepare: reading from {archive}')
+            completed[var] = archive
     return completed
 
 
@@ -15,7 +15,7 @@ original bash script code is in each docstring
 import xarray as xr
 import numpy as np
 
-from .constants import  get_month_slice
+from .constants import  get_month_slice, MONTH_BOUNDS
 
 def generic_delta_mul(not_downscaled, correction_factors):
     """Generic delta downscaler should work if 
@@ -117,3 +117,82 @@ LOOKUP = {
     'winddir': wind_direction,
 } 
 
+## numpy operation of delta downscalers that `delta_downscale` can apply
+## in place
+KERNEL_OPERATIONS = {
+    generic_delta_add: np.add,
+    generic_delta_mul: np.multiply,
+}
+
+def apply_monthly(op, daily, correction_factors, out=None):
+    """Apply monthly `correction_factors` to 365 days of `daily` data.
+    Each month's factors are broadcast over that month's days (from 
+    `MONTH_BOUNDS`) and written to `out`, without building a daily 
+    correction array or per month copies.
+
+    Parameters
+    ----------
+    op: np.ufunc
+        np.add or np.multiply
+    daily: np.array
+        (365, y, x) data
+    correction_factors: np.array
+        (12, y, x) monthly correction factors
+    out: np.array, optional
+        (365, y, x) array to write to, defaults to a new array with the
+        type of `daily`
+
+    Returns
+    -------
+    np.array
+        downscaled data
+    """
+    if out is None:
+        out = np.empty_like(daily)
+    correction_factors = correction_factors.astype(out.dtype, copy=False)
+    for mn_ix in range(12):
+        days = slice(MONTH_BOUNDS[mn_ix], MONTH_BOUNDS[mn_ix+1])
+        op(daily[days], correction_factors[mn_ix], out=out[days])
+    return out
+
+def delta_downscale(source, correction, variables):
+    """Downscale all `variables` of a year with the downscalers in 
+    `LOOKUP`. Variables using `generic_delta_add` or `generic_delta_mul`
+    are computed with `apply_monthly`, keeping the data type of `source`
+    (i.e. float32). Others, or data that is not 365 days on the grid of 
+    `correction`, use the downscaler function.
+
+    Parameters
+    ----------
+    source: xr.Dataset
+        a year of daily data to downscale
+    correction: xr.Dataset
+        monthly (12 time steps) correction factors
+    variables: iterable
+        variables to downscale, keys of `LOOKUP`
+
+    Returns
+    -------
+    xr.Dataset
+        downscaled variables, with attributes from `source`
+    """
+    downscaled = {}
+    for var in variables:
+        func = LOOKUP[var]
+        src = source[var]
+        op = KERNEL_OPERATIONS.get(func, None)
+        fits = var in correction.data_vars and src.dims[0] == 'time' and \
+            src.shape[0] == MONTH_BOUNDS[-1] and \
+            correction[var].shape == (12,) + src.shape[1:]
+        if op is not None and fits:
+            current = xr.DataArray(
+                apply_monthly(op, src.values, correction[var].values),
+                dims=src.dims, coords=src.coords
+            )
+        else:
+            cf = correction[var] if var in correction.data_vars else 0 # not used
+            current = func(src, cf)
+        current.name = var
+        current.attrs.update(src.attrs)
+        downscaled[var] = current
+    return xr.merge(downscaled.values())
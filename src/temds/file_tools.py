@@ -115,6 +115,22 @@ def extract_gzip(archive: Path, where: Path=None):
             shutil.copyfileobj(fd_arc, fd_where)
     return where
 
+def read_gzip(archive: Path):
+    """Decompresses a .gz file in memory
+
+    Parameters
+    ----------
+    archive: Path
+        .gz file
+
+    Returns
+    -------
+    bytes
+        decompressed content
+    """
+    with gzip.open(archive, 'rb') as fd_arc:
+        return fd_arc.read()
+
 
 def unzip(archive: Path, where: Path=None):
     """Extracts content of .zip file
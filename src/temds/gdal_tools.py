@@ -4,13 +4,80 @@ gdal tools
 
 gdal helpers
 """
+import os
+import sys
+import uuid
+from pathlib import Path
+
 import numpy as np
-from osgeo import gdal
+from osgeo import gdal, gdal_array
 
 gdal.UseExceptions()
 
+## Multithread causes issues on MacOS
+MULTITHREAD_SAFE = sys.platform != 'darwin'
+
+## Environment variable with the number of threads each process may use for
+## gdal.Warp. Environment variables are inherited by joblib workers, see 
+## `set_warp_threads`
+WARP_THREADS_ENV = 'TEMDS_WARP_THREADS'
+
+## Environment variable with the total number of threads for gdal.Warp the
+## command line interface splits between its processes (`--warp-threads`).
+## Kept separate from TEMDS_WARP_THREADS, which is already per process.
+WARP_THREADS_BUDGET_ENV = 'TEMDS_WARP_THREADS_BUDGET'
+
+## Environment variable with a directory to save debugging artifacts to
+## (see `save_debug_artifact`). Artifacts are not saved when it's not set.
+DEBUG_ARTIFACT_DIR_ENV = 'TEMDS_DEBUG_ARTIFACT_DIR'
+
 from functools import cache
 
+def get_warp_threads():
+    """Get the number of threads this process may use for gdal.Warp, from
+    the TEMDS_WARP_THREADS environment variable. Always 1 where 
+    multithreaded warping is not safe (MacOS).
+
+    Returns
+    -------
+    int
+    """
+    if not MULTITHREAD_SAFE:
+        return 1
+    try:
+        return max(1, int(os.environ.get(WARP_THREADS_ENV, 1)))
+    except ValueError:
+        return 1
+
+def set_warp_threads(n_threads):
+    """Set the number of threads each process may use for gdal.Warp. This 
+    sets environment variables (TEMDS_WARP_THREADS and GDAL_NUM_THREADS) so 
+    it must be called before joblib workers are started for them to 
+    inherit it.
+
+    Parameters
+    ----------
+    n_threads: int
+        threads per process
+    """
+    n_threads = max(1, int(n_threads)) if MULTITHREAD_SAFE else 1
+    os.environ[WARP_THREADS_ENV] = str(n_threads)
+    os.environ['GDAL_NUM_THREADS'] = str(n_threads)
+    gdal.SetConfigOption('GDAL_NUM_THREADS', str(n_threads))
+
+def warp_kwargs():
+    """kwargs for gdal.Warp to use this process's warp threads (see 
+    `get_warp_threads`)
+
+    Returns
+    -------
+    dict
+    """
+    n_threads = get_warp_threads()
+    if n_threads > 1:
+        return dict(multithread=True, warpOptions=[f'NUM_THREADS={n_threads}'])
+    return dict(multithread=False)
+
 @cache
 def clip_gdal_opt(dest, source, resample_alg, run_primer, nd_as_array):
     no_data = np.nan
@@ -18,14 +85,13 @@ def clip_gdal_opt(dest, source, resample_alg, run_primer, nd_as_array):
         no_data = [np.nan for i in range(source.RasterCount)]
 
     if run_primer:
-        gdal.Warp(dest, source, warpOptions =['NUM_THREADS=4'],)#multithread=True)
+        gdal.Warp(dest, source, **warp_kwargs())
     gdal.Warp(
         dest, source,
         srcNodata=no_data,
         dstNodata=no_data,
         resampleAlg=resample_alg,
-        warpOptions =['NUM_THREADS=4'],
-        # multithread=True
+        **warp_kwargs()
     )
     dest.FlushCache()
     return dest
@@ -42,6 +108,89 @@ def empty_dataset(x_dim, y_dim, projection_wkt, geotransform_tuple,
 
     return dest
 
+def save_debug_artifact(dataset, name, where=None):
+    """Save a copy of `dataset` as a GeoTIFF for debugging. This is off
+    unless `where` or the TEMDS_DEBUG_ARTIFACT_DIR environment variable is 
+    set. File names are unique per call (`name`-pid-random) so parallel 
+    workers do not overwrite each other.
+
+    Parameters
+    ----------
+    dataset: gdal.Dataset
+        dataset to save
+    name: str
+        prefix for file name
+    where: Path, optional
+        directory to save to, defaults to TEMDS_DEBUG_ARTIFACT_DIR
+
+    Returns
+    -------
+    Path or None
+        Path of the saved file, None when debugging artifacts are off
+    """
+    if where is None:
+        where = os.environ.get(DEBUG_ARTIFACT_DIR_ENV, None)
+    if not where:
+        return None
+    where = Path(where)
+    where.mkdir(parents=True, exist_ok=True)
+    path = where.joinpath(f'{name}-{os.getpid()}-{uuid.uuid4().hex[:8]}.tif')
+    gdal.GetDriverByName('GTiff').CreateCopy(str(path), dataset)
+    return path
+
+def array_dataset(arrays, projection_wkt, geotransform_tuple):
+    """Wrap existing NumPy arrays as a geo-referenced, in memory, Gdal Dataset
+    without copying them. Each band of the dataset points at the memory of
+    one (y, x) slice of `arrays` (using the MEM driver's DATAPOINTER option) 
+    so anything written to the dataset, i.e. by gdal.Warp, is written 
+    straight into the arrays.
+
+    The dataset does not keep a reference to `arrays`; the caller must keep
+    them alive for as long as the dataset is used.
+
+    Parameters
+    ----------
+    arrays: np.array or list of np.array
+        C-contiguous (y, x) or (..., y, x) arrays, all with the same dtype
+        and (y, x) shape. Bands are in order of `arrays` then leading index.
+    projection_wkt: str
+        crs WKT
+    geotransform_tuple: tuple
+        gdal geotransform
+
+    Returns
+    -------
+    gdal.Dataset
+    """
+    if isinstance(arrays, np.ndarray):
+        arrays = [arrays]
+    y_dim, x_dim = arrays[0].shape[-2:]
+    dtype = arrays[0].dtype
+    gdal_type = gdal_array.NumericTypeCodeToGDALTypeCode(dtype)
+    if gdal_type is None:
+        raise TypeError(f'array_dataset: unsupported dtype {dtype}')
+
+    driver = gdal.GetDriverByName('MEM')
+    dest = driver.Create("", x_dim, y_dim, 0, gdal_type)
+    for array in arrays:
+        if not array.flags['C_CONTIGUOUS'] or array.dtype != dtype \
+                or array.shape[-2:] != (y_dim, x_dim):
+            raise ValueError((
+                'array_dataset: arrays must be C-contiguous with the same '
+                'dtype and (y, x) shape'
+            ))
+        band_bytes = y_dim * x_dim * dtype.itemsize
+        n_bands = array.size // (y_dim * x_dim)
+        for band in range(n_bands):
+            dest.AddBand(gdal_type, options=[
+                f'DATAPOINTER={array.ctypes.data + band * band_bytes}',
+                f'PIXELOFFSET={dtype.itemsize}',
+                f'LINEOFFSET={x_dim * dtype.itemsize}',
+            ])
+    dest.SetProjection(projection_wkt)
+    dest.SetGeoTransform(geotransform_tuple)
+    return dest
+
 #cant cache dict
 def clip_opt_2 (dest, source, vars_dict, resample_alg, run_primer, nd_as_array):
     data_arrays = {}
@@ -58,15 +207,56 @@ def clip_opt_2 (dest, source, vars_dict, resample_alg, run_primer, nd_as_array):
         # missing in result
         # dest = clip_gdal_opt(dest, source, resample_alg, run_primer, no_data)
         if run_primer:
-            gdal.Warp(dest, source, multithread=False) # Multithread causes issues on MacOS
+            gdal.Warp(dest, source, **warp_kwargs())
         gdal.Warp(
             dest, source,
             srcNodata=no_data,
             dstNodata=no_data,
             resampleAlg=resample_alg,
-            multithread=False, # Multithread causes issues on MacOS
+            **warp_kwargs()
         )
         dest.FlushCache()
         
         data_arrays[var] = dest.ReadAsArray()
-    return data_arrays
\ No newline at end of file
+    return data_arrays
+
+def clip_stacked(dest, source, resample_alg, run_primer, nd_as_array):
+    """Warp every band of `source` to `dest` in a single gdal.Warp call.
+    Use with `array_dataset` to stack variables and time steps as bands 
+    without copying them.
+
+    Parameters
+    ----------
+    dest: gdal.Dataset
+        destination dataset with one band per variable per time step
+    source: gdal.Dataset
+        source dataset with one band per variable per time step
+    resample_alg: str
+        gdal resampling algorithm
+    run_primer: bool
+        if True, run a "primer" warp before the real one. The primer is only
+        needed to fill pixels along coasts (source NaNs) so callers should
+        only set this when the source has NaNs.
+    nd_as_array: bool
+        if True no data values are passed as a list, one per band
+
+    Returns
+    -------
+    gdal.Dataset
+        `dest`
+    """
+    no_data = np.nan
+    if nd_as_array:
+        no_data = [np.nan for i in range(source.RasterCount)]
+
+    if run_primer:
+        gdal.Warp(dest, source, **warp_kwargs())
+    gdal.Warp(
+        dest, source,
+        srcNodata=no_data,
+        dstNodata=no_data,
+        resampleAlg=resample_alg,
+        **warp_kwargs()
+    )
+    dest.FlushCache()
+    return dest
@@ -3,9 +3,10 @@ import intake_esm # I think this needs to be here
 import fsspec
 import xarray as xr
 import cftime
-import numpy as np
 from pathlib import Path
 
+from temds import subset
+
 CMIP6_CATALOG_URL = "https://storage.googleapis.com/cmip6/pangeo-cmip6.json"
 
 
@@ -93,15 +94,14 @@ def download(save_to, zstore, time_bounds, spatial_bounds, **kwargs):
         consolidated=True,
         decode_times=time_coder,
     )
-    time_idx = np.logical_and(ds.time>=time_bounds[0], ds.time<time_bounds[1])
-    
     minx, miny, maxx, maxy = spatial_bounds
-    sidx_x =  np.logical_and(ds.lon >= minx, ds.lon <= maxx)
-    sidx_y =  np.logical_and(ds.lat >= miny, ds.lat <= maxy)
-    spatial_idx = np.logical_and(sidx_x, sidx_y)
+    indexers = subset.bbox_indexers(ds, minx, miny, maxx, maxy)
+    indexers['time'] = subset.coord_slice(
+        ds.time.values, time_bounds[0], time_bounds[1], upper_inclusive=False
+    )
 
     print('clipping to extents')
-    ds = ds.where(np.logical_and(time_idx, spatial_idx), drop=True)
+    ds = ds.isel(indexers)
 
     def lookup(kw, ke, de):
         return kw[ke] if ke in kw else de
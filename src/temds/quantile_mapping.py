@@ -0,0 +1,480 @@
+"""
+quantile_mapping
+----------------
+
+Quantile mapping (QM) and quantile delta mapping (QDM) with precomputed
+quantile tables. Per pixel, per month quantiles of the historical
+observations and simulations are calculated once (`QuantileTables`),
+optionally saved to a cache directory keyed by a hash of the input data and
+periods (`get_tables`), and reused for any projection period. Applying the
+tables (`adjust`) is vectorized over spatial blocks, which can be run in
+parallel with joblib.
+
+Methods, for a value x of the projection in month m of a pixel:
+    'quantile_mapping': tau = F_simh(x), result = Q_obs(tau)
+    'quantile_delta_mapping': tau = F_simp(x), the empirical CDF of the
+        projection period, result = Q_obs(tau) + (x - Q_simh(tau)) for
+        kind '+', or Q_obs(tau) * x / Q_simh(tau) for kind '*'
+"""
+import hashlib
+import warnings
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+from joblib import Parallel, delayed
+
+from . import blocks
+
+METHODS = ('quantile_mapping', 'quantile_delta_mapping')
+KINDS = ('+', '*')
+
+## default number of quantiles in a table, including 0 and 1
+DEFAULT_N_QUANTILES = 100
+
+
+def quantile_levels(n_quantiles):
+    """Probabilities of the quantiles in a table, evenly spaced from 0 to 1
+
+    Parameters
+    ----------
+    n_quantiles: int
+
+    Returns
+    -------
+    np.array
+    """
+    if n_quantiles < 2:
+        raise ValueError(f'n_quantiles must be at least 2, got {n_quantiles}')
+    return np.linspace(0, 1, n_quantiles)
+
+def table_lookup(table, tau):
+    """Quantile function, Q(tau), for each column of `table`, interpolated
+    linearly between the levels from `quantile_levels`
+
+    Parameters
+    ----------
+    table: np.array
+        (n_quantiles, N) quantiles for N pixels
+    tau: np.array
+        (T, N) probabilities in [0, 1]
+
+    Returns
+    -------
+    np.array
+        (T, N), NaN where `tau` is NaN
+    """
+    k = table.shape[0] - 1
+    pos = np.clip(tau, 0, 1) * k
+    missing = np.isnan(pos)
+    pos = np.where(missing, 0, pos)
+    idx = np.minimum(pos.astype(np.intp), k - 1)
+    lower = np.take_along_axis(table, idx, axis=0)
+    upper = np.take_along_axis(table, idx + 1, axis=0)
+    result = lower + (pos - idx) * (upper - lower)
+    result[missing] = np.nan
+    return result
+
+def cdf_lookup(table, values):
+    """CDF, F(x), for each column of `table`, the inverse of
+    `table_lookup`. Found with a binary search vectorized over all values,
+    values outside of a column's quantiles are clamped to 0 or 1.
+
+    Parameters
+    ----------
+    table: np.array
+        (n_quantiles, N) ascending quantiles for N pixels
+    values: np.array
+        (T, N) values
+
+    Returns
+    -------
+    np.array
+        (T, N) probabilities, NaN where `values` or the column is NaN
+    """
+    k = table.shape[0] - 1
+    lo = np.zeros(values.shape, dtype=np.intp)
+    hi = np.full(values.shape, k - 1, dtype=np.intp)
+    ## largest idx in [0, k-1] with table[idx] <= value
+    for _ in range(int(np.ceil(np.log2(max(k, 2))))):
+        mid = (lo + hi + 1) // 2
+        right = np.take_along_axis(table, mid, axis=0) <= values
+        lo = np.where(right, mid, lo)
+        hi = np.where(right, hi, mid - 1)
+
+    lower = np.take_along_axis(table, lo, axis=0)
+    upper = np.take_along_axis(table, lo + 1, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(upper > lower, (values - lower) / (upper - lower), 0)
+    tau = (lo + np.clip(frac, 0, 1)) / k
+    tau[np.isnan(values) | np.isnan(lower)] = np.nan
+    return tau
+
+def empirical_cdf(values):
+    """Empirical CDF of each column evaluated at its own values, the rank
+    of each value scaled to [0, 1]. NaNs are ignored.
+
+    Parameters
+    ----------
+    values: np.array
+        (T, N)
+
+    Returns
+    -------
+    np.array
+        (T, N) probabilities, NaN where `values` is NaN
+    """
+    missing = np.isnan(values)
+    order = np.argsort(values, axis=0) # NaNs are sorted last
+    ranks = np.empty(values.shape, dtype=np.float64)
+    np.put_along_axis(
+        ranks, order,
+        np.arange(values.shape[0], dtype=np.float64)[:, None], axis=0
+    )
+    n = np.sum(~missing, axis=0)
+    tau = np.where(n > 1, ranks / np.maximum(n - 1, 1), 0.5)
+    tau[missing] = np.nan
+    return tau
+
+def month_index(time):
+    """Month, 0 to 11, of each time step
+
+    Parameters
+    ----------
+    time: xr.DataArray
+        time coordinate
+
+    Returns
+    -------
+    np.array
+    """
+    return time.dt.month.values - 1
+
+def content_key(*arrays, **params):
+    """Hash of data and parameters, for naming cached tables
+
+    Parameters
+    ----------
+    *arrays: np.array
+    **params:
+        parameters, converted to strings
+
+    Returns
+    -------
+    str
+        sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.dtype.str}{array.shape}'.encode())
+        digest.update(array.data)
+    for name in sorted(params):
+        digest.update(f'{name}={params[name]}'.encode())
+    return digest.hexdigest()
+
+
+class QuantileTables(object):
+    """Per month, per pixel quantiles of historical observations and
+    simulations
+
+    Attributes
+    ----------
+    levels: np.array
+        (n_quantiles,) probabilities, from `quantile_levels`
+    obs: np.array
+        (12, n_quantiles, y, x) quantiles of observations
+    simh: np.array
+        (12, n_quantiles, y, x) quantiles of historical simulations
+    key: str or None
+        `content_key` of the data the tables were calculated from
+    """
+    def __init__(self, levels, obs, simh, key=None):
+        self.levels = levels
+        self.obs = obs
+        self.simh = simh
+        self.key = key
+
+    @property
+    def n_quantiles(self):
+        """number of quantiles"""
+        return self.levels.size
+
+    @classmethod
+    def from_data(
+            cls, obs, simh, obs_months, simh_months,
+            n_quantiles=DEFAULT_N_QUANTILES, key=None,
+            block_size=blocks.DEFAULT_BLOCK_SIZE, parallel=False, n_jobs=-1
+        ):
+        """Calculate tables. Blocks of the grid are calculated separately,
+        in parallel with joblib if `parallel` is True.
+
+        Parameters
+        ----------
+        obs: np.array
+            (time, y, x) historical observations
+        simh: np.array
+            (time, y, x) historical simulations
+        obs_months: np.array
+            month (0 to 11) of each time step of `obs`
+        simh_months: np.array
+            month (0 to 11) of each time step of `simh`
+        n_quantiles: int, defaults DEFAULT_N_QUANTILES
+        key: str, optional
+        block_size: int or tuple, defaults blocks.DEFAULT_BLOCK_SIZE
+        parallel: bool, defaults False
+        n_jobs: int, defaults -1
+            number of joblib workers when `parallel` is True, -1 for one
+            per cpu
+
+        Returns
+        -------
+        QuantileTables
+        """
+        levels = quantile_levels(n_quantiles)
+        windows = blocks.block_windows(obs.shape[1:], block_size)
+        tables = {}
+        for name, data, months in (
+                    ('obs', obs, obs_months), ('simh', simh, simh_months)
+                ):
+            if parallel:
+                results = Parallel(n_jobs=n_jobs)(
+                    delayed(_monthly_quantiles)(
+                        data[:, window['y'], window['x']], months, levels
+                    ) for window in windows
+                )
+            else:
+                results = [
+                    _monthly_quantiles(
+                        data[:, window['y'], window['x']], months, levels
+                    ) for window in windows
+                ]
+            table = np.empty(
+                (12, n_quantiles) + obs.shape[1:], 
+                dtype=np.result_type(data.dtype, np.float32)
+            )
+            for window, result in zip(windows, results):
+                table[..., window['y'], window['x']] = result
+            tables[name] = table
+        return cls(levels, tables['obs'], tables['simh'], key)
+
+    def save(self, path):
+        """Save as a .npz file
+
+        Parameters
+        ----------
+        path: Path
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path, levels=self.levels, obs=self.obs, simh=self.simh,
+            key=np.array('' if self.key is None else self.key)
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a .npz file created with `save`
+
+        Parameters
+        ----------
+        path: Path
+
+        Returns
+        -------
+        QuantileTables
+        """
+        with np.load(path) as data:
+            key = str(data['key']) or None
+            return cls(data['levels'], data['obs'], data['simh'], key)
+
+    def window(self, window):
+        """Tables for a window of the grid
+
+        Parameters
+        ----------
+        window: dict
+            {'y': slice, 'x': slice}, from `blocks.block_windows`
+
+        Returns
+        -------
+        QuantileTables
+        """
+        return QuantileTables(
+            self.levels,
+            self.obs[..., window['y'], window['x']],
+            self.simh[..., window['y'], window['x']],
+            self.key
+        )
+
+    def apply(self, simp, months, method, kind='+'):
+        """Adjust data with the tables
+
+        Parameters
+        ----------
+        simp: np.array
+            (time, y, x) data to adjust, on the grid of the tables
+        months: np.array
+            month (0 to 11) of each time step of `simp`
+        method: str
+            one of METHODS
+        kind: str, defaults '+'
+            '+' (additive) or '*' (multiplicative), only used by
+            'quantile_delta_mapping'
+
+        Returns
+        -------
+        np.array
+            (time, y, x) adjusted data, with the type of `simp`
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}'")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind '{kind}'")
+        if simp.shape[1:] != self.obs.shape[2:]:
+            raise ValueError(
+                f'grid {simp.shape[1:]} does not match tables {self.obs.shape[2:]}'
+            )
+
+        n_pixels = int(np.prod(simp.shape[1:]))
+        result = np.empty(simp.shape, dtype=simp.dtype)
+        for mn in range(12):
+            selected = months == mn
+            if not selected.any():
+                continue
+            values = simp[selected].reshape(-1, n_pixels).astype(np.float64)
+            obs = self.obs[mn].reshape(self.n_quantiles, n_pixels)
+            simh = self.simh[mn].reshape(self.n_quantiles, n_pixels)
+            if method == 'quantile_mapping':
+                adjusted = table_lookup(obs, cdf_lookup(simh, values))
+            else:
+                tau = empirical_cdf(values)
+                q_obs = table_lookup(obs, tau)
+                q_simh = table_lookup(simh, tau)
+                if kind == '+':
+                    adjusted = q_obs + (values - q_simh)
+                else:
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        adjusted = np.where(
+                            q_simh != 0, q_obs * values / q_simh, q_obs
+                        )
+            result[selected] = adjusted.reshape((-1,) + simp.shape[1:])
+        return result
+
+
+def _monthly_quantiles(data, months, levels):
+    """(12, n_quantiles, ...) quantiles of `data` for each month"""
+    table = np.full((12, levels.size) + data.shape[1:], np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # all NaN pixels
+        for mn in range(12):
+            selected = months == mn
+            if selected.any():
+                table[mn] = np.nanquantile(data[selected], levels, axis=0)
+    return table
+
+def get_tables(
+        obs, simh, n_quantiles=DEFAULT_N_QUANTILES, cache_dir=None,
+        block_size=blocks.DEFAULT_BLOCK_SIZE, parallel=False, n_jobs=-1
+    ):
+    """Get quantile tables for a variable, loaded from `cache_dir` if they
+    were calculated for the same data and periods before, otherwise
+    calculated and saved to `cache_dir`.
+
+    Parameters
+    ----------
+    obs: xr.DataArray
+        (time, y, x) historical observations
+    simh: xr.DataArray
+        (time, y, x) historical simulations
+    n_quantiles: int, defaults DEFAULT_N_QUANTILES
+    cache_dir: Path, optional
+        directory of cached tables, tables are not cached if not provided
+    block_size: int or tuple, defaults blocks.DEFAULT_BLOCK_SIZE
+    parallel: bool, defaults False
+        see `QuantileTables.from_data`
+    n_jobs: int, defaults -1
+        see `QuantileTables.from_data`
+
+    Returns
+    -------
+    QuantileTables
+    """
+    obs = obs.transpose('time', 'y', 'x')
+    simh = simh.transpose('time', 'y', 'x')
+    period = lambda da: f"{da['time'].values[0]}/{da['time'].values[-1]}"
+    key = content_key(
+        obs.values, simh.values,
+        obs_period=period(obs), simh_period=period(simh),
+        n_quantiles=n_quantiles
+    )
+
+    cached = None
+    if cache_dir is not None:
+        cached = Path(cache_dir) / f'{obs.name}-quantiles-{key[:16]}.npz'
+        if cached.exists():
+            tables = QuantileTables.load(cached)
+            if tables.key == key:
+                return tables
+
+    tables = QuantileTables.from_data(
+        obs.values, simh.values,
+        month_index(obs['time']), month_index(simh['time']),
+        n_quantiles, key, block_size, parallel, n_jobs
+    )
+    if cached is not None:
+        tables.save(cached)
+    return tables
+
+def adjust(
+        method, tables, simp, kind='+',
+        block_size=blocks.DEFAULT_BLOCK_SIZE, parallel=False, n_jobs=-1
+    ):
+    """Adjust `simp` with quantile tables. Blocks of the grid are
+    adjusted separately, in parallel with joblib if `parallel` is True.
+
+    Parameters
+    ----------
+    method: str
+        one of METHODS
+    tables: QuantileTables
+        from `get_tables`
+    simp: xr.DataArray
+        (time, y, x) data to adjust
+    kind: str, defaults '+'
+        see `QuantileTables.apply`
+    block_size: int or tuple, defaults blocks.DEFAULT_BLOCK_SIZE
+    parallel: bool, defaults False
+    n_jobs: int, defaults -1
+        number of joblib workers when `parallel` is True, -1 for one per cpu
+
+    Returns
+    -------
+    xr.DataArray
+        adjusted data with the coordinates and attributes of `simp`
+    """
+    simp = simp.transpose('time', 'y', 'x')
+    values = simp.values
+    months = month_index(simp['time'])
+    windows = blocks.block_windows(values.shape[1:], block_size)
+    tasks = (
+        (tables.window(window), values[:, window['y'], window['x']])
+        for window in windows
+    )
+    if parallel:
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(table.apply)(block, months, method, kind)
+            for table, block in tasks
+        )
+    else:
+        results = [
+            table.apply(block, months, method, kind) for table, block in tasks
+        ]
+
+    adjusted = np.empty(values.shape, dtype=values.dtype)
+    for window, result in zip(windows, results):
+        adjusted[:, window['y'], window['x']] = result
+    return xr.DataArray(
+        adjusted, dims=simp.dims, coords=simp.coords,
+        attrs=simp.attrs, name=simp.name
+    )
@@ -0,0 +1,241 @@
+"""
+artifacts
+---------
+
+Content addressed cache for derived datasets (i.e. climate baselines and
+correction factors) in a region directory. Each artifact is saved as a .nc
+file named by a hash of everything it was calculated from: the input files
+(size and modification time, or contents), parameters (i.e. year range and
+variables), and the TEMDS version. A repeated calculation with unchanged
+inputs loads the saved file, and any change to the inputs gives a new key,
+so stale artifacts are never used.
+
+Cached files are in a hidden directory (`CACHE_DIRNAME`), so they are not
+picked up as region data by `Manifest.from_directory`. It is in the region
+directory, or next to the inputs when there is no region (`cache_beside`).
+"""
+import hashlib
+import os
+from pathlib import Path
+
+from ..datasources import dataset
+from ..util import Version
+from .manifest import Manifest
+
+## directory for artifacts in a region directory
+CACHE_DIRNAME = '.temds-cache'
+
+
+def input_files(path):
+    """Files for an input, the .nc files of a directory (i.e. a
+    YearlyTimeSeries), or the file itself
+
+    Parameters
+    ----------
+    path: Path
+
+    Returns
+    -------
+    list
+        sorted Paths
+    """
+    path = Path(path)
+    if path.is_dir():
+        return sorted(path.glob('*.nc'))
+    return [path]
+
+def cache_beside(path):
+    """Cache for inputs outside a region directory, in a hidden directory
+    next to the input (i.e. a YearlyTimeSeries directory), so commands
+    reading the same input share artifacts
+
+    Parameters
+    ----------
+    path: Path
+        input file or directory
+
+    Returns
+    -------
+    ArtifactCache
+    """
+    return ArtifactCache(Path(path).resolve().parent / CACHE_DIRNAME)
+
+def region_input(where, name):
+    """Path of an item in a region directory's manifest
+
+    Parameters
+    ----------
+    where: Path
+        region directory
+    name: str
+        item name
+
+    Returns
+    -------
+    Path or None
+        None if there is no manifest or the item is not in it
+    """
+    manifest_file = Path(where) / 'manifest.yml'
+    if name is None or not manifest_file.exists():
+        return None
+    data = Manifest.from_file(manifest_file)['data']
+    if name not in data:
+        return None
+    return Path(where, data[name])
+
+def file_fingerprint(path, checksum=False):
+    """Fingerprint of a file's contents
+
+    Parameters
+    ----------
+    path: Path
+    checksum: bool, defaults False
+        If True the sha256 of the file's contents is used, otherwise its
+        size and modification time, which is much faster
+
+    Returns
+    -------
+    str
+    """
+    path = Path(path).resolve()
+    if checksum:
+        digest = hashlib.sha256()
+        with path.open('rb') as fd:
+            for block in iter(lambda: fd.read(2**20), b''):
+                digest.update(block)
+        return f'{path}:{digest.hexdigest()}'
+    stat = path.stat()
+    return f'{path}:{stat.st_size}:{stat.st_mtime_ns}'
+
+def artifact_key(kind, inputs, checksum=False, **params):
+    """Key for an artifact
+
+    Parameters
+    ----------
+    kind: str
+        type of artifact, i.e. 'baseline'
+    inputs: list
+        Paths of input files or directories, see `input_files`
+    checksum: bool, defaults False
+        see `file_fingerprint`
+    **params:
+        parameters of the calculation, converted to strings
+
+    Returns
+    -------
+    str
+        sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(f'{kind}|TEMDS_version={Version()}'.encode())
+    for path in inputs:
+        for file in input_files(path):
+            digest.update(file_fingerprint(file, checksum).encode())
+    for name in sorted(params):
+        digest.update(f'|{name}={params[name]}'.encode())
+    return digest.hexdigest()
+
+
+class ArtifactCache(object):
+    """Cache of derived TEMDatasets in a directory
+
+    Attributes
+    ----------
+    where: Path
+        cache directory
+    """
+    def __init__(self, where):
+        """
+        Parameters
+        ----------
+        where: Path
+            cache directory, i.e. region_directory / CACHE_DIRNAME
+        """
+        self.where = Path(where)
+
+    def __repr__(self):
+        return f"{type(self).__module__}.{type(self).__name__}({self.where})"
+
+    def path(self, kind, key):
+        """Path of an artifact
+
+        Parameters
+        ----------
+        kind: str
+        key: str
+            from `artifact_key`
+
+        Returns
+        -------
+        Path
+        """
+        return self.where / f'{kind}-{key[:32]}.nc'
+
+    def get(self, kind, key):
+        """Load an artifact
+
+        Parameters
+        ----------
+        kind: str
+        key: str
+            from `artifact_key`
+
+        Returns
+        -------
+        TEMDataset or None
+            None if the artifact is not cached
+        """
+        path = self.path(kind, key)
+        if not path.exists():
+            return None
+        return dataset.TEMDataset(path)
+
+    def put(self, kind, key, data):
+        """Save an artifact. It is written to a temporary file first, so an
+        interrupted save is never loaded.
+
+        Parameters
+        ----------
+        kind: str
+        key: str
+            from `artifact_key`
+        data: TEMDataset
+
+        Returns
+        -------
+        Path
+        """
+        path = self.path(kind, key)
+        self.where.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f'.{path.name}.{os.getpid()}.partial')
+        data.save(partial, overwrite=True)
+        os.replace(partial, path)
+        return path
+
+    def get_or_compute(self, kind, key, compute, logger=None):
+        """Load an artifact, or compute and save it when it is not cached
+
+        Parameters
+        ----------
+        kind: str
+        key: str
+            from `artifact_key`
+        compute: function
+            called with no arguments to calculate the TEMDataset on a miss
+        logger: Logger, optional
+
+        Returns
+        -------
+        TEMDataset
+        """
+        cached = self.get(kind, key)
+        if cached is not None:
+            if logger is not None:
+                logger.info(f'.. Using cached {kind} {self.path(kind, key)}')
+            return cached
+
+        data = compute()
+        path = self.put(kind, key, data)
+        if logger is not None:
+            logger.info(f'.. Cached {kind} at {path}')
+        return data
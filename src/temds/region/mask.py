@@ -3,6 +3,7 @@
 from pathlib import Path
 from copy import deepcopy
 
+import numpy as np
 from osgeo import gdal
 import pyproj
 import shapely
@@ -15,9 +16,89 @@ from .. import gdal_tools
 
 
 
+## max cells tested at once by `intersecting_cells`
+INTERSECT_BLOCK_CELLS = 2**20
+
+
 class NonIntersectingGeoSeriesError(Exception):
     pass
 
+
+def intersecting_cells(geometry, geotransform, x_size, y_size):
+    """Find the cells of a grid that intersect a geometry. Each cell is a
+    closed box, so cells that only touch the geometry are included (the
+    same as testing `geometry.intersects(box)` for every cell).
+
+    For (multi)polygons only cells near the boundary are tested with boxes.
+    A cell that intersects a polygon but does not touch its boundary is 
+    inside the polygon, so all other cells are set by testing if their 
+    center is inside. Cells near the boundary are found from the boundary
+    split in to segments no longer than a cell, each point of the 
+    boundary is in a cell next to (or containing) one of the segment ends.
+    Other geometries test every cell with boxes. Tests are vectorized
+    shapely calls on a prepared geometry, a block of rows at a time.
+
+    Parameters
+    ----------
+    geometry: shapely.Geometry
+    geotransform: tuple
+        gdal geotransform of grid (not rotated)
+    x_size: int
+        number of columns
+    y_size: int
+        number of rows
+
+    Returns
+    -------
+    np.array
+        (y_size, x_size) int16, 1 where cells intersect `geometry`, 0 
+        elsewhere
+    """
+    _, res_x, _, _, _, res_y = geotransform
+    gt = Affine.from_gdal(*geotransform)
+    shapely.prepare(geometry)
+    result = np.zeros((y_size, x_size), dtype=np.int16)
+
+    def test_boxes(rows, cols):
+        minx, maxy = gt * (cols, rows)
+        boxes = shapely.box(minx, maxy + res_y, minx + res_x, maxy)
+        return shapely.intersects(geometry, boxes)
+
+    block_rows = max(1, INTERSECT_BLOCK_CELLS // max(x_size, 1))
+    cols = np.arange(x_size)
+    polygonal = shapely.get_type_id(geometry) in (3, 6) # (Multi)Polygon
+    for start in range(0, y_size, block_rows):
+        rows = np.arange(start, min(start + block_rows, y_size))
+        cc, rr = np.meshgrid(cols, rows)
+        if polygonal:
+            cx, cy = gt * (cc + 0.5, rr + 0.5)
+            result[rows] = shapely.contains_xy(geometry, cx, cy)
+        else:
+            result[rows] = test_boxes(rr, cc)
+    if not polygonal or x_size == 0 or y_size == 0:
+        return result
+
+    edges = shapely.segmentize(
+        shapely.boundary(geometry), min(abs(res_x), abs(res_y))
+    )
+    ex, ey = shapely.get_coordinates(edges).T
+    ec, er = ~gt * (ex, ey)
+    ec = np.floor(ec).astype(np.int64)
+    er = np.floor(er).astype(np.int64)
+    near = np.zeros((y_size + 2, x_size + 2), dtype=bool) # padded by 1
+    inside = (ec >= -1) & (ec <= x_size) & (er >= -1) & (er <= y_size)
+    near[er[inside] + 1, ec[inside] + 1] = True
+    near[1:, :] |= near[:-1, :].copy()
+    near[:-1, :] |= near[1:, :].copy()
+    near[:, 1:] |= near[:, :-1].copy()
+    near[:, :-1] |= near[:, 1:].copy()
+    rr, cc = np.nonzero(near[1:-1, 1:-1])
+    for start in range(0, rr.size, INTERSECT_BLOCK_CELLS):
+        block = slice(start, start + INTERSECT_BLOCK_CELLS)
+        result[rr[block], cc[block]] = test_boxes(rr[block], cc[block])
+    return result
+
+
 class Mask(object):
     """Object to manage mask for temds region objects.
 
@@ -112,18 +193,10 @@ class Mask(object):
         if fill_uniform:
             as_np[:] = 1
         else:
-            as_np[:] = 0
-            _,res_x, _, _, _, res_y = rds.GetGeoTransform()
-            gt = Affine.from_gdal(*rds.GetGeoTransform())
-            for col in range(rds.RasterYSize):
-                for row in range(rds.RasterXSize):
-                    minx, maxy = gt * (row, col)
-                    maxx = minx+res_x
-                    miny = maxy+res_y
-                    box = shapely.box(minx, miny, maxx, maxy)
-                    is_in = init_boundary.iloc[[0]].geometry.intersects(box).values[0]
-                    if is_in:
-                        as_np[col, row] = 1
+            as_np[:] = intersecting_cells(
+                init_boundary.geometry.iloc[0], rds.GetGeoTransform(),
+                rds.RasterXSize, rds.RasterYSize
+            )
         rds.WriteArray(as_np)
 
         return cls(rds)
@@ -16,6 +16,9 @@ TODO:
 
 """
 from pathlib import Path
+import queue
+import tempfile
+import threading
 
 import geopandas as gpd
 import numpy as np
@@ -26,6 +29,7 @@ from joblib import Parallel, delayed
 import shapely
 
 # from ..gdal_tools import empty_dataset
+from .. import accumulators, blocks, climate_variables, constants
 from .. import corrections, downscalers
 
 from ..logger import Logger
@@ -273,6 +277,27 @@ class Region(object):
 
         return new
     
+    def grid_spec(self):
+        """Picklable description of the region's grid, for clipping data
+        with `clip_to_grid` in worker processes without sending the Region
+        (which holds an open gdal raster)
+
+        Returns
+        -------
+        dict
+            with 'bounds' (minx, miny, maxx, maxy), 'crs' (WKT), 
+            'resolution', and 'dest_gt'
+        """
+        minx, miny, maxx, maxy = self.boundary.bounds[
+            ['minx', 'miny', 'maxx', 'maxy']
+        ].iloc[0]
+        return {
+            'bounds': (minx, miny, maxx, maxy),
+            'crs': self.crs.to_wkt(),
+            'resolution': self.resolution,
+            'dest_gt': self.mask.raster.GetGeoTransform(),
+        }
+
     def check_datasource(self, datasource):
         """checks if a datasource already matches the region"""
         gt_check = self.transform == datasource.transform.to_gdal()
@@ -397,6 +422,7 @@ class Region(object):
         mask_filename = lookup(kwargs, 'mask_filename', 'mask.tif')
         manifest_filename = lookup(kwargs, 'manifest_filename', 'manifest.yml')
         update_manifest = lookup(kwargs, 'update_manifest', False)
+        exported = lookup(kwargs, 'exported', {})
 
         manifest = Manifest()
 
@@ -420,6 +446,9 @@ class Region(object):
                 ds_where = where 
                 self.export_timeseries(ds_where, name, **kwargs)
                 manifest['data'][name] = f'{name}'
+
+        ## items saved to `where` by other means (i.e. stream_delta_downscale)
+        manifest['data'].update(exported)
            
 
         manifest_file = where / manifest_filename
@@ -934,42 +963,12 @@ class Region(object):
         """
         correction = self.data[correction_id].dataset
         source = self.data[source_id][year].dataset
-        temp = []
         
         self.logger.info(f'.. Downscaling {year}')
-        for var in variables:
-            func = downscalers.LOOKUP[var]
-            self.logger.debug(f'.. Downscaling {var} with {func}')
-            src = source[var]
-            try:
-                cf = correction[var]
-            except KeyError:
-                cf = 0 # not used
-            current = func(src, cf)
-            
-            
-            current.name = var
-
-            # Grab the current variables attributes and copy them over...
-            current.attrs.update(src.attrs)
-
-            temp.append(current)
-
-        downscaled = xr.merge(temp)
-
-        # Handle the attributes.
-        downscaled.attrs = {} # clear out any global attributes that were leftover.
-        downscaled.attrs.update(correction.attrs)
-        downscaled.attrs['source_id'] = f"{source_id} from TEMDS_version={source.attrs['TEMDS_version']}" if 'TEMDS_version' in source.attrs else source_id
-        downscaled.attrs.update({"TEMDS_version":temds.util.Version()})
-        downscaled.attrs['data_year'] = year
-
-        downscaled.rio.set_spatial_dims(x_dim="x", y_dim="y", inplace=True)
-        downscaled.rio.write_crs(source.rio.crs, inplace=True)
-        downscaled.rio.write_coordinate_system(inplace=True) 
-        downscaled.rio.write_transform(source.rio.transform(), inplace=True)
-
-        return dataset.YearlyDataset(year, downscaled)
+        self.logger.debug(f'.. Downscaling {list(variables)}')
+        return delta_downscale_dataset(
+            year, source, correction, source_id, variables
+        )
 
     def delta_downscale_timeseries(self, downscaled_id, source_id, correction_id, variables, parallel=False, years=None):
         """
@@ -1005,3 +1004,700 @@ class Region(object):
         
         self.data[downscaled_id] = timeseries.YearlyTimeSeries(results)
 
+    def stream_delta_downscale(
+            self, where, downscaled_id, source_id, correction_id, variables, 
+            years=None, queue_size=2, **kwargs
+        ):
+        """Streaming alternative to `delta_downscale_timeseries`. Each year
+        is downscaled, saved, and released, so only a few years are in 
+        memory at once. Saving is done in a writer thread, overlapping with
+        downscaling of the next year, through a queue of at most 
+        `queue_size` years. The result is not added to `data`.
+
+        Files are saved the same as `export_timeseries`: 
+        `where`/`downscaled_id`/`downscaled_id`-{year}.nc
+
+        Parameters
+        ----------
+        where: Path
+            directory to save in
+        downscaled_id: str
+            name of downscaled data
+        source_id: str
+            AnnualTimeseries item in `data`
+        correction_id: str
+            xr.dataset item in `data`
+        variables: dict
+            see `delta_downscale_year`
+        years: tuple, optional
+            (start, end) inclusive years to downscale, defaults to all years
+            in `data[source_id]`
+        queue_size: int, defaults 2
+            maximum number of downscaled years waiting to be saved
+        **kwargs:
+            forwarded to `YearlyDataset.save`
+
+        Returns
+        -------
+        list
+            Paths of saved files
+        """
+        if not years:
+            years = self.data[source_id].range()
+        else:
+            years = range(years[0], years[1]+1)
+
+        out_dir = Path(where) / downscaled_id
+        out_dir.mkdir(exist_ok=True, parents=True)
+        name_pattern = downscaled_id + '-{year}.nc'
+
+        to_save = queue.Queue(maxsize=max(1, queue_size))
+        errors = []
+        saved = []
+        def writer():
+            while True:
+                item = to_save.get()
+                if item is None:
+                    break
+                year, downscaled = item
+                if errors: # drain the queue after a failure
+                    continue
+                out_file = out_dir / name_pattern.format(year=year)
+                try:
+                    downscaled.save(out_file, **kwargs)
+                    saved.append(out_file)
+                    self.logger.info(f'.. Saved {year} to {out_file}')
+                except Exception as error:
+                    errors.append(error)
+                del downscaled
+
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        try:
+            for year in years:
+                if errors:
+                    break
+                downscaled = self.delta_downscale_year(
+                    year, source_id, correction_id, variables
+                )
+                to_save.put((year, downscaled))
+                del downscaled
+        finally:
+            to_save.put(None)
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        return saved
+
+    def parallel_delta_downscale(
+            self, where, downscaled_id, source_id, correction_id, variables, 
+            years=None, **kwargs
+        ):
+        """Parallel alternative to `delta_downscale_timeseries`, for 
+        `data[source_id]` that is not in memory (`in_memory=False`). 
+        Correction factors are written once to memory mapped files, and 
+        each worker is only sent a year, the source file for the year, and 
+        where to save, so the Region is never pickled. Workers load their 
+        own year and save the result directly. The result is not added 
+        to `data`.
+
+        Workers are run with joblib, configure them with 
+        `joblib.parallel_config`
+
+        Files are saved the same as `export_timeseries`: 
+        `where`/`downscaled_id`/`downscaled_id`-{year}.nc
+
+        Parameters
+        ----------
+        where: Path
+            directory to save in
+        downscaled_id: str
+            name of downscaled data
+        source_id: str
+            AnnualTimeseries item in `data`, with items that are not in 
+            memory
+        correction_id: str
+            xr.dataset item in `data`
+        variables: dict
+            see `delta_downscale_year`
+        years: tuple, optional
+            (start, end) inclusive years to downscale, defaults to all years
+            in `data[source_id]`
+        **kwargs:
+            forwarded to `YearlyDataset.save`
+
+        Raises
+        ------
+        ValueError
+            If a year of `data[source_id]` is in memory
+
+        Returns
+        -------
+        list
+            Paths of saved files
+        """
+        if not years:
+            years = self.data[source_id].range()
+        else:
+            years = range(years[0], years[1]+1)
+
+        sources = {}
+        for year in years:
+            item = self.data[source_id][year]
+            if not isinstance(item._dataset, Path):
+                raise ValueError(
+                    f'{source_id} {year} is in memory, parallel_delta_downscale '
+                    'needs data loaded with in_memory=False'
+                )
+            sources[year] = (item._dataset, item._cached_load_kwargs)
+
+        out_dir = Path(where) / downscaled_id
+        out_dir.mkdir(exist_ok=True, parents=True)
+        name_pattern = downscaled_id + '-{year}.nc'
+
+        correction = self.data[correction_id].dataset
+        with tempfile.TemporaryDirectory(prefix='temds-correction-') as cf_dir:
+            correction_spec = share_dataset(correction, cf_dir)
+            saved = Parallel()(
+                delayed(_delta_downscale_year_to_file)(
+                    year, sources[year][0], sources[year][1], correction_spec,
+                    source_id, variables, 
+                    out_dir / name_pattern.format(year=year), kwargs
+                ) for year in years
+            )
+        self.logger.info(f'.. Saved {len(saved)} years to {out_dir}')
+        return saved
+
+    def blocked_delta_downscale(
+            self, where, downscaled_id, source_id, reference_id, variables,
+            baseline_years, years=None, block_size=blocks.DEFAULT_BLOCK_SIZE,
+            correction_file=None, **kwargs
+        ):
+        """Spatially blocked alternative to `create_climate_baseline`, 
+        `calculate_correction_factors`, and `delta_downscale_timeseries`, 
+        for regions too large to process in memory. The grid is split into
+        windows of `block_size` and for each window the baseline, the 
+        correction factors, and every downscaled year are calculated and 
+        written into files created before the first window. Only a window 
+        of data is in memory at a time, so `data[source_id]` should be 
+        loaded with `in_memory=False`. The result is not added to `data`.
+
+        Each step gives the same values as the whole array methods, which
+        should still be used for regions that fit in memory.
+
+        Files are saved the same as `export_timeseries`: 
+        `where`/`downscaled_id`/`downscaled_id`-{year}.nc
+
+        Parameters
+        ----------
+        where: Path
+            directory to save in
+        downscaled_id: str
+            name of downscaled data
+        source_id: str
+            AnnualTimeseries item in `data`, the baseline is created from 
+            it and it is downscaled
+        reference_id: str
+            TEMDataset item in `data`, monthly reference climate on the 
+            grid of `data[source_id]`
+        variables: list
+            variables to downscale, in `climate_variables.BASELINE_LOOKUP`,
+            `corrections.LOOKUP` and `downscalers.LOOKUP`
+        baseline_years: tuple
+            (start, end) years for the baseline, start is inclusive and 
+            end is exclusive, as in `create_climate_baseline`
+        years: tuple, optional
+            (start, end) inclusive years to downscale, defaults to all years
+            in `data[source_id]`
+        block_size: int or tuple, defaults blocks.DEFAULT_BLOCK_SIZE
+            (rows, columns) of windows
+        correction_file: Path, optional
+            if provided the correction factors are also saved to this file
+        **kwargs:
+            forwarded to `blocks.preallocate` (i.e. 'overwrite', 
+            'complevel')
+
+        Returns
+        -------
+        list
+            Paths of saved files
+        """
+        if not years:
+            years = self.data[source_id].range()
+        else:
+            years = range(years[0], years[1]+1)
+        baseline_range = range(baseline_years[0], baseline_years[1])
+        methods = {
+            var: climate_variables.BASELINE_LOOKUP[var] for var in variables
+        }
+
+        sources = {
+            year: self.data[source_id][year].dataset 
+            for year in sorted(set(years) | set(baseline_range))
+        }
+        reference = self.data[reference_id].dataset
+        first = sources[baseline_range[0]]
+        for var in variables:
+            if first[var].dims != ('time', 'y', 'x'):
+                raise ValueError(
+                    f"{source_id} {var} has dims {first[var].dims}, "
+                    "blocked_delta_downscale needs ('time', 'y', 'x')"
+                )
+
+        ## create output files
+        correction_attrs = {
+            'baseline_id': f'{source_id} baseline '
+                f'{baseline_range[0]}-{baseline_range[-1]+1}',
+            'reference_id': f'{reference_id} from TEMDS_version={reference.attrs["TEMDS_version"]}' if 'TEMDS_version' in reference.attrs else reference_id,
+        }
+        out_dir = Path(where) / downscaled_id
+        name_pattern = downscaled_id + '-{year}.nc'
+        out_files = {}
+        for year in years:
+            src = sources[year]
+            out_files[year] = blocks.preallocate(
+                out_dir / name_pattern.format(year=year),
+                xr.Dataset(
+                    coords=src.coords, 
+                    attrs=downscaled_attrs(
+                        year, src.attrs, correction_attrs, source_id
+                    )
+                ),
+                {var: (src[var].dims, src[var].dtype, dict(src[var].attrs))
+                    for var in variables},
+                block_size, **kwargs
+            )
+
+        doy = [constants.MONTH_START_DAYS[mn] for mn in range(12)]
+        if correction_file is not None:
+            cf_vars = {}
+            for var in variables:
+                attrs = {}
+                units = first[var].attrs.get('units'), reference[var].attrs.get('units')
+                if not all(units):
+                    self.logger.warn(f"One of the datasets for variable {var} is missing units. This may cause issues with the correction factor calculation.")
+                elif units[0] != units[1]:
+                    self.logger.warn(f"Units for variable {var} do not match between baseline and reference datasets. This may cause issues with the correction factor calculation.")
+                else:
+                    attrs['units'] = units[1]
+                attrs.update(first[var].attrs)
+                cf_vars[var] = (
+                    ('time', 'y', 'x'), 
+                    np.result_type(first[var].dtype, reference[var].dtype),
+                    attrs
+                )
+            blocks.preallocate(
+                correction_file,
+                xr.Dataset(
+                    coords=first.isel(time=slice(0, 12)).assign_coords(
+                        time=doy
+                    ).coords,
+                    attrs=correction_attrs
+                ),
+                cf_vars, block_size, **kwargs
+            )
+
+        windows = blocks.block_windows(
+            (first['y'].size, first['x'].size), block_size
+        )
+        for idx, window in enumerate(windows):
+            self.logger.info(f'.. Block {idx+1}/{len(windows)}: {window}')
+            correction = correction_window(
+                window, sources, reference, variables, methods, 
+                baseline_range, doy
+            )
+            if correction_file is not None:
+                blocks.write_window(correction_file, window, {
+                    var: correction[var].values for var in variables
+                })
+            for year in years:
+                downscaled = downscalers.delta_downscale(
+                    sources[year].isel(window), correction, variables
+                )
+                blocks.write_window(out_files[year], window, {
+                    var: downscaled[var].transpose(..., 'y', 'x').values 
+                    for var in variables
+                })
+                del downscaled
+
+        saved = list(out_files.values())
+        if correction_file is not None:
+            saved.append(Path(correction_file))
+        self.logger.info(f'.. Saved {len(saved)} files')
+        return saved
+
+    def batch_delta_downscale(
+            self, where, sources, reference_id, variables, baseline_years,
+            years=None, n_jobs=1, memory_budget=None, **kwargs
+        ):
+        """Delta downscale several sources on different grids, i.e. 
+        experiments of CMIP6 models, to the region, sharing work between 
+        them. For each distinct baseline source the baseline and correction 
+        factors are calculated once, and for each distinct source grid the 
+        resampling weights (`warp_plan.WarpPlan`) are built once. Sources 
+        are then clipped, downscaled, and saved one year at a time in joblib
+        worker processes, that are sent the grid, warp plan, and memory 
+        mapped correction factors (see `share_dataset`) instead of the 
+        Region. Results are not added to `data`.
+
+        Files are saved the same as `export_timeseries`: 
+        `where`/name/name-{year}.nc
+
+        Parameters
+        ----------
+        where: Path
+            directory to save in
+        sources: dict
+            name: (source, baseline) where source is the directory of 
+            yearly files to downscale and baseline is the directory of 
+            yearly files (on the same grid) to calculate the baseline 
+            from, i.e. the model's historical experiment
+        reference_id: str
+            TEMDataset item in `data`, monthly reference climate
+        variables: list
+            variables to downscale
+        baseline_years: tuple
+            (start, end) years for the baseline, see 
+            `create_climate_baseline`
+        years: tuple, optional
+            (start, end) inclusive years to downscale, defaults to all years
+            of each source
+        n_jobs: int, defaults 1
+            maximum number of worker processes
+        memory_budget: int, optional
+            bytes available to all workers, the number of workers is reduced
+            so the estimated memory used by all of them fits
+        **kwargs:
+            forwarded to `YearlyDataset.save`
+
+        Returns
+        -------
+        dict
+            name: list of saved files
+        """
+        grid = self.grid_spec()
+        variables = {var: {'function': var} for var in variables}
+        load = lambda path: timeseries.YearlyTimeSeries(
+            Path(path), logger=self.logger, in_memory=False, cache_bytes=0
+        )
+
+        ## one plan per source grid, get_warp_plan only caches a few
+        plans, grid_plans = {}, {}
+        for name, (source, baseline) in sources.items():
+            for path in (source, baseline):
+                if path in plans:
+                    continue
+                first = load(path).data[0]
+                source_grid = (
+                    tuple(first.shape), tuple(first.transform),
+                    first.crs.to_wkt()
+                )
+                if source_grid not in grid_plans:
+                    grid_plans[source_grid] = grid_warp_plan(first, grid)
+                plans[path] = grid_plans[source_grid]
+        self.logger.info(
+            f'.. {len(grid_plans)} distinct source grids for '
+            f'{len(plans)} sources and baselines'
+        )
+
+        with tempfile.TemporaryDirectory(prefix='temds-batch-') as tmp_dir:
+            correction_specs = {}
+            for baseline in sorted(set(b for _, b in sources.values())):
+                base_name = Path(baseline).name
+                self.logger.info(f'.. Correction factors from {base_name}')
+                ## slices share the series' cache (cache_bytes=0)
+                period = load(baseline)[baseline_years[0]:baseline_years[1]]
+                self.import_datasource(
+                    'batch-baseline-source', period, 
+                    warp_plan=plans[baseline]
+                )
+                self.calculate_climate_baseline(
+                    baseline_years[0], baseline_years[1], 
+                    'batch-baseline', 'batch-baseline-source'
+                )
+                self.calculate_correction_factors(
+                    'batch-baseline', reference_id, variables, 
+                    factor_id='batch-correction-factors'
+                )
+                cf_dir = Path(tmp_dir, f'cf-{len(correction_specs)}')
+                cf_dir.mkdir()
+                correction_specs[baseline] = share_dataset(
+                    self.data['batch-correction-factors'].dataset, cf_dir
+                )
+                for item in ('batch-baseline-source', 'batch-baseline', 
+                        'batch-correction-factors'):
+                    del self.data[item]
+
+            year_bytes = len(variables) * 365 * int(np.prod(self.shape)) * 4
+            ## source year, downscaled year, and a copy while saving
+            task_bytes = 3 * year_bytes
+            n_jobs = max(1, min(n_jobs, len(sources)))
+            if memory_budget is not None:
+                n_jobs = max(1, min(n_jobs, int(memory_budget // task_bytes)))
+            self.logger.info(
+                f'.. Downscaling {len(sources)} sources with {n_jobs} workers'
+                f' (~{task_bytes / 2**30:.2f} GB each)'
+            )
+
+            saved = Parallel(n_jobs=n_jobs)(
+                delayed(_batch_downscale_source)(
+                    source, name, grid, plans[source], 
+                    correction_specs[baseline], variables, years, where, kwargs
+                ) for name, (source, baseline) in sources.items()
+            )
+        return dict(zip(sources, saved))
+
+
+def clip_to_grid(datasource, grid, **kwargs):
+    """Clip and resample a datasource to a region grid
+
+    Parameters
+    ----------
+    datasource: Object
+        with `get_by_extent`, see `Region.import_datasource`
+    grid: dict
+        from `Region.grid_spec`
+    **kwargs:
+        forwarded to `get_by_extent`
+
+    Returns
+    -------
+    clipped datasource
+    """
+    kwargs['resolution'] = grid['resolution']
+    kwargs['dest_gt'] = grid['dest_gt']
+    return datasource.get_by_extent(
+        *grid['bounds'], pyproj.CRS(grid['crs']), **kwargs
+    )
+
+def grid_warp_plan(datasource, grid, **kwargs):
+    """`WarpPlan` for clipping a dataset to a region grid, shared by 
+    datasets on the same grid
+
+    Parameters
+    ----------
+    datasource: TEMDataset
+    grid: dict
+        from `Region.grid_spec`
+    **kwargs:
+        forwarded to `get_warp_plan`
+
+    Returns
+    -------
+    warp_plan.WarpPlan or None
+    """
+    kwargs['resolution'] = grid['resolution']
+    kwargs['dest_gt'] = grid['dest_gt']
+    return datasource.get_warp_plan(
+        *grid['bounds'], pyproj.CRS(grid['crs']), **kwargs
+    )
+
+def _batch_downscale_source(
+        source, name, grid, plan, correction_spec, variables, years, where, 
+        save_kwargs
+    ):
+    """Worker for `Region.batch_delta_downscale`"""
+    data = timeseries.YearlyTimeSeries(
+        Path(source), in_memory=False, cache_bytes=0
+    )
+    correction = open_shared(correction_spec)
+    if not years:
+        years = data.range()
+    else:
+        years = range(years[0], years[1]+1)
+
+    out_dir = Path(where) / name
+    out_dir.mkdir(exist_ok=True, parents=True)
+    saved = []
+    for year in years:
+        clipped = clip_to_grid(data[year], grid, warp_plan=plan)
+        downscaled = delta_downscale_dataset(
+            year, clipped.dataset, correction, Path(source).name, variables
+        )
+        del clipped
+        out_file = out_dir / f'{name}-{year}.nc'
+        downscaled.save(out_file, **save_kwargs)
+        saved.append(out_file)
+        del downscaled
+    return saved
+
+
+def correction_window(
+        window, sources, reference, variables, methods, baseline_range, doy
+    ):
+    """Correction factors for a window of the grid, see 
+    `Region.blocked_delta_downscale`. The baseline for the window is 
+    calculated the same as `YearlyTimeSeries.create_climate_baseline`, and
+    the correction factors the same as `Region.calculate_correction_factors`
+
+    Parameters
+    ----------
+    window: dict
+        {dimension: slice}, from `blocks.block_windows`
+    sources: dict
+        year: xr.Dataset, daily data for each year in `baseline_range`
+    reference: xr.Dataset
+        monthly reference climate
+    variables: list
+        variable names
+    methods: dict
+        variable name: monthly aggregation method for the baseline
+    baseline_range: range
+        years in baseline
+    doy: list
+        day of year of the start of each month, the baseline time 
+        coordinate
+
+    Returns
+    -------
+    xr.Dataset
+        (12, y, x) correction factors for the window
+    """
+    correction = {}
+    for var in variables:
+        first = sources[baseline_range[0]][var].isel(window)
+        baseline = xr.DataArray(
+            accumulators.monthly_baseline(
+                (sources[yr][var].isel(window).values for yr in baseline_range),
+                methods[var]
+            ),
+            dims=('time', 'y', 'x'),
+            coords={'time': doy, 'y': first['y'], 'x': first['x']},
+        )
+        current = corrections.LOOKUP[var](
+            baseline, reference[var].isel(window)
+        ).transpose('time', 'y', 'x')
+        if current.shape != baseline.shape:
+            raise ValueError(
+                f'correction factors for {var} have shape {current.shape}, '
+                f'expected {baseline.shape}'
+            )
+        correction[var] = (('time', 'y', 'x'), current.values)
+    return xr.Dataset(correction)
+
+
+def delta_downscale_dataset(year, source, correction, source_id, variables):
+    """Downscale a year of data, see `Region.delta_downscale_year`
+
+    Parameters
+    ----------
+    year: int
+        the year to downscale
+    source: xr.Dataset
+        a year of daily data
+    correction: xr.Dataset
+        monthly correction factors
+    source_id: str
+        name of source data, for attributes
+    variables: dict
+        see `Region.delta_downscale_year`
+
+    Returns
+    -------
+    dataset.YearlyDataset
+    """
+    # variable attributes are copied from source
+    downscaled = downscalers.delta_downscale(source, correction, variables)
+
+    downscaled.attrs = downscaled_attrs(
+        year, source.attrs, correction.attrs, source_id
+    )
+
+    downscaled.rio.set_spatial_dims(x_dim="x", y_dim="y", inplace=True)
+    downscaled.rio.write_crs(source.rio.crs, inplace=True)
+    downscaled.rio.write_coordinate_system(inplace=True) 
+    downscaled.rio.write_transform(source.rio.transform(), inplace=True)
+
+    return dataset.YearlyDataset(year, downscaled)
+
+def downscaled_attrs(year, source_attrs, correction_attrs, source_id):
+    """Global attributes for a downscaled year
+
+    Parameters
+    ----------
+    year: int
+        the downscaled year
+    source_attrs: dict
+        global attributes of the source data
+    correction_attrs: dict
+        global attributes of the correction factors
+    source_id: str
+        name of source data
+
+    Returns
+    -------
+    dict
+    """
+    attrs = dict(correction_attrs)
+    attrs['source_id'] = f"{source_id} from TEMDS_version={source_attrs['TEMDS_version']}" if 'TEMDS_version' in source_attrs else source_id
+    attrs.update({"TEMDS_version":temds.util.Version()})
+    attrs['data_year'] = year
+    return attrs
+
+def share_dataset(ds, where):
+    """Write the data variables of `ds` to .npy files in `where`, so 
+    processes can open them as read only memory maps with `open_shared`.
+
+    Parameters
+    ----------
+    ds: xr.Dataset
+    where: Path
+        directory to write to
+
+    Returns
+    -------
+    dict
+        small, picklable description of `ds` for `open_shared`
+    """
+    spec = {
+        'where': str(where), 
+        'vars': {},
+        'coords': {
+            name: (coord.dims, coord.values, coord.attrs) 
+            for name, coord in ds.coords.items()
+        },
+        'attrs': dict(ds.attrs),
+    }
+    for var in ds.data_vars:
+        np.save(Path(where, f'{var}.npy'), ds[var].values)
+        spec['vars'][var] = (ds[var].dims, dict(ds[var].attrs))
+    return spec
+
+def open_shared(spec):
+    """Open a dataset written by `share_dataset`, data variables are read 
+    only memory maps
+
+    Parameters
+    ----------
+    spec: dict
+        from `share_dataset`
+
+    Returns
+    -------
+    xr.Dataset
+    """
+    return xr.Dataset(
+        {
+            var: (
+                dims, 
+                np.load(Path(spec['where'], f'{var}.npy'), mmap_mode='r'), 
+                attrs
+            ) for var, (dims, attrs) in spec['vars'].items()
+        },
+        coords=spec['coords'],
+        attrs=spec['attrs'],
+    )
+
+def _delta_downscale_year_to_file(
+        year, source_file, load_kwargs, correction_spec, source_id, variables,
+        out_file, save_kwargs
+    ):
+    """Worker for `Region.parallel_delta_downscale`"""
+    source = dataset.YearlyDataset(year, source_file, **load_kwargs)
+    downscaled = delta_downscale_dataset(
+        year, source.dataset, open_shared(correction_spec), source_id, variables
+    )
+    del source
+    downscaled.save(out_file, **save_kwargs)
+    return out_file
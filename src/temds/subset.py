@@ -0,0 +1,152 @@
+"""
+subset
+------
+
+Index based subsetting of gridded data by bounding box. Bounds are turned
+into integer positions on the (monotonic) coordinate arrays and applied with
+`isel`, so only the needed window is read for lazily opened data. This
+replaces building boolean masks and calling `where(mask, drop=True)`, which
+loads the full array first.
+"""
+import numpy as np
+
+
+def coord_slice(values, lower, upper, upper_inclusive=True):
+    """Find the positions of a monotonic coordinate within bounds
+
+    Parameters
+    ----------
+    values: array like
+        1D monotonic (ascending or descending) coordinate values
+    lower:
+        lower bound (inclusive)
+    upper:
+        upper bound
+    upper_inclusive: bool, defaults True
+        If False `upper` is excluded
+
+    Returns
+    -------
+    slice
+        positions in `values` of `lower` <= values <= `upper`
+    """
+    values = np.asarray(values)
+    descending = values.size > 1 and values[0] > values[-1]
+    if descending:
+        values = values[::-1]
+
+    start = int(np.searchsorted(values, lower, side='left'))
+    stop = int(np.searchsorted(
+        values, upper, side='right' if upper_inclusive else 'left'
+    ))
+    stop = max(start, stop)
+
+    if descending:
+        start, stop = values.size - stop, values.size - start
+    return slice(start, stop)
+
+def lon_indices(lon, minx, maxx):
+    """Find the positions of longitudes within bounds, handling bounds in
+    -180 to 180 for coordinates in 0 to 360. When the bounds cross 0 (or
+    cover all longitudes) on a 0 to 360 grid, the positions wrap around,
+    ordered so they are ascending once converted to -180 to 180.
+
+    Parameters
+    ----------
+    lon: array like
+        1D ascending longitudes, in -180 to 180 or 0 to 360
+    minx: float
+        western bound
+    maxx: float
+        eastern bound
+
+    Returns
+    -------
+    slice or np.array
+        a slice when the positions are contiguous, otherwise an array of
+        positions
+    """
+    lon = np.asarray(lon)
+    if minx >= 0 or lon.size == 0 or lon.max() <= 180:
+        return coord_slice(lon, minx, maxx)
+
+    start = minx % 360
+    if maxx - minx >= 360:
+        first = coord_slice(lon, start, 360, upper_inclusive=False)
+        second = coord_slice(lon, 0, start, upper_inclusive=False)
+    else:
+        stop = maxx % 360
+        if start <= stop:
+            return coord_slice(lon, start, stop)
+        first = coord_slice(lon, start, 360, upper_inclusive=False)
+        second = coord_slice(lon, 0, stop)
+
+    if first.stop == first.start:
+        return second
+    if second.stop == second.start:
+        return first
+    return np.concatenate([
+        np.arange(first.start, first.stop),
+        np.arange(second.start, second.stop)
+    ])
+
+def spatial_dims(dataset):
+    """Names of the spatial dimensions of `dataset`
+
+    Parameters
+    ----------
+    dataset: xr.Dataset or xr.DataArray
+
+    Returns
+    -------
+    tuple
+        (x_dim, y_dim), ('lon', 'lat') if present, otherwise ('x', 'y')
+    """
+    if 'lon' in dataset.dims and 'lat' in dataset.dims:
+        return 'lon', 'lat'
+    return 'x', 'y'
+
+def bbox_indexers(dataset, minx, miny, maxx, maxy):
+    """Integer indexers for the part of `dataset` within a bounding box,
+    bounds are in the dataset's coordinates
+
+    Parameters
+    ----------
+    dataset: xr.Dataset or xr.DataArray
+        with 'lon'/'lat' or 'x'/'y' dimension coordinates
+    minx, miny, maxx, maxy: float
+        bounds (inclusive)
+
+    Returns
+    -------
+    dict
+        for `dataset.isel`
+    """
+    x_dim, y_dim = spatial_dims(dataset)
+    x_values = dataset[x_dim].values
+    if x_dim == 'lon':
+        x_index = lon_indices(x_values, minx, maxx)
+    else:
+        x_index = coord_slice(x_values, minx, maxx)
+    return {
+        x_dim: x_index,
+        y_dim: coord_slice(dataset[y_dim].values, miny, maxy),
+    }
+
+def isel_bbox(dataset, minx, miny, maxx, maxy):
+    """Subset `dataset` to a bounding box with `isel`. Same cells as
+    `where(mask, drop=True)` with an inclusive mask on each coordinate, but
+    only the window is read and the data type is not changed.
+
+    Parameters
+    ----------
+    dataset: xr.Dataset or xr.DataArray
+        with 'lon'/'lat' or 'x'/'y' dimension coordinates
+    minx, miny, maxx, maxy: float
+        bounds (inclusive) in the dataset's coordinates
+
+    Returns
+    -------
+    xr.Dataset or xr.DataArray
+    """
+    return dataset.isel(bbox_indexers(dataset, minx, miny, maxx, maxy))
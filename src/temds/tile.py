@@ -20,8 +20,10 @@ import yaml
 
 import pyproj # For handling CRS in a variety of formats
 
+from . import blocks
 from . import corrections 
 from . import downscalers
+from . import quantile_mapping
 from . import util
 from . import climate_variables
 
@@ -469,23 +471,9 @@ class Tile(object):
         """
         correction = self.data[correction_id].dataset
         source = self.data[source_id][year].dataset
-        temp = []
 
-        for var in variables:
-            func = downscalers.LOOKUP[var]
-            self.logger.info(f'.. Downscaling {var} with {func}')
-            src = source[var]
-            try:
-                cf = correction[var]
-            except KeyError:
-                cf = 0 # not used
-            current = func(src, cf)
-            
-            
-            current.name = var
-            temp.append(current)
-        
-        downscaled = xr.merge(temp)
+        self.logger.info(f'.. Downscaling {list(variables)}')
+        downscaled = downscalers.delta_downscale(source, correction, variables)
         downscaled.attrs['data_year'] = year
 
         
@@ -515,6 +503,33 @@ class Tile(object):
         self.data[downscaled_id] = timeseries.YearlyTimeSeries(results)
 
     def general_downscale(self, method, variables, hist_period, proj_period, obs_key, sim_key, kind='+', **kwargs ):
+        """Downscale `variables` with `cmethods.adjust`
+
+        Parameters
+        ----------
+        method: str
+            `cmethods.adjust` method
+        variables: list
+            variables to downscale
+        hist_period: tuple
+            (start, end) years of historical period
+        proj_period: tuple
+            (start, end) years of projection period
+        obs_key: str
+            YearlyTimeseries item in `data` with observations
+        sim_key: str
+            YearlyTimeseries item in `data` with simulated data
+        **kwargs:
+            'block_size': int or tuple, optional
+                when provided `adjust` is run on windows of the tile 
+                (see `blocks.block_windows`) to limit the memory it uses
+            others are passed to `cmethods.adjust`
+
+        Returns
+        -------
+        xr.Dataset
+        """
+        block_size = kwargs.pop('block_size', None)
 
         print('building obsh')
         obsh = self.data[obs_key].convert_range_to_single_dataset(variables, hist_period[0], hist_period[1])
@@ -526,18 +541,92 @@ class Tile(object):
         
         for var in variables:
             print('downscaling', var)
-            temp = adjust(
-                method=method,
-                obs=obsh[var],
-                simh=simh[var],
-                simp=simp[var],
-                kind="+",
-                **kwargs
-            )[var].transpose('time', 'y','x')
+            if block_size is None:
+                temp = adjust(
+                    method=method,
+                    obs=obsh[var],
+                    simh=simh[var],
+                    simp=simp[var],
+                    kind="+",
+                    **kwargs
+                )[var].transpose('time', 'y','x')
+            else:
+                temp = simp[var].transpose('time', 'y','x').copy()
+                for window in blocks.block_windows(temp.shape[1:], block_size):
+                    temp[{'y': window['y'], 'x': window['x']}] = adjust(
+                        method=method,
+                        obs=obsh[var].isel(window),
+                        simh=simh[var].isel(window),
+                        simp=simp[var].isel(window),
+                        kind="+",
+                        **kwargs
+                    )[var].transpose('time', 'y','x').values
             results.append(temp)
         return xr.merge(results)
 
+    def quantile_downscale(
+            self, method, variables, hist_period, proj_period, obs_key, 
+            sim_key, kind='+', **kwargs
+        ):
+        """Alternative to `general_downscale` for quantile mapping methods,
+        using `quantile_mapping`. Quantile tables for the historical period
+        are calculated once per variable and, with 'cache_dir', reused for
+        other projection periods (and runs) with the same historical data.
+
+        Parameters
+        ----------
+        method: str
+            'quantile_mapping' or 'quantile_delta_mapping'
+        variables: list
+            variables to downscale
+        hist_period: tuple
+            (start, end) years of historical period
+        proj_period: tuple
+            (start, end) years of projection period
+        obs_key: str
+            YearlyTimeseries item in `data` with observations
+        sim_key: str
+            YearlyTimeseries item in `data` with simulated data
+        kind: str, defaults '+'
+            '+' or '*'
+        **kwargs:
+            'n_quantiles': int, defaults quantile_mapping.DEFAULT_N_QUANTILES
+            'cache_dir': Path, optional
+                directory to save and load quantile tables
+            'block_size': int or tuple, defaults blocks.DEFAULT_BLOCK_SIZE
+            'parallel': bool, defaults False
+                when True blocks are processed with joblib
+            'n_jobs': int, defaults -1
+                number of joblib workers when 'parallel' is True, -1 for
+                one per cpu
+
+        Returns
+        -------
+        xr.Dataset
+        """
+        lookup = lambda kw, ke, de: kw[ke] if ke in kw else de
+        n_quantiles = lookup(
+            kwargs, 'n_quantiles', quantile_mapping.DEFAULT_N_QUANTILES
+        )
+        cache_dir = lookup(kwargs, 'cache_dir', None)
+        block_size = lookup(kwargs, 'block_size', blocks.DEFAULT_BLOCK_SIZE)
+        parallel = lookup(kwargs, 'parallel', False)
+        n_jobs = lookup(kwargs, 'n_jobs', -1)
 
+        obsh = self.data[obs_key].convert_range_to_single_dataset(variables, hist_period[0], hist_period[1])
+        simh = self.data[sim_key].convert_range_to_single_dataset(variables, hist_period[0], hist_period[1])
+        simp = self.data[sim_key].convert_range_to_single_dataset(variables, proj_period[0], proj_period[1])
+        results = []
+        for var in variables:
+            self.logger.info(f'.. Downscaling {var} with {method}')
+            tables = quantile_mapping.get_tables(
+                obsh[var], simh[var], n_quantiles, cache_dir, 
+                block_size, parallel, n_jobs
+            )
+            results.append(quantile_mapping.adjust(
+                method, tables, simp[var], kind, block_size, parallel, n_jobs
+            ))
+        return xr.merge(results)
 
     def to_TEM(self, downscaled_id):
         '''
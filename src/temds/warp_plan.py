@@ -0,0 +1,415 @@
+"""
+warp plan
+---------
+
+Reusable source grid -> destination grid resampling weights.
+
+Clipping a timeseries calls `gdal.Warp` for every variable of every year even
+though the source grid (i.e. CRU-JRA 0.5 degree) and destination grid (the
+region mask) never change. A `WarpPlan` computes the resampling weights for a
+grid pair once and then applies them to any number of bands with a sparse
+(gather and weighted sum) matrix product.
+
+The weights are stored in a fixed width sparse format (ELLPACK): every
+destination pixel has `k` (source index, weight) pairs, unused pairs have a
+weight of 0. NaN source pixels are excluded and the remaining weights are
+renormalized, which is what gdal does when `srcNodata=nan` and is what the
+"primer" warp in `gdal_tools.clip_opt_2` is fixing along coastlines.
+
+Like gdal, a bilinear destination pixel is only valid when the source pixel
+containing its center is valid.
+
+Indices are stored as int32 and weights as float32 (8 bytes per pair, about
+0.5 GB for a 4000x4000 bilinear plan). The weights renormalized for a source
+validity mask are kept, and reused while the mask does not change (i.e. the
+same land mask every year).
+
+Only linear resampling algorithms are supported, see `SUPPORTED_ALGORITHMS`.
+Bilinear is only supported when up sampling (gdal widens the kernel when down
+sampling). `get_warp_plan` returns None for anything else so callers can fall
+back to gdal.
+"""
+from functools import lru_cache
+
+import numpy as np
+from pyproj import CRS, Transformer
+
+SUPPORTED_ALGORITHMS = ('nearest', 'bilinear', 'average')
+
+## Max bytes used by the temporary arrays in `WarpPlan.apply`
+APPLY_BLOCK_BYTES = 2**21 # 2 MB, small enough to stay in cache
+
+## Max destination pixels transformed at once when building a plan
+BUILD_BLOCK_PIXELS = 2**20
+
+## Plans kept by `get_warp_plan`. Plans are large, callers that reuse one
+## for many datasets should keep a reference (see `get_warp_plan`)
+PLAN_CACHE_SIZE = 2
+
+
+class WarpPlan(object):
+    """Precomputed resampling weights from a source grid to a destination grid
+
+    Attributes
+    ----------
+    key: tuple
+        (source_shape, source_gt, source_crs, dest_shape, dest_gt, dest_crs,
+        resample_alg) the plan was built for
+    dest_shape: tuple
+        (rows, cols) of destination grid
+    source_shape: tuple
+        (rows, cols) of source grid
+    indices: np.array
+        (n destination pixels, k) int32 flat source pixel indices
+    weights: np.array
+        (n destination pixels, k) float32 weights for `indices`, 0 where 
+        unused
+    center: np.array or None
+        (n destination pixels,) int32 flat index of the source pixel 
+        containing each destination pixel center, for 'bilinear' only
+    """
+    def __init__(self, source_shape, source_gt, source_crs,
+                       dest_shape, dest_gt, dest_crs, resample_alg='bilinear'):
+        """
+        Parameters
+        ----------
+        source_shape: tuple
+            (rows, cols) of source grid
+        source_gt: tuple
+            gdal style geotransform of source grid
+        source_crs: str
+            WKT of source grid crs
+        dest_shape: tuple
+            (rows, cols) of destination grid
+        dest_gt: tuple
+            gdal style geotransform of destination grid
+        dest_crs: str
+            WKT of destination grid crs
+        resample_alg: str, defaults 'bilinear'
+            One of `SUPPORTED_ALGORITHMS`
+        """
+        if resample_alg not in SUPPORTED_ALGORITHMS:
+            raise ValueError(
+                f'WarpPlan: resample_alg must be one of {SUPPORTED_ALGORITHMS}'
+            )
+        if source_gt[2] != 0 or source_gt[4] != 0 \
+                or dest_gt[2] != 0 or dest_gt[4] != 0:
+            raise ValueError('WarpPlan: rotated geotransforms are not supported')
+
+        self.key = (
+            tuple(source_shape), tuple(source_gt), source_crs,
+            tuple(dest_shape), tuple(dest_gt), dest_crs, resample_alg
+        )
+        self.source_shape = tuple(source_shape)
+        self.dest_shape = tuple(dest_shape)
+        self.resample_alg = resample_alg
+        if self.source_shape[0] * self.source_shape[1] \
+                >= np.iinfo(np.int32).max:
+            raise ValueError('WarpPlan: source grid is too large')
+        ## (source valid mask, indices, weights, destination valid mask)
+        self._normalized = None
+
+        source_crs, dest_crs = CRS(source_crs), CRS(dest_crs)
+        if source_crs == dest_crs:
+            self._transformer = None
+        else:
+            self._transformer = Transformer.from_crs(
+                dest_crs, source_crs, always_xy=True
+            )
+        self._source_gt = tuple(source_gt)
+        self._dest_gt = tuple(dest_gt)
+
+        self.center = None
+        if resample_alg == 'bilinear' and self._source_pixels_per_dest() > 1:
+            raise ValueError('WarpPlan: bilinear down sampling is not supported')
+
+        if resample_alg == 'average':
+            self.indices, self.weights = self._build_average()
+        else:
+            self.indices, self.weights = self._build_point()
+        del self._transformer
+
+    def __repr__(self):
+        return (
+            f"{type(self).__module__}.{type(self).__name__}"
+            f"({self.resample_alg}, {self.source_shape} -> {self.dest_shape})"
+        )
+
+    @property
+    def k(self):
+        """number of (index, weight) pairs per destination pixel"""
+        return self.indices.shape[1]
+
+    def _to_source_pixel(self, dest_col, dest_row):
+        """Convert fractional destination pixel coords to fractional source
+        pixel coords
+        """
+        dgt, sgt = self._dest_gt, self._source_gt
+        x = dgt[0] + dest_col * dgt[1]
+        y = dgt[3] + dest_row * dgt[5]
+        if self._transformer is not None:
+            x, y = self._transformer.transform(x, y)
+            x, y = np.asarray(x), np.asarray(y)
+        return (x - sgt[0]) / sgt[1], (y - sgt[3]) / sgt[5]
+
+    def _source_pixels_per_dest(self):
+        """Approximate size of a destination pixel in source pixels,
+        measured at the center of the destination grid.
+        """
+        d_rows, d_cols = self.dest_shape
+        cx, cy = d_cols / 2, d_rows / 2
+        px, py = self._to_source_pixel(
+            np.array([cx, cx + 1, cx]), np.array([cy, cy, cy + 1])
+        )
+        return max(
+            np.hypot(px[1] - px[0], py[1] - py[0]), 
+            np.hypot(px[2] - px[0], py[2] - py[0])
+        )
+
+    def _build_point(self):
+        """Build weights for 'nearest' or 'bilinear', sampling at
+        destination pixel centers.
+        """
+        n_rows, n_cols = self.source_shape
+        d_rows, d_cols = self.dest_shape
+        k = 1 if self.resample_alg == 'nearest' else 4
+        indices = np.zeros((d_rows * d_cols, k), dtype=np.int32)
+        weights = np.zeros((d_rows * d_cols, k), dtype=np.float32)
+        if self.resample_alg == 'bilinear':
+            self.center = np.zeros(d_rows * d_cols, dtype=np.int32)
+
+        rows_per_block = max(1, BUILD_BLOCK_PIXELS // max(d_cols, 1))
+        cols = np.arange(d_cols) + 0.5
+        for start in range(0, d_rows, rows_per_block):
+            stop = min(start + rows_per_block, d_rows)
+            dc, dr = np.meshgrid(cols, np.arange(start, stop) + 0.5)
+            px, py = self._to_source_pixel(dc.ravel(), dr.ravel())
+            block = slice(start * d_cols, stop * d_cols)
+
+            ## gdal skips destination pixels whose center falls outside the
+            ## source grid
+            inside = np.isfinite(px) & np.isfinite(py) \
+                & (px >= 0) & (px <= n_cols) & (py >= 0) & (py <= n_rows)
+
+            ix = np.clip(np.floor(np.where(inside, px, 0)), 0, n_cols - 1)
+            iy = np.clip(np.floor(np.where(inside, py, 0)), 0, n_rows - 1)
+            center = iy.astype(np.int64) * n_cols + ix.astype(np.int64)
+            if self.resample_alg == 'nearest':
+                indices[block, 0] = center
+                weights[block, 0] = inside
+                continue
+            self.center[block] = center
+
+            ## bilinear: source pixel centers are at +.5
+            fx, fy = px - 0.5, py - 0.5
+            ix0, iy0 = np.floor(fx), np.floor(fy)
+            wx1, wy1 = fx - ix0, fy - iy0
+            ix0 = np.where(inside, ix0, 0).astype(np.int64)
+            iy0 = np.where(inside, iy0, 0).astype(np.int64)
+            corners = (
+                (0, 0, (1 - wx1) * (1 - wy1)),
+                (1, 0, wx1 * (1 - wy1)),
+                (0, 1, (1 - wx1) * wy1),
+                (1, 1, wx1 * wy1),
+            )
+            for c, (ox, oy, w) in enumerate(corners):
+                ix, iy = ix0 + ox, iy0 + oy
+                ## neighbors off the edge of the source are dropped and the
+                ## rest are renormalized (same as gdal)
+                valid = inside & (ix >= 0) & (ix < n_cols) \
+                    & (iy >= 0) & (iy < n_rows)
+                indices[block, c] = np.where(valid, iy * n_cols + ix, 0)
+                weights[block, c] = np.where(valid, w, 0)
+        return indices, weights
+
+    def _build_average(self):
+        """Build weights for 'average'. Each destination pixel footprint is
+        mapped to the source grid and overlapping source pixels are weighted
+        by their fractional overlap.
+        """
+        n_rows, n_cols = self.source_shape
+        d_rows, d_cols = self.dest_shape
+
+        ## corners of every destination pixel
+        dc, dr = np.meshgrid(
+            np.arange(d_cols + 1, dtype=float), np.arange(d_rows + 1, dtype=float)
+        )
+        px, py = self._to_source_pixel(dc.ravel(), dr.ravel())
+        px = px.reshape(d_rows + 1, d_cols + 1)
+        py = py.reshape(d_rows + 1, d_cols + 1)
+        x0, x1 = px[:-1, :-1].ravel(), px[1:, 1:].ravel()
+        y0, y1 = py[:-1, :-1].ravel(), py[1:, 1:].ravel()
+        x_min, x_max = np.fmin(x0, x1), np.fmax(x0, x1)
+        y_min, y_max = np.fmin(y0, y1), np.fmax(y0, y1)
+        finite = np.isfinite(x_min) & np.isfinite(x_max) \
+            & np.isfinite(y_min) & np.isfinite(y_max)
+
+        x_min = np.where(finite, np.clip(x_min, 0, n_cols), 0)
+        x_max = np.where(finite, np.clip(x_max, 0, n_cols), 0)
+        y_min = np.where(finite, np.clip(y_min, 0, n_rows), 0)
+        y_max = np.where(finite, np.clip(y_max, 0, n_rows), 0)
+
+        ix_min = np.floor(x_min + 1e-10).astype(np.int64)
+        ix_max = np.ceil(x_max - 1e-10).astype(np.int64)
+        iy_min = np.floor(y_min + 1e-10).astype(np.int64)
+        iy_max = np.ceil(y_max - 1e-10).astype(np.int64)
+        span_x = np.maximum(ix_max - ix_min, 0)
+        span_y = np.maximum(iy_max - iy_min, 0)
+        kx = int(span_x.max()) if span_x.size else 0
+        ky = int(span_y.max()) if span_y.size else 0
+
+        n_dest = d_rows * d_cols
+        indices = np.zeros((n_dest, max(kx * ky, 1)), dtype=np.int32)
+        weights = np.zeros((n_dest, max(kx * ky, 1)), dtype=np.float32)
+        c = 0
+        for oy in range(ky):
+            iy = iy_min + oy
+            wy = np.minimum(iy + 1, y_max) - np.maximum(iy, y_min)
+            wy = np.where(oy < span_y, np.maximum(wy, 0), 0)
+            for ox in range(kx):
+                ix = ix_min + ox
+                wx = np.minimum(ix + 1, x_max) - np.maximum(ix, x_min)
+                wx = np.where(ox < span_x, np.maximum(wx, 0), 0)
+                w = wx * wy
+                used = w > 0
+                indices[:, c] = np.where(used, iy * n_cols + ix, 0)
+                weights[:, c] = w
+                c += 1
+        return indices, weights
+
+    def matches(self, source_shape, source_gt, source_crs,
+                      dest_shape, dest_gt, dest_crs, resample_alg):
+        """Check if this plan was built for the given grids and algorithm
+
+        Returns
+        -------
+        bool
+        """
+        return self.key == (
+            tuple(source_shape), tuple(source_gt), source_crs,
+            tuple(dest_shape), tuple(dest_gt), dest_crs, resample_alg
+        )
+
+    def _normalize(self, valid):
+        """Weights renormalized for a source validity mask
+
+        Parameters
+        ----------
+        valid: np.array
+            (n source pixels,) bool, False where the source is no data
+
+        Returns
+        -------
+        tuple
+            (indices, weights, dest_valid). Unused pairs have a weight of 0
+            and point at a used pair of the same destination pixel, so a 
+            NaN there is not multiplied by 0.
+        """
+        normalized = self._normalized
+        if normalized is not None and np.array_equal(normalized[0], valid):
+            return normalized[1:]
+
+        n_dest = self.indices.shape[0]
+        indices = np.empty_like(self.indices)
+        weights = np.empty_like(self.weights)
+        dest_valid = np.empty(n_dest, dtype=bool)
+        dest_per_block = max(1, APPLY_BLOCK_BYTES // max(self.k * 8, 1))
+        for start in range(0, n_dest, dest_per_block):
+            block = slice(start, min(start + dest_per_block, n_dest))
+            block_indices = self.indices[block]
+            block_weights = np.where(
+                valid[block_indices], self.weights[block], 0
+            ).astype(np.float64)
+            denominator = block_weights.sum(axis=1)
+            block_valid = denominator > 1e-7
+            if self.center is not None:
+                block_valid &= valid[self.center[block]]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                block_weights = np.where(
+                    block_valid[:, None], 
+                    block_weights / denominator[:, None], 0
+                )
+            used = block_weights > 0
+            first = block_indices[
+                np.arange(block_indices.shape[0]), used.argmax(axis=1)
+            ]
+            indices[block] = np.where(used, block_indices, first[:, None])
+            weights[block] = block_weights
+            dest_valid[block] = block_valid
+
+        self._normalized = (valid, indices, weights, dest_valid)
+        return indices, weights, dest_valid
+
+    def apply(self, data, dtype=np.float32):
+        """Resample `data` from the source grid to the destination grid
+
+        Parameters
+        ----------
+        data: np.array
+            (rows, cols) or (bands, rows, cols) array on the source grid.
+            NaN values are treated as no data.
+        dtype: np.dtype, defaults np.float32
+            dtype of returned array. Sums are computed as float64.
+
+        Returns
+        -------
+        np.array
+            (rows, cols) or (bands, rows, cols) array on the destination grid,
+            NaN where no valid source data contributes.
+        """
+        single = data.ndim == 2
+        n_rows, n_cols = self.source_shape
+        source = data.reshape(-1, n_rows * n_cols)
+        n_bands = source.shape[0]
+        n_dest = self.indices.shape[0]
+
+        ## gdal uses a single (unified) validity mask for all bands: a source 
+        ## pixel is no data only if it is NaN in every band, a NaN in only
+        ## some bands propagates to the result
+        valid = ~np.isnan(source).all(axis=0)
+        indices, weights, dest_valid = self._normalize(valid)
+
+        ## gather straight from the (bands, pixels) source into a 
+        ## (bands, pixels) result
+        result = np.empty((n_bands, n_dest), dtype=dtype)
+        dest_per_block = max(1, APPLY_BLOCK_BYTES // max(n_bands * 8 * 2, 1))
+        for start in range(0, n_dest, dest_per_block):
+            block = slice(start, min(start + dest_per_block, n_dest))
+            total = np.zeros((n_bands, block.stop - start))
+            for c in range(self.k):
+                total += source[:, indices[block, c]] * weights[block, c].astype(np.float64)
+            total[:, ~dest_valid[block]] = np.nan
+            result[:, block] = total
+            del total
+
+        result = result.reshape((n_bands,) + self.dest_shape)
+        return result[0] if single else result
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def get_warp_plan(source_shape, source_gt, source_crs,
+                  dest_shape, dest_gt, dest_crs, resample_alg='bilinear'):
+    """Get a cached `WarpPlan` for a source/destination grid pair. All
+    arguments must be hashable (tuples and WKT strings). Only the last
+    `PLAN_CACHE_SIZE` plans are kept, `get_warp_plan.cache_clear()` frees
+    them.
+
+    Parameters
+    ----------
+    see `WarpPlan.__init__`
+
+    Returns
+    -------
+    WarpPlan or None
+        None when `resample_alg` is not supported or the geotransforms are
+        rotated. Callers should fall back to gdal.Warp.
+    """
+    if resample_alg not in SUPPORTED_ALGORITHMS:
+        return None
+    try:
+        return WarpPlan(
+            source_shape, source_gt, source_crs,
+            dest_shape, dest_gt, dest_crs, resample_alg
+        )
+    except ValueError:
+        return None
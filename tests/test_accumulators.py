@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+import pytest
+
+import numpy as np
+
+from temds import accumulators, constants
+
+
+@pytest.fixture
+def years():
+  '''Three years of small daily grids'''
+  rng = np.random.default_rng(0)
+  return rng.normal(size=(3, 365, 4, 5)).astype(np.float32)
+
+def test_running_mean_matches_stacked_mean(years):
+  running = accumulators.RunningMean()
+  for year in years:
+    running.add(year)
+
+  assert running.count == 3
+  np.testing.assert_allclose(running.mean(), years.mean(axis=0), atol=1e-6)
+
+def test_running_mean_shape_mismatch(years):
+  running = accumulators.RunningMean()
+  running.add(years[0])
+  with pytest.raises(ValueError):
+    running.add(years[0, :10])
+
+@pytest.mark.parametrize('method', ['mean', 'sum'])
+def test_monthly_reduce_matches_month_slices(years, method):
+  daily = years[0]
+  expected = np.array([
+    getattr(daily[constants.get_month_slice(mn)], method)(axis=0)
+    for mn in range(12)
+  ])
+  result = accumulators.monthly_reduce(daily, method)
+
+  assert result.shape == (12, 4, 5)
+  np.testing.assert_allclose(result, expected, atol=1e-5)
+
+def test_monthly_reduce_unknown_method(years):
+  with pytest.raises(ValueError):
+    accumulators.monthly_reduce(years[0], 'max')
+
+def test_daily_stats_matches_numpy(years):
+  stats = accumulators.DailyStats()
+  for year in years:
+    stats.add(year)
+
+  assert stats.count == 3
+  np.testing.assert_allclose(stats.mean, years.mean(axis=0, dtype=np.float64), atol=1e-6)
+  np.testing.assert_allclose(stats.std, years.std(axis=0, dtype=np.float64), atol=1e-6)
+  np.testing.assert_array_equal(stats.min, years.min(axis=0))
+  np.testing.assert_array_equal(stats.max, years.max(axis=0))
+  assert stats.dtype == np.float32
+
+def test_daily_stats_merge_and_concatenate(years):
+  full = accumulators.DailyStats()
+  for year in years:
+    full.add(year)
+
+  ## year ranges
+  first, second = accumulators.DailyStats(), accumulators.DailyStats()
+  first.add(years[0])
+  second.add(years[1])
+  second.add(years[2])
+  merged = first.merge(second)
+  assert merged.count == 3
+  np.testing.assert_allclose(merged.mean, full.mean)
+  np.testing.assert_allclose(merged.variance, full.variance)
+
+  ## spatial blocks
+  blocks = []
+  for block in (slice(0, 2), slice(2, 5)):
+    part = accumulators.DailyStats()
+    for year in years:
+      part.add(year[..., block])
+    blocks.append(part)
+  joined = accumulators.DailyStats.concatenate(blocks, axis=-1)
+  np.testing.assert_allclose(joined.mean, full.mean)
+  np.testing.assert_allclose(joined.variance, full.variance)
+  np.testing.assert_array_equal(joined.max, full.max)
+
+def test_daily_stats_nan_propagates(years):
+  data = years.copy()
+  data[1, 0, 0, 0] = np.nan
+  stats = accumulators.DailyStats()
+  for year in data:
+    stats.add(year)
+
+  assert np.isnan(stats.mean[0, 0, 0]) and np.isnan(stats.std[0, 0, 0])
+  assert not np.isnan(stats.mean[1:]).any()
+
+@pytest.mark.parametrize('method', ['mean', 'sum'])
+def test_monthly_baseline_blocks_match_whole(years, method):
+  whole = accumulators.monthly_baseline(iter(years), method)
+  left = accumulators.monthly_baseline((y[..., :2] for y in years), method)
+  right = accumulators.monthly_baseline((y[..., 2:] for y in years), method)
+
+  assert whole.dtype == np.float32
+  np.testing.assert_array_equal(np.concatenate([left, right], axis=-1), whole)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+import os
+
+import yaml
+
+from temds.region import artifacts
+
+
+def write_inputs(where):
+  '''directory of yearly files and a reference file'''
+  (where / 'source').mkdir()
+  for year in (2000, 2001):
+    (where / 'source' / f'source-{year}.nc').write_bytes(b'data')
+  (where / 'reference.nc').write_bytes(b'data')
+  return where / 'source', where / 'reference.nc'
+
+def test_artifact_key_is_stable(tmp_path):
+  source, reference = write_inputs(tmp_path)
+  first = artifacts.artifact_key('baseline', [source], years=(2000, 2001))
+  second = artifacts.artifact_key('baseline', [source], years=(2000, 2001))
+  assert first == second
+
+def test_artifact_key_changes_with_inputs(tmp_path):
+  source, reference = write_inputs(tmp_path)
+  key = lambda **kw: artifacts.artifact_key('baseline', [source], **kw)
+  original = key(years=(2000, 2001))
+
+  assert key(years=(2000, 2002)) != original
+  assert artifacts.artifact_key('correction-factors', [source], years=(2000, 2001)) != original
+  assert artifacts.artifact_key('baseline', [source, reference], years=(2000, 2001)) != original
+
+  stat = (source / 'source-2001.nc').stat()
+  os.utime(source / 'source-2001.nc', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+  assert key(years=(2000, 2001)) != original
+
+def test_artifact_key_checksum(tmp_path):
+  source, reference = write_inputs(tmp_path)
+  original = artifacts.artifact_key('baseline', [reference], checksum=True)
+  stat = reference.stat()
+  os.utime(reference, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+  assert artifacts.artifact_key('baseline', [reference], checksum=True) == original
+
+  reference.write_bytes(b'changed')
+  assert artifacts.artifact_key('baseline', [reference], checksum=True) != original
+
+def test_region_input(tmp_path):
+  source, reference = write_inputs(tmp_path)
+  with (tmp_path / 'manifest.yml').open('w') as fd:
+    yaml.safe_dump({'data': {'source': 'source', 'reference': 'reference.nc'}}, fd)
+
+  assert artifacts.region_input(tmp_path, 'source') == source
+  assert artifacts.region_input(tmp_path, 'reference') == reference
+  assert artifacts.region_input(tmp_path, 'missing') is None
+  assert artifacts.region_input(tmp_path / 'source', 'source') is None
+
+def test_cache_beside(tmp_path):
+  source, reference = write_inputs(tmp_path)
+  assert artifacts.cache_beside(source).where == tmp_path.resolve() / artifacts.CACHE_DIRNAME
+  assert artifacts.cache_beside(reference).where == artifacts.cache_beside(source).where
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+import pytest
+
+import numpy as np
+import xarray as xr
+
+from temds import blocks
+
+
+@pytest.fixture
+def grid():
+  '''Small daily grid with missing values and a spatial_ref coordinate'''
+  rng = np.random.default_rng(0)
+  values = rng.normal(size=(4, 5, 7)).astype(np.float32)
+  values[0, 1, 2] = np.nan
+  return xr.Dataset(
+    {'tair': (('time', 'y', 'x'), values, {'units': 'degC'})},
+    coords={
+      'time': np.arange(4),
+      'y': np.arange(5, 0, -1) * 10.0,
+      'x': np.arange(7) * 10.0,
+      'spatial_ref': ((), 0, {'crs_wkt': 'test'}),
+    },
+    attrs={'data_year': 2000},
+  )
+
+def test_block_windows_cover_grid_once():
+  covered = np.zeros((5, 7), dtype=int)
+  windows = blocks.block_windows((5, 7), (2, 3))
+  for window in windows:
+    covered[window['y'], window['x']] += 1
+
+  assert len(windows) == 3 * 3
+  assert (covered == 1).all()
+  assert blocks.block_windows((5, 7), 10) == [
+    {'y': slice(0, 5), 'x': slice(0, 7)}
+  ]
+
+def test_block_size_must_be_positive():
+  with pytest.raises(ValueError):
+    blocks.block_windows((5, 7), 0)
+
+def test_preallocate_and_write_windows(grid, tmp_path):
+  out_file = tmp_path / 'out.nc'
+  var = grid['tair']
+  blocks.preallocate(
+    out_file, grid, {'tair': (var.dims, var.dtype, dict(var.attrs))}, 2
+  )
+  for window in blocks.block_windows((5, 7), 2):
+    blocks.write_window(
+      out_file, window, {'tair': grid['tair'].isel(window).values}
+    )
+
+  with xr.open_dataset(out_file) as result:
+    assert result['tair'].dtype == np.float32
+    assert result['tair'].attrs['units'] == 'degC'
+    assert result['tair'].encoding['_FillValue'] == blocks.FILL_VALUE
+    assert result.attrs['data_year'] == 2000
+    assert 'spatial_ref' in result.coords
+    xr.testing.assert_equal(result['tair'], grid['tair'])
+
+def test_preallocate_unwritten_windows_are_missing(grid, tmp_path):
+  out_file = tmp_path / 'out.nc'
+  blocks.preallocate(out_file, grid, {'tair': (grid['tair'].dims, 'f4', {})})
+  blocks.write_window(
+    out_file, {'y': slice(0, 2), 'x': slice(0, 3)}, 
+    {'tair': np.ones((4, 2, 3), dtype=np.float32)}
+  )
+
+  with xr.open_dataset(out_file) as result:
+    assert (result['tair'][:, :2, :3] == 1).all()
+    assert result['tair'][:, 2:].isnull().all()
+
+  with pytest.raises(FileExistsError):
+    blocks.preallocate(out_file, grid, {'tair': (grid['tair'].dims, 'f4', {})})
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import copy
+import pickle
+
+import numpy as np
+import xarray as xr
+
+from temds.datasources.cache import DatasetCache
+
+
+def make_dataset(n_values):
+  '''Dataset of `n_values` float64 (8 bytes each)'''
+  return xr.Dataset({'v': ('x', np.zeros(n_values))})
+
+def counting_loader(calls, n_values):
+  def loader():
+    calls.append(n_values)
+    return make_dataset(n_values)
+  return loader
+
+def test_cache_hits_and_misses():
+  cache = DatasetCache(max_bytes=1000)
+  calls = []
+  first = cache.get('a', counting_loader(calls, 10))
+  second = cache.get('a', counting_loader(calls, 10))
+
+  assert first is second
+  assert calls == [10]
+  assert cache.stats()['hits'] == 1
+  assert cache.stats()['misses'] == 1
+  assert cache.current_bytes == 80
+
+def test_cache_evicts_least_recently_used():
+  cache = DatasetCache(max_bytes=200)
+  calls = []
+  cache.get('a', counting_loader(calls, 10))
+  cache.get('b', counting_loader(calls, 10))
+  cache.get('a', counting_loader(calls, 10)) # 'b' is now oldest
+  cache.get('c', counting_loader(calls, 10))
+
+  assert 'a' in cache and 'c' in cache
+  assert 'b' not in cache
+  assert cache.evictions == 1
+  assert cache.current_bytes <= cache.max_bytes
+
+def test_cache_skips_items_over_limit():
+  cache = DatasetCache(max_bytes=100)
+  calls = []
+  cache.get('big', counting_loader(calls, 100))
+  cache.get('big', counting_loader(calls, 100))
+
+  assert len(cache) == 0
+  assert calls == [100, 100]
+
+def test_cache_evict_and_clear():
+  cache = DatasetCache(max_bytes=1000)
+  cache.get('a', lambda: make_dataset(10))
+  cache.get('b', lambda: make_dataset(10))
+
+  cache.evict('a')
+  assert 'a' not in cache
+  assert cache.current_bytes == 80
+
+  cache.clear()
+  assert len(cache) == 0
+  assert cache.current_bytes == 0
+
+def test_cache_copies_start_empty():
+  cache = DatasetCache(max_bytes=1000)
+  cache.get('a', lambda: make_dataset(10))
+
+  for other in (copy.deepcopy(cache), pickle.loads(pickle.dumps(cache))):
+    assert len(other) == 0
+    assert other.max_bytes == 1000
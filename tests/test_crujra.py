@@ -1,8 +1,13 @@
 #!/usr/bin/env python
 
+import gzip
 import pathlib
 import pytest
+import numpy as np
+import xarray as xr
 import temds.datasources
+from temds import climate_variables
+from temds.datasources import crujra
 
 
 def test_found_cru_arctic_L1_files():
@@ -34,6 +39,86 @@ def test_arctic_files(cru_arctic_timeseries_micro):
   assert 1901 == cru_arctic_timeseries_micro.data[0].year
 
 
-
-
-
+@pytest.mark.parametrize('method', ['mean', 'sum'])
+def test_aggregate_daily_matches_resample(method):
+  '''Fast 6hr -> daily aggregation should match xr.resample, NaNs included'''
+  rng = np.random.default_rng(0)
+  time = xr.date_range('1901-01-01', periods=365 * 4, freq='6h')
+  data = rng.normal(size=(time.size, 5, 7)).astype(np.float32)
+  data[:, 0, 0] = np.nan # always missing
+  data[3, 1, 1] = np.nan # one missing step
+  raw = xr.Dataset(
+    {'tmp': (('time', 'lat', 'lon'), data, {'units': 'K'})},
+    coords={'time': time, 'lat': np.arange(5.0), 'lon': np.arange(7.0)}
+  )
+
+  assert crujra.has_regular_steps(raw.indexes['time'])
+  result = crujra.aggregate_daily(raw, 'tmp', method, chunk_days=30)
+  expected = climate_variables.RESAMPLE_METHODS[method](raw)
+  xr.testing.assert_allclose(result, expected)
+
+def test_has_regular_steps_irregular():
+  time = xr.date_range('1901-01-01', periods=8 * 4, freq='6h')
+  assert not crujra.has_regular_steps(time[1:]) # partial day
+  assert not crujra.has_regular_steps(time[np.r_[0:8, 12:20]]) # missing day
+
+## units attributes of the raw CRU-JRA v2.5 files
+RAW_UNITS = {
+  'tmp': 'K', 'tmin': 'K', 'tmax': 'K', 'pre': 'mm/6h', 'dswrf': 'J/m2',
+  'ugrd': 'm/s', 'vgrd': 'm/s', 'spfh': 'kg/kg', 'pres': 'Pa',
+}
+
+def write_raw_crujra(where, year, n_days=3):
+  '''Small gzipped raw (6hr) CRU-JRA files, sorted by variable'''
+  rng = np.random.default_rng(1)
+  time = xr.date_range(f'{year}-01-01', periods=n_days * 4, freq='6h')
+  for var in crujra.SOURCE_VARS:
+    data = rng.uniform(1, 2, size=(time.size, 4, 6)).astype(np.float32)
+    raw = xr.Dataset(
+      {var: (('time', 'lat', 'lon'), data, {'units': RAW_UNITS[var]})},
+      coords={'time': time, 'lat': np.arange(60.0, 56.0, -1), 'lon': np.arange(6.0)}
+    )
+    var_path = pathlib.Path(where, var, f'{crujra.name_for(var, year)}.nc')
+    var_path.parent.mkdir()
+    raw.to_netcdf(var_path)
+    with var_path.open('rb') as src, gzip.open(f'{var_path}.gz', 'wb') as dst:
+      dst.write(src.read())
+    var_path.unlink()
+
+def test_from_crujra_in_memory_matches_disk(tmp_path):
+  '''Decompressing in memory should give the same data as extracting to
+  disk, and should not leave any extracted files behind'''
+  write_raw_crujra(tmp_path, 1901)
+  load = lambda **kwargs: temds.datasources.dataset.YearlyDataset.from_crujra(
+    1901, tmp_path, **kwargs
+  )
+  on_disk = load()
+  in_memory = load(decompress_in_memory=True, decompress_workers=3)
+
+  xr.testing.assert_identical(on_disk.dataset, in_memory.dataset)
+  assert list(tmp_path.glob('*/*.nc')) == []
+
+def test_from_crujra_in_memory_with_extracted_vars(tmp_path, monkeypatch):
+  '''Variables that are already extracted do not stop the later 
+  compressed variables being decompressed in memory'''
+  load = lambda where, **kwargs: temds.datasources.dataset.YearlyDataset.from_crujra(
+    1901, where, **kwargs
+  )
+  for where in ('mixed', 'disk'):
+    tmp_path.joinpath(where).mkdir()
+    write_raw_crujra(tmp_path / where, 1901)
+  expected = load(tmp_path / 'disk')
+
+  for var in crujra.SOURCE_VARS[:2]:
+    gz_path = next(tmp_path.joinpath('mixed', var).glob('*.gz'))
+    with gzip.open(gz_path, 'rb') as src:
+      gz_path.with_suffix('').write_bytes(src.read())
+    gz_path.unlink()
+
+  def fail(*args, **kwargs):
+    raise AssertionError('compressed variable extracted to disk')
+  monkeypatch.setattr(temds.file_tools, 'extract', fail)
+  mixed = load(tmp_path / 'mixed', decompress_in_memory=True, decompress_workers=1)
+
+  xr.testing.assert_identical(mixed.dataset, expected.dataset)
+  assert len(list(tmp_path.glob('mixed/*/*.nc'))) == 2
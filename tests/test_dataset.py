@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+import tempfile
+
+import pytest
+
+import numpy as np
+import xarray as xr
+import rioxarray
+import rasterio
+from affine import Affine
+from osgeo import gdal
+from pyproj import CRS, Transformer
+
+from temds.datasources.dataset import TEMDataset
+from temds import gdal_tools
+
+EXTENT_CRS = CRS.from_epsg(6931)
+EXTENT = (-2000000.0, -1400000.0, -1600000.0, -1000000.0) # minx, miny, maxx, maxy
+RESOLUTION = (4000.0, -4000.0)
+
+
+@pytest.fixture()
+def synthetic_year():
+  '''Small 0.5 degree daily dataset north of 45N with an "ocean" of NaNs.'''
+  rng = np.random.default_rng(0)
+  lat = np.arange(89.75, 45, -0.5)
+  lon = np.arange(-179.75, 180, 0.5)
+  time = xr.date_range('2000-01-01', periods=10, freq='D', calendar='noleap', use_cftime=True)
+  data = rng.normal(size=(time.size, lat.size, lon.size)).astype(np.float32)
+  data[:, :30] = np.nan
+  ds = xr.Dataset({
+    var: xr.DataArray(
+      data + idx, dims=['time', 'lat', 'lon'],
+      coords={'time': time, 'lat': lat, 'lon': lon}, attrs={'units': 'K'}
+    ) for idx, var in enumerate(['tmax', 'tmin'])
+  })
+  ds.rio.set_spatial_dims('lon', 'lat', inplace=True)
+  ds.rio.write_crs(4326, inplace=True)
+  return TEMDataset(ds)
+
+@pytest.mark.parametrize('kwargs', [
+  dict(),
+  dict(use_warp_plan=False),
+  dict(use_warp_plan=False, single_pass_warp=False),
+])
+def test_get_by_extent_does_no_disk_io(synthetic_year, tmp_path, monkeypatch, kwargs):
+  '''clipping is a hot path and must not create files'''
+  work_dir = tmp_path.joinpath('work')
+  scratch_dir = tmp_path.joinpath('scratch')
+  work_dir.mkdir()
+  scratch_dir.mkdir()
+  monkeypatch.chdir(work_dir)
+  monkeypatch.setattr(tempfile, 'tempdir', str(scratch_dir))
+  monkeypatch.delenv('TEMDS_DEBUG_ARTIFACT_DIR', raising=False)
+
+  tile = synthetic_year.get_by_extent(
+    *EXTENT, EXTENT_CRS, resolution=RESOLUTION, **kwargs
+  )
+
+  assert tile.dataset['tmax'].shape == (10, 100, 100)
+  assert list(work_dir.iterdir()) == []
+  assert list(scratch_dir.iterdir()) == []
+
+def test_get_by_extent_debug_artifacts(synthetic_year, tmp_path):
+  debug_dir = tmp_path.joinpath('debug')
+  for _ in range(2):
+    synthetic_year.get_by_extent(
+      *EXTENT, EXTENT_CRS, resolution=RESOLUTION, 
+      use_warp_plan=False, debug_artifact_dir=debug_dir
+    )
+  ## unique name per call
+  assert len(list(debug_dir.glob('clip-dest-*.tif'))) == 2
+
+
+class SoilRegion:
+  '''The parts of a Region used by from_soil_texture: 20x20 10km pixels 
+  in EPSG:6931 around 145W 65N'''
+  shape = (20, 20)
+  crs = CRS.from_epsg(6931)
+
+  def __init__(self):
+    x, y = Transformer.from_crs(4326, self.crs, always_xy=True).transform(-145, 65)
+    self.transform = (x - 100000, 10000, 0, y + 100000, 0, -10000)
+
+  def empty_gdal_dataset(self):
+    return gdal_tools.empty_dataset(*self.shape, self.crs.to_wkt(), self.transform)
+
+@pytest.fixture()
+def soil_texture_dir(tmp_path):
+  '''SoilGrids like GeoTIFFs (g/kg) for 3 depths with a hole of no data'''
+  rows, cols = np.mgrid[0:120, 0:200]
+  for idx, texture in enumerate(['clay', 'sand', 'silt']):
+    for depth, scale in [('15-30cm', 1), ('30-60cm', 2), ('60-100cm', 3)]:
+      data = (100 * idx + scale * (cols + rows)).astype(np.int16)
+      data[50:55, 60:70] = -32768
+      with rasterio.open(
+          tmp_path / f'{texture}_{depth}_mean_1000.tif', 'w', driver='GTiff', 
+          height=data.shape[0], width=data.shape[1], count=1, dtype='int16',
+          crs='EPSG:4326', transform=Affine(0.05, 0, -150, 0, -0.05, 68), 
+          nodata=-32768,
+        ) as fd:
+        fd.write(data, 1)
+  return tmp_path
+
+def soil_texture_reference(data_path, region):
+  '''from_soil_texture before blocks: each depth is warped to the whole
+  grid with gdal's default (approximate) transformer and averaged'''
+  gt = region.transform
+  bounds = (
+    gt[0], gt[3] + region.shape[1] * gt[5], gt[0] + region.shape[0] * gt[1], gt[3]
+  )
+  reference = {}
+  for texture in ['clay', 'sand', 'silt']:
+    depths = [
+      gdal.Warp(
+        '', str(data_path / f'{texture}_{depth}_mean_1000.tif'), format='MEM',
+        dstSRS=region.crs.to_wkt(), xRes=gt[1], yRes=abs(gt[5]), 
+        resampleAlg='average', outputType=gdal.GDT_Float32, outputBounds=bounds
+      ).ReadAsArray() for depth in ['15-30cm', '30-60cm', '60-100cm']
+    ]
+    reference[f'pct_{texture}'] = (
+      depths[0] * 15 + depths[1] * 30 + depths[2] * 40
+    ) / 850
+  return reference
+
+def test_from_soil_texture_matches_reference(soil_texture_dir):
+  region = SoilRegion()
+  result = TEMDataset.from_soil_texture(soil_texture_dir, region)
+  reference = soil_texture_reference(soil_texture_dir, region)
+
+  for var in ['pct_clay', 'pct_sand', 'pct_silt']:
+    # the reference transformer moves source footprints by up to 1/8 
+    # of a source pixel, at most ~0.02 percent for these smooth fields
+    np.testing.assert_allclose(
+      result.dataset[var].values, reference[var], rtol=0, atol=0.05
+    )
+
+def test_from_soil_texture_blocks_match_single_block(soil_texture_dir):
+  '''block size changes memory use, not results'''
+  region = SoilRegion()
+  single = TEMDataset.from_soil_texture(soil_texture_dir, region, block_size=1000)
+  blocked = TEMDataset.from_soil_texture(soil_texture_dir, region, block_size=(3, 4))
+
+  for var in ['pct_clay', 'pct_sand', 'pct_silt']:
+    assert blocked.dataset[var].shape == (20, 20)
+    np.testing.assert_allclose(
+      blocked.dataset[var].values, single.dataset[var].values, rtol=1e-6
+    )
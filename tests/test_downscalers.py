@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+import numpy as np
+import xarray as xr
+
+from temds import downscalers
+
+VARIABLES = ['tair_avg', 'prec', 'winddir']
+
+
+def test_delta_downscale_matches_downscalers():
+  '''the fused kernel should give the same values as the per month 
+  downscaler functions, and keep float32'''
+  rng = np.random.default_rng(0)
+  time = xr.date_range('2001-01-01', periods=365, freq='D', calendar='noleap', use_cftime=True)
+  coords = {'y': np.arange(6.0), 'x': np.arange(7.0)}
+  source = xr.Dataset({
+    var: (('time', 'y', 'x'), rng.normal(size=(365, 6, 7)).astype(np.float32), {'units': 'u'})
+    for var in VARIABLES
+  }, coords={'time': time, **coords})
+  correction = xr.Dataset({
+    var: (('time', 'y', 'x'), rng.normal(size=(12, 6, 7)).astype(np.float32))
+    for var in VARIABLES[:2]
+  }, coords={'time': np.arange(12), **coords})
+
+  downscaled = downscalers.delta_downscale(source, correction, VARIABLES)
+  for var in VARIABLES:
+    cf = correction[var] if var in correction else 0
+    expected = downscalers.LOOKUP[var](source[var], cf)
+    np.testing.assert_array_equal(downscaled[var].values, expected.values)
+    assert downscaled[var].dtype == np.float32
+    assert downscaled[var].attrs['units'] == 'u'
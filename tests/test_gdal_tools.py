@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+import numpy as np
+from osgeo import gdal
+from pyproj import CRS
+
+from temds import gdal_tools
+
+WGS84 = CRS.from_epsg(4326).to_wkt()
+GT = (-180.0, 0.5, 0.0, 90.0, 0.0, -0.5)
+
+def test_array_dataset_shares_memory():
+  a = np.arange(2 * 4 * 6, dtype=np.float32).reshape(2, 4, 6)
+  b = np.zeros((4, 6), dtype=np.float32)
+  ds = gdal_tools.array_dataset([a, b], WGS84, GT)
+
+  assert ds.RasterCount == 3
+  assert ds.GetGeoTransform() == GT
+  np.testing.assert_array_equal(ds.GetRasterBand(2).ReadAsArray(), a[1])
+
+  ## writes through gdal land in the numpy arrays
+  ds.GetRasterBand(3).WriteArray(np.ones((4, 6), dtype=np.float32))
+  ds.FlushCache()
+  assert (b == 1).all()
+
+def test_array_dataset_warp_into_buffer():
+  source_data = np.arange(4 * 6, dtype=np.float32).reshape(4, 6)
+  source = gdal_tools.array_dataset(source_data, WGS84, GT)
+  dest_data = np.zeros((8, 12), dtype=np.float32)
+  dest = gdal_tools.array_dataset(
+    dest_data, WGS84, (-180.0, 0.25, 0.0, 90.0, 0.0, -0.25)
+  )
+  gdal.Warp(dest, source, resampleAlg='nearest')
+  dest.FlushCache()
+  np.testing.assert_array_equal(
+    dest_data, source_data.repeat(2, axis=0).repeat(2, axis=1)
+  )
+
+def test_warp_threads_from_env(monkeypatch):
+  monkeypatch.setattr(gdal_tools, 'MULTITHREAD_SAFE', True)
+  monkeypatch.setenv(gdal_tools.WARP_THREADS_ENV, '8')
+  assert gdal_tools.get_warp_threads() == 8
+  assert gdal_tools.warp_kwargs() == dict(multithread=True, warpOptions=['NUM_THREADS=8'])
+
+  monkeypatch.setenv(gdal_tools.WARP_THREADS_ENV, '1')
+  assert gdal_tools.warp_kwargs() == dict(multithread=False)
+
+  monkeypatch.delenv(gdal_tools.WARP_THREADS_ENV)
+  assert gdal_tools.get_warp_threads() == 1
+
+def test_warp_threads_disabled_on_unsafe_platforms(monkeypatch):
+  monkeypatch.setattr(gdal_tools, 'MULTITHREAD_SAFE', False)
+  monkeypatch.setenv(gdal_tools.WARP_THREADS_ENV, '8')
+  assert gdal_tools.get_warp_threads() == 1
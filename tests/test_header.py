@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+import pytest
+
+import numpy as np
+import xarray as xr
+import rioxarray
+
+from temds.datasources.dataset import TEMDataset, YearlyDataset
+from temds.datasources import header
+
+
+@pytest.fixture(params=['projected', 'geographic-ascending'])
+def nc_file(request, tmp_path):
+  time = xr.date_range('2000-01-01', periods=3, freq='D', calendar='noleap', use_cftime=True)
+  if request.param == 'projected':
+    x = np.arange(-1000, 1000, 100.) + 50
+    y = np.arange(500, -500, -100.) - 50
+    dims = ('time', 'y', 'x')
+    coords = {'time': time, 'x': x, 'y': y}
+    crs = 6931
+  else:
+    y = np.arange(45.25, 90, 0.5)
+    x = np.arange(-179.75, 180, 0.5)
+    dims = ('time', 'lat', 'lon')
+    coords = {'time': time, 'lon': x, 'lat': y}
+    crs = 4326
+  data = np.random.default_rng(0).random((3, y.size, x.size)).astype('float32')
+  ds = xr.Dataset(
+    {
+      'tair': (dims, data, {'units': 'degC'}),
+      'prec': (dims, data, {'units': 'mm'}),
+    },
+    coords=coords, attrs={'data_year': 2000}
+  )
+  ds.rio.set_spatial_dims(dims[2], dims[1], inplace=True)
+  ds.rio.write_crs(crs, inplace=True)
+  path = tmp_path.joinpath('data.nc')
+  ds.to_netcdf(path)
+  return path
+
+def test_header_matches_loaded_dataset(nc_file):
+  loaded = TEMDataset(nc_file)
+  path_backed = TEMDataset(nc_file, in_memory=False)
+
+  assert isinstance(path_backed.header, header.DatasetHeader)
+  assert loaded.header is None
+  assert path_backed.crs == loaded.crs
+  assert path_backed.shape == loaded.shape
+  assert path_backed.transform == loaded.transform
+  assert path_backed.resolution == loaded.resolution
+  assert np.allclose(path_backed.extent, loaded.extent)
+  assert path_backed.vars == loaded.vars
+  assert path_backed.units == loaded.units
+  assert path_backed.header.n_time == 3
+
+def test_header_does_not_load_dataset(nc_file, monkeypatch):
+  def fail(*args, **kwargs):
+    raise AssertionError('load called')
+  monkeypatch.setattr(YearlyDataset, 'load', fail)
+  ds = YearlyDataset(None, nc_file, in_memory=False)
+
+  assert ds.year == 2000
+  ds.crs, ds.shape, ds.transform, ds.resolution, ds.extent, ds.vars, ds.units
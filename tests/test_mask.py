@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+import pytest
+
+import numpy as np
+import geopandas as gpd
+import shapely
+from affine import Affine
+
+from temds.region import mask
+
+
+def intersects_loop(boundary, geotransform, x_size, y_size):
+  '''Reference: the per pixel loop `Mask.from_extent` used to run'''
+  result = np.zeros((y_size, x_size), dtype=np.int16)
+  _, res_x, _, _, _, res_y = geotransform
+  gt = Affine.from_gdal(*geotransform)
+  for col in range(y_size):
+    for row in range(x_size):
+      minx, maxy = gt * (row, col)
+      box = shapely.box(minx, maxy + res_y, minx + res_x, maxy)
+      if boundary.iloc[[0]].geometry.intersects(box).values[0]:
+        result[col, row] = 1
+  return result
+
+GEOMETRIES = [
+  shapely.Polygon(
+    [(0, 0), (10, 0), (10, 3), (4, 10), (0, 7)], 
+    holes=[[(3, 3), (6, 3), (6, 5), (3, 5)]]
+  ),
+  shapely.MultiPolygon([shapely.box(0, 0, 3, 3), shapely.box(5, 5, 7, 8)]),
+  shapely.Point(2, 2).buffer(4),
+  shapely.LineString([(0, 0), (5, 7), (9, 2)]),
+]
+
+GRIDS = [
+  ((-1.0, 1.0, 0, 11.0, 0, -1.0), 13, 13), # edges on cell boundaries
+  ((-2.3, 0.7, 0, 12.1, 0, -0.7), 21, 20),
+]
+
+@pytest.mark.parametrize('geometry', GEOMETRIES)
+@pytest.mark.parametrize('grid', GRIDS)
+def test_intersecting_cells_matches_loop(geometry, grid, monkeypatch):
+  monkeypatch.setattr(mask, 'INTERSECT_BLOCK_CELLS', 50) # several blocks
+  boundary = gpd.GeoSeries([geometry], crs='EPSG:6931')
+  expected = intersects_loop(boundary, *grid)
+  result = mask.intersecting_cells(geometry, *grid)
+
+  assert result.dtype == np.int16
+  np.testing.assert_array_equal(result, expected)
+
+def test_from_extent_matches_loop():
+  boundary = gpd.GeoSeries([GEOMETRIES[0]], crs='EPSG:6931')
+  result = mask.Mask.from_extent(boundary, 0.5, align_extent_to_resolution=False)
+  raster = result.raster
+  expected = intersects_loop(
+    boundary, raster.GetGeoTransform(), raster.RasterXSize, raster.RasterYSize
+  )
+  np.testing.assert_array_equal(raster.ReadAsArray(), expected)
+  assert expected.sum() > 0
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+import pytest
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from temds import quantile_mapping as qm
+
+
+def daily(values, start='2000-01-01', name='tair'):
+  '''(time, y, x) daily DataArray'''
+  time = pd.date_range(start, periods=values.shape[0], freq='D')
+  return xr.DataArray(
+    values, dims=('time', 'y', 'x'), name=name,
+    coords={
+      'time': time, 
+      'y': np.arange(values.shape[1]), 'x': np.arange(values.shape[2])
+    },
+  )
+
+@pytest.fixture
+def hist():
+  '''Two years of observations and simulations, 3x4 pixels'''
+  rng = np.random.default_rng(0)
+  obs = rng.normal(size=(730, 3, 4))
+  simh = rng.normal(1, 2, size=(730, 3, 4))
+  return daily(obs), daily(simh)
+
+def test_table_and_cdf_lookup_match_interp():
+  rng = np.random.default_rng(1)
+  table = np.sort(rng.normal(size=(10, 3)), axis=0)
+  values = rng.normal(size=(20, 3)) 
+  levels = qm.quantile_levels(10)
+  tau = qm.cdf_lookup(table, values)
+  for col in range(3):
+    np.testing.assert_allclose(
+      tau[:, col], np.interp(values[:, col], table[:, col], levels)
+    )
+    np.testing.assert_allclose(
+      qm.table_lookup(table, tau)[:, col], 
+      np.interp(tau[:, col], levels, table[:, col])
+    )
+
+def test_lookup_missing_values():
+  table = np.array([[0.0, np.nan], [1.0, np.nan]])
+  tau = qm.cdf_lookup(table, np.array([[np.nan, 0.5]]))
+  assert np.isnan(tau).all()
+
+def test_quantile_mapping_identity(hist):
+  obs, _ = hist
+  tables = qm.get_tables(obs, obs, 20)
+  result = qm.adjust('quantile_mapping', tables, obs)
+  np.testing.assert_allclose(result.values, obs.values)
+  xr.testing.assert_equal(result['time'], obs['time'])
+
+def test_quantile_delta_mapping_shift(hist):
+  obs, simh = hist
+  tables = qm.get_tables(simh + 2, simh, 20)
+  simp = daily(simh.values[:365] * 3, '2050-01-01')
+  result = qm.adjust('quantile_delta_mapping', tables, simp)
+  np.testing.assert_allclose(result.values, simp.values + 2)
+
+def test_blocks_match_whole_grid(hist):
+  obs, simh = hist
+  simp = daily(simh.values[365:], '2050-01-01')
+  whole = qm.adjust(
+    'quantile_delta_mapping', qm.get_tables(obs, simh, 20), simp, '*'
+  )
+  blocked = qm.adjust(
+    'quantile_delta_mapping', 
+    qm.get_tables(obs, simh, 20, block_size=2), simp, '*', block_size=(2, 3)
+  )
+  np.testing.assert_array_equal(blocked.values, whole.values)
+
+def test_parallel_uses_n_jobs(hist, monkeypatch):
+  '''parallel blocks run with the given number of workers, outside any
+  joblib.parallel_config'''
+  n_jobs = []
+  class Parallel(qm.Parallel):
+    def __init__(self, **kwargs):
+      n_jobs.append(kwargs.get('n_jobs'))
+      super().__init__(**kwargs)
+  monkeypatch.setattr(qm, 'Parallel', Parallel)
+
+  obs, simh = hist
+  simp = daily(simh.values[365:], '2050-01-01')
+  serial = qm.adjust('quantile_mapping', qm.get_tables(obs, simh, 20), simp)
+  tables = qm.get_tables(obs, simh, 20, block_size=2, parallel=True, n_jobs=2)
+  parallel = qm.adjust(
+    'quantile_mapping', tables, simp, block_size=2, parallel=True, n_jobs=2
+  )
+  np.testing.assert_array_equal(parallel.values, serial.values)
+  assert n_jobs == [2, 2, 2]
+
+def test_tables_are_cached_by_content(hist, tmp_path):
+  obs, simh = hist
+  tables = qm.get_tables(obs, simh, 20, cache_dir=tmp_path)
+  cached = list(tmp_path.glob('tair-quantiles-*.npz'))
+  assert len(cached) == 1
+
+  loaded = qm.get_tables(obs, simh, 20, cache_dir=tmp_path)
+  assert loaded.key == tables.key
+  np.testing.assert_array_equal(loaded.obs, tables.obs)
+
+  qm.get_tables(obs, simh + 1, 20, cache_dir=tmp_path)
+  qm.get_tables(obs.isel(time=slice(0, 365)), simh, 20, cache_dir=tmp_path)
+  assert len(list(tmp_path.glob('tair-quantiles-*.npz'))) == 3
+
+def test_unknown_method(hist):
+  obs, simh = hist
+  with pytest.raises(ValueError):
+    qm.adjust('delta', qm.get_tables(obs, simh, 20), simh)
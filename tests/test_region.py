@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+import geopandas as gpd
+import numpy as np
+import rioxarray
+import shapely
+import xarray as xr
+from joblib import Parallel
+
+from temds import constants, warp_plan
+from temds.datasources import dataset
+from temds.region import region
+
+BATCH_YEARS = (2001, 2002, 2003)
+SEASON = 10 * np.sin(np.arange(365) * 2 * np.pi / 365)
+
+
+def test_share_dataset_round_trip(tmp_path):
+  '''correction factors are shared with worker processes as memory maps'''
+  rng = np.random.default_rng(0)
+  ds = xr.Dataset(
+    {'tair_avg': (('time', 'y', 'x'), rng.normal(size=(12, 3, 4)).astype(np.float32), {'units': 'celsius'})},
+    coords={'time': np.arange(12), 'y': np.arange(3.0), 'x': np.arange(4.0)},
+    attrs={'baseline_id': 'baseline'}
+  )
+  spec = region.share_dataset(ds, tmp_path)
+  shared = region.open_shared(spec)
+
+  xr.testing.assert_identical(shared, ds)
+  assert isinstance(shared['tair_avg'].variable._data, np.memmap)
+
+def test_clip_to_grid_uses_grid_spec():
+  '''workers clip with the grid spec instead of the Region'''
+  class Source:
+    def get_by_extent(self, *args, **kwargs):
+      self.args, self.kwargs = args, kwargs
+      return 'clipped'
+
+  grid = {
+    'bounds': (0, 1, 2, 3), 'crs': 'EPSG:6931', 
+    'resolution': (1000, -1000), 'dest_gt': (0, 1000, 0, 3, 0, -1000),
+  }
+  source = Source()
+  
+  assert region.clip_to_grid(source, grid, warp_plan=None) == 'clipped'
+  assert source.args[:4] == (0, 1, 2, 3)
+  assert source.args[4].to_epsg() == 6931
+  assert source.kwargs == {
+    'warp_plan': None, 'resolution': (1000, -1000), 
+    'dest_gt': (0, 1000, 0, 3, 0, -1000)
+  }
+
+def write_daily_years(where, offset):
+  '''Yearly files of smooth daily tair_avg on an 8 km EPSG:6931 grid'''
+  where.mkdir()
+  x = np.arange(-2036000.0, -1920000.0, 8000.0)
+  y = np.arange(-964000.0, -1072000.0, -8000.0)
+  cols, rows = np.meshgrid(np.arange(x.size), np.arange(y.size))
+  for year in BATCH_YEARS:
+    time = xr.date_range(f'{year}-01-01', periods=365, freq='D', calendar='noleap', use_cftime=True)
+    data = (offset + year - 2000 + SEASON[:, None, None] + 0.5 * (cols + rows)).astype(np.float32)
+    ds = xr.Dataset(
+      {'tair_avg': (('time', 'y', 'x'), data, {'units': 'celsius'})},
+      coords={'time': time, 'y': y, 'x': x}, attrs={'data_year': year}
+    )
+    ds.rio.write_crs(6931, inplace=True)
+    ds.to_netcdf(where / f'data-{year}.nc')
+  return where
+
+def test_batch_delta_downscale(tmp_path, monkeypatch):
+  '''two sources sharing a baseline and grid build one warp plan and one
+  set of correction factors, and are saved as where/name/name-{year}.nc'''
+  boundary = gpd.GeoDataFrame(
+    geometry=[shapely.box(-2000000, -1032000, -1960000, -1000000)], crs='EPSG:6931'
+  )
+  area = region.Region(boundary, resolution=4000, name='batch')
+  gt = area.mask.raster.GetGeoTransform()
+  nx, ny = area.shape
+  area.data['reference'] = dataset.TEMDataset(xr.Dataset(
+    {'tair_avg': (('time', 'y', 'x'), np.full((12, ny, nx), 5.0, dtype=np.float32), {'units': 'celsius'})},
+    coords={
+      'time': [constants.MONTH_START_DAYS[mn] for mn in range(12)],
+      'y': gt[3] + (np.arange(ny) + 0.5) * gt[5],
+      'x': gt[0] + (np.arange(nx) + 0.5) * gt[1],
+    }
+  ))
+
+  baseline = write_daily_years(tmp_path / 'historical', 0)
+  sources = {
+    'ssp126': (write_daily_years(tmp_path / 'ssp126', 1), baseline),
+    'ssp585': (write_daily_years(tmp_path / 'ssp585', 3), baseline),
+  }
+
+  built = []
+  class CountingPlan(warp_plan.WarpPlan):
+    def __init__(self, *args, **kwargs):
+      built.append(args[:3])
+      super().__init__(*args, **kwargs)
+  monkeypatch.setattr(warp_plan, 'WarpPlan', CountingPlan)
+  ## plans are shared by grid without relying on the lru_cache
+  monkeypatch.setattr(warp_plan, 'get_warp_plan', warp_plan.get_warp_plan.__wrapped__)
+
+  factors = []
+  calculate = area.calculate_correction_factors
+  def counting_factors(*args, **kwargs):
+    factors.append(args[0])
+    return calculate(*args, **kwargs)
+  monkeypatch.setattr(area, 'calculate_correction_factors', counting_factors)
+
+  n_jobs = []
+  class RecordingParallel(Parallel):
+    def __init__(self, *args, **kwargs):
+      n_jobs.append(kwargs['n_jobs'])
+      super().__init__(*args, **kwargs)
+  monkeypatch.setattr(region, 'Parallel', RecordingParallel)
+
+  task_bytes = 3 * 365 * nx * ny * 4
+  saved = area.batch_delta_downscale(
+    tmp_path / 'out', sources, 'reference', ['tair_avg'], (2001, 2003),
+    years=(2002, 2003), n_jobs=4, memory_budget=task_bytes
+  )
+
+  assert len(built) == 1
+  assert factors == ['batch-baseline']
+  assert n_jobs == [1]
+  assert not any(item.startswith('batch-') for item in area.data)
+
+  assert saved == {
+    name: [tmp_path / 'out' / name / f'{name}-{year}.nc' for year in (2002, 2003)]
+    for name in sources
+  }
+  ## source and baseline share a plan, so only the yearly offsets and the
+  ## daily season less its monthly mean (in the baseline) are left
+  months = np.split(SEASON, constants.MONTH_BOUNDS[1:12])
+  anomaly = np.concatenate([month - month.mean() for month in months])
+  for name, offset in (('ssp126', 1), ('ssp585', 3)):
+    for year, out_file in zip((2002, 2003), saved[name]):
+      expected = offset + year - 2000 - 1.5 + 5 + anomaly
+      with xr.open_dataset(out_file) as ds:
+        assert ds.attrs['data_year'] == year
+        assert ds['tair_avg'].shape == (365, ny, nx)
+        np.testing.assert_allclose(
+          ds['tair_avg'].values, 
+          np.broadcast_to(expected[:, None, None], (365, ny, nx)), atol=1e-4
+        )
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import pytest
+
+import numpy as np
+import xarray as xr
+
+from temds import subset
+
+
+@pytest.fixture
+def global_grid():
+  '''0.5 degree global grid, descending lat, -180 to 180 lon'''
+  lat = np.arange(89.75, -90, -0.5)
+  lon = np.arange(-179.75, 180, 0.5)
+  data = np.arange(lat.size * lon.size, dtype=np.float32).reshape(lat.size, lon.size)
+  return xr.Dataset(
+    {'v': (('lat', 'lon'), data)}, coords={'lat': lat, 'lon': lon}
+  )
+
+@pytest.mark.parametrize('bbox', [
+  (-180.0, 44.93, 180.0, 84.22),
+  (-150.3, 55.0, -140.0, 72.1),
+  (10.0, -10.0, 10.2, -9.9),
+])
+def test_isel_bbox_matches_where(global_grid, bbox):
+  minx, miny, maxx, maxy = bbox
+  mask = (global_grid.lon >= minx) & (global_grid.lon <= maxx) \
+    & (global_grid.lat >= miny) & (global_grid.lat <= maxy)
+  expected = global_grid.where(mask, drop=True)
+  result = subset.isel_bbox(global_grid, minx, miny, maxx, maxy)
+
+  xr.testing.assert_equal(result, expected)
+  assert result.v.dtype == global_grid.v.dtype
+
+def test_coord_slice():
+  ascending = np.arange(10.0)
+  assert subset.coord_slice(ascending, 2, 5) == slice(2, 6)
+  assert subset.coord_slice(ascending, 2, 5, upper_inclusive=False) == slice(2, 5)
+  assert subset.coord_slice(ascending[::-1], 2, 5) == slice(4, 8)
+  assert subset.coord_slice(ascending, 20, 30) == slice(10, 10)
+
+def test_lon_indices_0_360():
+  lon = np.arange(0.5, 360, 1.0)
+  ## same convention
+  assert subset.lon_indices(lon, 10, 20) == slice(10, 20)
+  ## bbox in the western hemisphere
+  assert subset.lon_indices(lon, -20, -10) == slice(340, 350)
+  ## bbox across 0 wraps around
+  np.testing.assert_array_equal(
+    subset.lon_indices(lon, -2, 2), [358, 359, 0, 1]
+  )
+  ## full range starts at -180
+  index = subset.lon_indices(lon, -180, 180)
+  converted = (lon[index] + 180) % 360 - 180
+  assert index.size == lon.size
+  assert (np.diff(converted) > 0).all()
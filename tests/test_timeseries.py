@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+import pytest
+
+import numpy as np
+import xarray as xr
+import rioxarray
+from joblib import parallel_config
+
+from temds.datasources.timeseries import YearlyTimeSeries
+
+YEARS = (2001, 2002, 2003)
+
+
+@pytest.fixture()
+def synthetic_timeseries():
+  '''Three 365 day years of small EPSG:6931 daily data with some NaNs.'''
+  rng = np.random.default_rng(0)
+  x = np.arange(-2000000.0, -1972000.0, 4000.0)
+  y = np.arange(-1000000.0, -1024000.0, -4000.0)
+  years = []
+  for year in YEARS:
+    time = xr.date_range(f'{year}-01-01', periods=365, freq='D', calendar='noleap', use_cftime=True)
+    data = (rng.normal(size=(time.size, y.size, x.size)) * 10).astype(np.float32)
+    data[:, 0, 0] = np.nan
+    data[5, 1, 1] = np.nan
+    ds = xr.Dataset({
+      'tair_avg': (('time', 'y', 'x'), data, {'units': 'celsius'}),
+      'prec': (('time', 'y', 'x'), np.abs(data), {'units': 'mm'}),
+    }, coords={'time': time, 'y': y, 'x': x}, attrs={'data_year': year})
+    ds.rio.write_crs(6931, inplace=True)
+    years.append(ds)
+  return YearlyTimeSeries(years)
+
+def test_synthesize_to_monthly_fast_matches_xarray(synthetic_timeseries):
+  target_vars = {'tair_avg': 'mean', 'prec': 'sum'}
+  new_names = {'tair_avg': 'tair', 'prec': 'precip'}
+  fast = synthetic_timeseries.synthesize_to_monthly(target_vars, new_names)
+  expected = synthetic_timeseries.synthesize_to_monthly(target_vars, new_names, fast=False)
+
+  assert fast.sizes['time'] == 12 * len(YEARS)
+  xr.testing.assert_identical(fast, expected)
+
+def test_slice_shares_cache(synthetic_timeseries, tmp_path):
+  for item in synthetic_timeseries.data:
+    item.dataset.to_netcdf(tmp_path / f'data-{item.year}.nc')
+  series = YearlyTimeSeries(tmp_path, in_memory=False, cache_bytes=0)
+  sliced = series[2001:2003]
+
+  assert [item.year for item in sliced.data] == [2001, 2002]
+  assert sliced.cache is series.cache
+  assert sliced.cache.max_bytes == 0
+  assert all(item.cache is series.cache for item in sliced.data)
+
+def test_fill_outliers_not_lost_on_eviction(synthetic_timeseries, tmp_path):
+  '''filled values are kept with a cache smaller than one year'''
+  for item in synthetic_timeseries.data:
+    item.dataset.to_netcdf(tmp_path / f'data-{item.year}.nc')
+  series = YearlyTimeSeries(tmp_path, in_memory=False, cache_bytes=1024)
+  series.fill_outliers('tair_avg', n_std=1)
+  synthetic_timeseries.fill_outliers('tair_avg', n_std=1)
+
+  for year in YEARS:
+    xr.testing.assert_allclose(
+      series[year].dataset['tair_avg'], synthetic_timeseries[year].dataset['tair_avg']
+    )
+
+def test_create_climate_baseline_parallel_shares_memory(synthetic_timeseries, monkeypatch):
+  '''under the CLI's process backend variables still run in threads'''
+  expected = synthetic_timeseries.create_climate_baseline(2001, 2003)
+  def no_pickle(self):
+    raise AssertionError('timeseries copied to a worker process')
+  monkeypatch.setattr(YearlyTimeSeries, '__getstate__', no_pickle, raising=False)
+  with parallel_config(backend='loky', n_jobs=2):
+    result = synthetic_timeseries.create_climate_baseline(2001, 2003, parallel=True, n_jobs=2)
+
+  xr.testing.assert_identical(result, expected)
+
+def test_calculate_daily_stats_parallel_shares_memory(synthetic_timeseries, monkeypatch):
+  '''under the CLI's process backend year ranges still run in threads'''
+  expected = synthetic_timeseries.calculate_daily_stats('tair_avg', 2001, 2003)
+  def no_pickle(self):
+    raise AssertionError('timeseries copied to a worker process')
+  monkeypatch.setattr(YearlyTimeSeries, '__getstate__', no_pickle, raising=False)
+  with parallel_config(backend='loky', n_jobs=2):
+    result = synthetic_timeseries.calculate_daily_stats(
+      'tair_avg', 2001, 2003, parallel=True, n_chunks=3, n_jobs=2
+    )
+
+  np.testing.assert_allclose(result.mean, expected.mean, rtol=1e-6)
+  np.testing.assert_allclose(result.std, expected.std, rtol=1e-5)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+import pytest
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import rasterio.features
+import shapely.geometry
+from affine import Affine
+
+from temds.datasources import vegetation
+
+
+STATES = pd.DataFrame({
+  'state_idx': [1, 2, 3],
+  'shapeName': ['Alaska', 'Quebec', 'Moscow'],
+  'shapeGroup': ['USA', 'CAN', 'RUS'],
+})
+
+ECOREGIONS = pd.DataFrame({
+  'eco_idx': [1, 2],
+  'ECO_NAME': ['Arctic foothills tundra', 'Scandinavian and Russian taiga'],
+  'REALM': ['Nearctic', 'Palearctic'],
+})
+
+CLASSES = pd.DataFrame({
+  'lc_idx': [1, 2, 3, 4],
+  'classname': ['Black Spruce forest', 'Pine forest', 'Bog', 'Water'],
+})
+
+
+def classify(state, eco, lc, drain):
+  indices = {
+    'state_idx': np.array(state, dtype=np.float32),
+    'eco_idx': np.array(eco, dtype=np.float32),
+    'lc_idx': np.array(lc, dtype=np.float32),
+    'drain_idx': np.array(drain, dtype=np.int32),
+  }
+  return vegetation.classify_cmt(indices, CLASSES, STATES, ECOREGIONS)
+
+
+def test_classify_cmt_rules():
+  cmt, _ = classify(
+    state=[1, 1, 2, 2, 0, 3, 3],
+    eco=  [1, 1, 0, 0, 1, 2, 2],
+    lc=   [1, 1, 1, 3, 2, 2, 3],
+    drain=[1, 0, 0, 1, 0, 0, 0],
+  )
+  # poorly drained black spruce in western north america, well drained 
+  # falls back to the community default, eastern north america (well 
+  # drained) and bog, nearctic pine, and pine and bog in western eurasia
+  # (the eco region overrides the eastern eurasia state)
+  assert cmt.tolist() == [13, 1, 69, 61, 66, 82, 80]
+
+
+def test_classify_cmt_unmatched():
+  cmt, unmatched = classify(
+    state=[1, 1, 1], eco=[1, 1, 2], lc=[4, 9, 4], drain=[0, 0, 0],
+  )
+  assert cmt.tolist() == [0, 0, 0]
+  assert unmatched.to_dict('records') == [
+    {'classname': 'Water', 'REALM': 'Nearctic', 'pixels': 1},
+    {'classname': 'N/A', 'REALM': 'Nearctic', 'pixels': 1},
+    {'classname': 'Water', 'REALM': 'Palearctic', 'pixels': 1},
+  ]
+
+
+def test_rule_table():
+  rules = [('a', lambda a: a['x'] > 1), ('b', lambda a: a['y'] == 'q')]
+  table = vegetation.rule_table(
+    rules, 'n', [{'x': np.arange(3)}, {'y': np.array(['p', 'q'])}], 
+    ('n', 'a', 'b')
+  )
+  assert table.tolist() == [[0, 2], [0, 2], [1, 2]]
+
+
+def test_burn_rows_matches_burning_each_column():
+  # two overlapping squares, the second overwrites the first
+  gdf = gpd.GeoDataFrame({
+    'state_idx': [1, 2],
+    'ctry_idx': [5, 7],
+    'geometry': [shapely.geometry.box(0, 0, 6, 6), shapely.geometry.box(3, 3, 9, 9)],
+  })
+  shape = (10, 10)
+  transform = Affine(1, 0, 0, 0, -1, 10)
+
+  rows = vegetation.burn_rows(gdf, shape, transform)
+  assert (rows == 0).any() and (rows == 1).any() and (rows == 2).any()
+  for idx_col in ('state_idx', 'ctry_idx'):
+    expected = rasterio.features.rasterize(
+      zip(gdf.geometry, gdf[idx_col]), out_shape=shape,
+      transform=transform, fill=0, dtype=np.float32
+    )
+    np.testing.assert_array_equal(
+      vegetation.rows_to_index(rows, gdf[idx_col].values), expected
+    )
+
+
+def test_burn_rows_empty():
+  gdf = gpd.GeoDataFrame({'state_idx': []}, geometry=[])
+  rows = vegetation.burn_rows(gdf, (3, 4), Affine.identity())
+  assert rows.shape == (3, 4) and not rows.any()
+  assert vegetation.rows_to_index(rows, gdf['state_idx'].values).dtype == np.float32
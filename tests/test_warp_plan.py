@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import pytest
+
+import numpy as np
+from osgeo import gdal
+from pyproj import CRS
+
+from temds import gdal_tools, warp_plan
+
+SOURCE_GT = (-180.0, 0.5, 0.0, 90.0, 0.0, -0.5)
+SOURCE_SHAPE = (80, 200)
+WGS84 = CRS.from_epsg(4326).to_wkt()
+ALBERS = CRS.from_proj4(
+  '+proj=aea +lat_1=55 +lat_2=65 +lat_0=50 +lon_0=-154 +x_0=0 +y_0=0 '
+  '+ellps=GRS80 +units=m'
+).to_wkt()
+
+
+@pytest.fixture(scope='module')
+def source_cube():
+  '''Small (3 band) source grid with an "ocean" of NaNs.'''
+  rng = np.random.default_rng(42)
+  data = rng.normal(size=(3,) + SOURCE_SHAPE).astype(np.float32)
+  data += np.linspace(0, 5, SOURCE_SHAPE[1], dtype=np.float32)
+  data[:, 20:40, 50:80] = np.nan
+  return data
+
+def gdal_reference(data, dest_shape, dest_gt, dest_crs, resample_alg):
+  '''Clip `data` the way `TEMDataset.get_by_extent_gdal` does without a plan.'''
+  n_bands = data.shape[0]
+  dest = gdal_tools.empty_dataset(
+    dest_shape[1], dest_shape[0], dest_crs, dest_gt, n_bands
+  )
+  source = gdal_tools.empty_dataset(
+    SOURCE_SHAPE[1], SOURCE_SHAPE[0], WGS84, SOURCE_GT, n_bands
+  )
+  return gdal_tools.clip_opt_2(
+    dest, source, {'v': data}, resample_alg, True, False
+  )['v']
+
+@pytest.mark.parametrize('resample_alg, dest_gt, dest_shape', [
+  ('nearest', (-170.0, 0.1, 0.0, 85.0, 0.0, -0.1), (100, 300)),
+  ('bilinear', (-170.0, 0.1, 0.0, 85.0, 0.0, -0.1), (100, 300)),
+  ('average', (-170.0, 1.0, 0.0, 85.0, 0.0, -1.0), (30, 60)),
+])
+def test_warp_plan_same_crs_matches_gdal(source_cube, resample_alg, dest_gt, dest_shape):
+  plan = warp_plan.get_warp_plan(
+    SOURCE_SHAPE, SOURCE_GT, WGS84, dest_shape, dest_gt, WGS84, resample_alg
+  )
+  result = plan.apply(source_cube)
+  expected = gdal_reference(source_cube, dest_shape, dest_gt, WGS84, resample_alg)
+
+  assert result.shape == expected.shape
+  assert (np.isnan(result) == np.isnan(expected)).all()
+  np.testing.assert_allclose(result, expected, rtol=1e-5, atol=1e-5)
+
+def test_warp_plan_reprojected_matches_gdal(source_cube):
+  dest_gt = (-500000.0, 20000.0, 0.0, 1500000.0, 0.0, -20000.0)
+  dest_shape = (50, 50)
+  plan = warp_plan.get_warp_plan(
+    SOURCE_SHAPE, SOURCE_GT, WGS84, dest_shape, dest_gt, ALBERS, 'bilinear'
+  )
+  result = plan.apply(source_cube)
+  expected = gdal_reference(source_cube, dest_shape, dest_gt, ALBERS, 'bilinear')
+
+  ## gdal uses an approximate transformer (errors up to 1/8 of a pixel), so
+  ## values differ slightly and pixels right on a coastline may differ
+  mismatch = np.isnan(result) != np.isnan(expected)
+  assert mismatch.mean() < 0.01
+  both = ~np.isnan(result) & ~np.isnan(expected)
+  np.testing.assert_allclose(result[both], expected[both], atol=0.5)
+  assert np.abs(result[both] - expected[both]).mean() < 0.05
+
+def test_warp_plan_is_cached():
+  args = (
+    SOURCE_SHAPE, SOURCE_GT, WGS84,
+    (100, 300), (-170.0, 0.1, 0.0, 85.0, 0.0, -0.1), WGS84, 'bilinear'
+  )
+  plan = warp_plan.get_warp_plan(*args)
+  assert warp_plan.get_warp_plan(*args) is plan
+  assert plan.matches(*args)
+
+def test_warp_plan_unsupported():
+  ## mode is not linear
+  assert warp_plan.get_warp_plan(
+    SOURCE_SHAPE, SOURCE_GT, WGS84,
+    (30, 60), (-170.0, 1.0, 0.0, 85.0, 0.0, -1.0), WGS84, 'mode'
+  ) is None
+  ## gdal widens the bilinear kernel when down sampling
+  assert warp_plan.get_warp_plan(
+    SOURCE_SHAPE, SOURCE_GT, WGS84,
+    (30, 60), (-170.0, 1.0, 0.0, 85.0, 0.0, -1.0), WGS84, 'bilinear'
+  ) is None
+
+def test_warp_plan_reuses_normalized_weights(source_cube):
+  args = (
+    SOURCE_SHAPE, SOURCE_GT, WGS84,
+    (100, 300), (-170.0, 0.1, 0.0, 85.0, 0.0, -0.1), WGS84, 'bilinear'
+  )
+  plan = warp_plan.WarpPlan(*args)
+  assert plan.indices.dtype == np.int32 and plan.weights.dtype == np.float32
+
+  first = plan.apply(source_cube)
+  normalized = plan._normalized
+  np.testing.assert_array_equal(plan.apply(source_cube), first)
+  assert plan._normalized is normalized
+
+  ## a new mask gives the same result as a new plan
+  changed = source_cube.copy()
+  changed[:, 40:60, 100:120] = np.nan
+  result = plan.apply(changed)
+  assert plan._normalized is not normalized
+  np.testing.assert_array_equal(result, warp_plan.WarpPlan(*args).apply(changed))
+  assert result.flags.c_contiguous
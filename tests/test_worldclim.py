@@ -4,6 +4,8 @@ import pytest
 
 import xarray
 
+from pathlib import Path
+
 
 import temds
 
@@ -20,7 +22,18 @@ def test_worldclim_init(worldclim_object):
   # check that all of them are present in the object's dataset.
   for v in var_names:
     assert v in worldclim_object.dataset.data_vars
-  
 
 
+def test_prepare_reads_archives_in_place(tmp_path):
+  from temds.datasources import worldclim
+  Path(tmp_path, 'wc2.1_10m_tavg.zip').touch()
+  Path(tmp_path, 'wc2.1_10m_prec').mkdir()
+
+  completed = worldclim.prepare(tmp_path, ['tavg', 'prec'], '2.1', '10m')
+  assert completed['tavg'] == Path(tmp_path, 'wc2.1_10m_tavg.zip')
+  assert completed['prec'] == Path(tmp_path, 'wc2.1_10m_prec')
 
+  assert worldclim.raster_path(completed['tavg'], 'tavg', '2.1', '10m', 3) == \
+    f'/vsizip/{tmp_path}/wc2.1_10m_tavg.zip/wc2.1_10m_tavg_03.tif'
+  assert worldclim.raster_path(completed['prec'], 'prec', '2.1', '10m', 12) == \
+    f'{tmp_path}/wc2.1_10m_prec/wc2.1_10m_prec_12.tif'